@@ -1,10 +1,15 @@
 import os
+import asyncio
+import logging
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import inspect
-from scripts.seed_neighborhoods import seed_neighborhoods_from_csv
-from scripts.seed_neighborhood_rents import seed_neighborhood_rents
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import CompileError, SQLAlchemyError
+from sqlalchemy.schema import CreateTable
 
 # DATABASE_URL for local or Render
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -15,25 +20,154 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 
 engine = create_engine(DATABASE_URL)
 Base = declarative_base()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable on the event loop after a commit in a worker thread
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Blocking DB work from async code runs here, sized like the default connection pool (5 + 10 overflow)
+db_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DB_THREAD_POOL_SIZE", 15)), thread_name_prefix="db")
+
+# Bump whenever models or upgrade_schema change, startup skips schema work while the stored version matches
+SCHEMA_VERSION = 4
+
+# Advisory lock key serializing init_db across worker processes on Postgres
+INIT_DB_LOCK_KEY = 41_7300
 
-# 👇 ensure tables are created on import
 def init_db():
-    from models import Neighborhood, Amenity  # import all models so Base knows them
-    inspector = inspect(engine)
-    print("Tables before create_all():", inspector.get_table_names())
-    
-    Base.metadata.create_all(bind=engine)
-    print("Tables in metadata:", list(Base.metadata.tables.keys()))
-    
+    """One-time schema and seed step run from the app lifespan, cheap when nothing changed"""
+    from scripts.bulk_seed import seed_city  # imported here, the seed script needs SessionLocal from this module
+
+    with init_db_lock():
+        migrate_schema()
+        seed_city("Montreal")
+
+def migrate_schema():
+    """Create and upgrade tables unless the stored schema version is current"""
+    import models  # import all models so Base knows them
+
+    if get_schema_version() == SCHEMA_VERSION:
+        return
+
+    tables = supported_tables()
+    skipped = [table.name for table in Base.metadata.sorted_tables if table not in tables]
+    if skipped:
+        logging.warning(f"Skipped tables {', '.join(skipped)}, {engine.dialect.name} cannot store their column types")
+
+    Base.metadata.create_all(bind=engine, tables=tables)
+    upgrade_schema(tables)
+
+    with engine.begin() as connection:
+        connection.execute(models.AppMetadata.__table__.delete().where(models.AppMetadata.key == "schema_version"))
+        connection.execute(models.AppMetadata.__table__.insert().values(key="schema_version", value=str(SCHEMA_VERSION)))
+    logging.info(f"✅ Schema migrated to version {SCHEMA_VERSION}")
+
+def supported_tables():
+    """Tables whose DDL compiles for this database, SQLite has no ARRAY column for user_preferences"""
+    tables = []
+    for table in Base.metadata.sorted_tables:
+        try:
+            CreateTable(table).compile(dialect=engine.dialect)
+        except CompileError:
+            continue
+        tables.append(table)
+    return tables
+
+def get_schema_version():
+    try:
+        with engine.connect() as connection:
+            value = connection.execute(text("SELECT value FROM app_metadata WHERE key = 'schema_version'")).scalar()
+    except SQLAlchemyError:
+        return None  # Fresh database without the metadata table
+    return int(value) if value is not None else None
+
+@contextmanager
+def init_db_lock():
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_DB_LOCK_KEY})
+
+def upgrade_schema(tables=None):
+    """Add columns introduced after a table was first created, create_all never alters tables"""
     inspector = inspect(engine)
-    print("Tables after create_all():", inspector.get_table_names())
+    amenity_columns = {column["name"] for column in inspector.get_columns("amenities")}
+
+    with engine.begin() as connection:
+        if "fetched_at" not in amenity_columns:
+            timestamp_type = "TIMESTAMP WITH TIME ZONE" if engine.dialect.name == "postgresql" else "TIMESTAMP"
+            connection.execute(text(f"ALTER TABLE amenities ADD COLUMN fetched_at {timestamp_type}"))
+            logging.info("Added amenities.fetched_at")
+
+        if "radius_meters" not in amenity_columns:
+            connection.execute(text("ALTER TABLE amenities ADD COLUMN radius_meters INTEGER NOT NULL DEFAULT 1000"))
+            logging.info("Added amenities.radius_meters")
+
+        deduplicate_rows(connection)
+
+        # Superseded by uq_neighborhood_rents_neighborhood_type and uq_amenities_neighborhood_radius_type
+        connection.execute(text("DROP INDEX IF EXISTS ix_neighborhood_rents_neighborhood_type_price"))
+        drop_amenity_type_unique(connection)
+
+        # create_all only indexes new tables, add the declared indexes to existing ones
+        for table in tables or supported_tables():
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+def drop_amenity_type_unique(connection):
+    """Drop the old (neighborhood_id, type) unique key, it allows only one radius per amenity"""
+    from models.amenity import Amenity
 
-    seed_neighborhoods_from_csv()
-    seed_neighborhood_rents()
+    legacy_constraint = any(
+        constraint["column_names"] == ["neighborhood_id", "type"]
+        for constraint in inspect(connection).get_unique_constraints("amenities")
+    )
 
-# run immediately when module loads
-init_db()
+    if engine.dialect.name == "postgresql":
+        connection.execute(text("ALTER TABLE amenities DROP CONSTRAINT IF EXISTS uq_amenities_neighborhood_type"))
+    connection.execute(text("DROP INDEX IF EXISTS uq_amenities_neighborhood_type"))
+
+    # SQLite cannot drop a table constraint, the rows are copied into a rebuilt table instead
+    if legacy_constraint and engine.dialect.name == "sqlite":
+        columns = ", ".join(column.name for column in Amenity.__table__.columns)
+        connection.execute(text("ALTER TABLE amenities RENAME TO amenities_legacy"))
+        connection.execute(text("DROP INDEX IF EXISTS uq_amenities_neighborhood_radius_type"))
+        Amenity.__table__.create(connection)
+        connection.execute(text(f"INSERT INTO amenities ({columns}) SELECT {columns} FROM amenities_legacy"))
+        connection.execute(text("DROP TABLE amenities_legacy"))
+        logging.info("Rebuilt amenities without the (neighborhood_id, type) unique constraint")
+
+def deduplicate_rows(connection):
+    """Remove duplicates that would violate the unique indexes, older databases had no constraints"""
+
+    # Repoint children of duplicate neighborhoods to the first one, then drop the duplicates
+    for child_table in ("amenities", "neighborhood_rents", "user_pref_neighborhood"):
+        connection.execute(text(f"""
+            UPDATE {child_table} SET neighborhood_id = (
+                SELECT MIN(keeper.id) FROM neighborhoods duplicate
+                JOIN neighborhoods keeper ON keeper.city = duplicate.city AND keeper.name = duplicate.name
+                WHERE duplicate.id = {child_table}.neighborhood_id
+            )
+            WHERE neighborhood_id IN (
+                SELECT id FROM neighborhoods WHERE id NOT IN (SELECT MIN(id) FROM neighborhoods GROUP BY city, name)
+            )
+        """))
+    removed = connection.execute(text(
+        "DELETE FROM neighborhoods WHERE id NOT IN (SELECT MIN(id) FROM neighborhoods GROUP BY city, name)"
+    )).rowcount
+
+    # The newest row of a key is the most recently fetched or seeded one
+    for table, key in (("amenities", "neighborhood_id, radius_meters, type"), ("neighborhood_rents", "neighborhood_id, type")):
+        removed += connection.execute(text(
+            f"DELETE FROM {table} WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key})"
+        )).rowcount
+
+    if removed:
+        logging.info(f"Removed {removed} duplicate rows")
 
 def get_db():
     db = SessionLocal()
@@ -41,3 +175,13 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run blocking work on a sync Session off the event loop, one call per session at a time"""
+    lock = db.info.get("run_db_lock")
+    if lock is None:
+        lock = db.info["run_db_lock"] = asyncio.Lock()
+    
+    async with lock:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
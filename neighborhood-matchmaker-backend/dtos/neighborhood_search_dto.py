@@ -2,6 +2,7 @@ from pydantic import BaseModel
 from typing import List, Optional
 from enums.amenity_type import AmenityTypeEnum
 from enums.rent_type import RentTypeEnum
+from enums.amenity_radius import AmenityRadiusEnum
 
 class NeighborhoodSearchDTO(BaseModel):
     preferred_neighborhoods: Optional[List[str]] = None
@@ -11,3 +12,4 @@ class NeighborhoodSearchDTO(BaseModel):
     destination_neighborhood: Optional[str]
     amenities: Optional[List[AmenityTypeEnum]]
     rent_types: Optional[List[RentTypeEnum]]
+    radius_meters: AmenityRadiusEnum = AmenityRadiusEnum.WALK
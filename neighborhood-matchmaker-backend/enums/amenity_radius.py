@@ -0,0 +1,9 @@
+from enum import IntEnum
+
+
+class AmenityRadiusEnum(IntEnum):
+    """Supported amenity count radii in meters, all counted from one fetch at the largest"""
+    BLOCK = 250
+    SHORT_WALK = 500
+    WALK = 1000
+    LONG_WALK = 2000
@@ -0,0 +1,70 @@
+import os
+import aiohttp
+from fastapi import Request
+
+# Connection pool settings for the shared Overpass session
+POOL_LIMIT = int(os.getenv("OVERPASS_POOL_LIMIT", 20))
+POOL_LIMIT_PER_HOST = int(os.getenv("OVERPASS_POOL_LIMIT_PER_HOST", 4))
+KEEPALIVE_SECONDS = float(os.getenv("OVERPASS_KEEPALIVE_SECONDS", 30))
+DNS_CACHE_TTL_SECONDS = int(os.getenv("OVERPASS_DNS_TTL_SECONDS", 300))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("OVERPASS_TIMEOUT_SECONDS", 30))
+
+
+class ConnectionStats:
+    """Connection reuse counters collected through aiohttp tracing"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.connections_queued = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._count("requests"))
+        trace_config.on_connection_create_end.append(self._count("connections_created"))
+        trace_config.on_connection_reuseconn.append(self._count("connections_reused"))
+        trace_config.on_connection_queued_start.append(self._count("connections_queued"))
+        trace_config.on_dns_cache_hit.append(self._count("dns_cache_hits"))
+        trace_config.on_dns_cache_miss.append(self._count("dns_cache_misses"))
+        return trace_config
+
+    def _count(self, attribute: str):
+        async def handler(session, trace_config_ctx, params):
+            setattr(self, attribute, getattr(self, attribute) + 1)
+        return handler
+
+    def as_dict(self) -> dict:
+        connections = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "connections_queued": self.connections_queued,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+            "reuse_ratio": self.connections_reused / connections if connections else 0.0,
+        }
+
+
+def create_http_session(stats: ConnectionStats) -> aiohttp.ClientSession:
+    """Create the long-lived pooled session, must be called inside the event loop"""
+    connector = aiohttp.TCPConnector(
+        limit=POOL_LIMIT,
+        limit_per_host=POOL_LIMIT_PER_HOST,
+        keepalive_timeout=KEEPALIVE_SECONDS,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL_SECONDS,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS),
+        trace_configs=[stats.trace_config()],
+    )
+
+
+def get_http_session(request: Request) -> aiohttp.ClientSession:
+    """FastAPI dependency returning the session opened in the app lifespan"""
+    return request.app.state.http_session
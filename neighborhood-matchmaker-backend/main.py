@@ -1,25 +1,61 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from routes import amenity, neighborhood, search
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from database import engine
+from database import engine, init_db, db_executor
+from http_client import ConnectionStats, create_http_session
+from services.overpass_api_service import OverpassAPIService
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+from services.poi_store import open_poi_store_from_env
+from services.poi_tile_service import POITileService
+from metrics import REGISTRY, CallbackCounter, callback_gauge
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from services.amenity_refresh_worker import AMENITY_REFRESH_ENABLED, create_amenity_refresh_worker_from_env
+import asyncio
+import logging
 import models
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema and seed data, skipped cheaply when the stored versions are current
+    await asyncio.get_running_loop().run_in_executor(db_executor, init_db)
 
-app.include_router(amenity.router, prefix="/amenities")
-app.include_router(neighborhood.router)
-app.include_router(search.router)
+    # Persisted POI tiles, memory-mapped so restarts do not refetch them
+    POITileService.store = open_poi_store_from_env(POITileService.tile_degrees)
+
+    # One pooled keep-alive session shared by every Overpass request
+    app.state.http_connection_stats = ConnectionStats()
+    app.state.http_session = create_http_session(app.state.http_connection_stats)
+
+    # Keeps stored amenity counts warm and fresh while the API is idle
+    app.state.amenity_refresh_worker = create_amenity_refresh_worker_from_env(
+        OverpassAPIService(app.state.http_session)
+    )
+    if AMENITY_REFRESH_ENABLED:
+        app.state.amenity_refresh_worker.start()
+
+    yield
+
+    await app.state.amenity_refresh_worker.stop()
+    await app.state.http_session.close()
+    if POITileService.store is not None:
+        await asyncio.to_thread(POITileService.store.flush)
+    logging.info(f"Overpass connection stats: {app.state.http_connection_stats.as_dict()}")
 
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     print("DB in use:", engine.url.render_as_string(hide_password=True))
+app = FastAPI(lifespan=lifespan)
 
-#     # only seed data here
-#     seed_neighborhoods_from_csv()
-#     seed_neighborhood_rents()
+# Values the services already track, read at scrape time
+callback_gauge("searches_in_flight", "Searches currently computing", lambda: NeighborhoodAmenityService.active_searches)
+callback_gauge("overpass_queue_depth", "Overpass calls waiting for the scheduler", lambda: OverpassAPIService.scheduler.queue_depth)
+callback_gauge("overpass_in_flight", "Overpass calls in progress", lambda: OverpassAPIService.scheduler.in_flight)
+callback_gauge("overpass_rate_per_second", "Current adaptive Overpass request rate", lambda: OverpassAPIService.scheduler.rate)
+CallbackCounter("overpass_retries", "Retried Overpass calls", lambda: OverpassAPIService.scheduler.retries)
+CallbackCounter("overpass_throttled", "Overpass 429 responses", lambda: OverpassAPIService.scheduler.throttled)
 
-#     yield
+app.include_router(amenity.router, prefix="/amenities")
+app.include_router(neighborhood.router)
+app.include_router(search.router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,3 +68,19 @@ app.add_middleware(
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
+
+@app.get("/http-connection-stats")
+async def http_connection_stats():
+    return app.state.http_connection_stats.as_dict()
+
+@app.get("/overpass-scheduler-stats")
+async def overpass_scheduler_stats():
+    return OverpassAPIService.scheduler.stats()
+
+@app.get("/amenity-refresh-stats")
+async def amenity_refresh_stats():
+    return app.state.amenity_refresh_worker.stats()
+
+@app.get("/metrics", response_class=Response)
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,56 @@
+from typing import Callable, Iterable
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.registry import Collector
+
+# Seconds, from sub-millisecond lookups to slow Overpass round trips
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Process-wide registry served on /metrics, kept apart from prometheus_client's default one
+REGISTRY = CollectorRegistry()
+
+
+class CallbackCounter(Collector):
+    """Monotonic total kept elsewhere, such as the Overpass scheduler retry count, read at scrape time"""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float], registry: CollectorRegistry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        registry.register(self)
+
+    def describe(self) -> Iterable[CounterMetricFamily]:
+        return [CounterMetricFamily(self.name, self.documentation)]
+
+    def collect(self) -> Iterable[CounterMetricFamily]:
+        yield CounterMetricFamily(self.name, self.documentation, value=self.read())
+
+
+def callback_gauge(name: str, documentation: str, read: Callable[[], float], registry: CollectorRegistry = REGISTRY) -> Gauge:
+    """Gauge read from a callback at scrape time, for values other code already tracks"""
+    gauge = Gauge(name, documentation, registry=registry)
+    gauge.set_function(read)
+    return gauge
+
+
+SEARCH_STAGE_SECONDS = Histogram(
+    "search_stage_seconds", "Time spent per search pipeline stage", ["stage"],
+    buckets=DEFAULT_BUCKETS, registry=REGISTRY
+)
+AMENITY_LOOKUPS = Counter(
+    "amenity_lookups", "Neighborhood amenity lookups answered from the database or fetched", ["source"],
+    registry=REGISTRY
+)
+OVERPASS_RESPONSES = Counter(
+    "overpass_responses", "Overpass HTTP responses by status code", ["status"], registry=REGISTRY
+)
+OVERPASS_RESPONSE_BYTES = Counter(
+    "overpass_response_bytes", "Bytes received in Overpass response bodies", registry=REGISTRY
+)
+OVERPASS_CACHE_HITS = Counter(
+    "overpass_cache_hits", "Overpass queries answered by the response cache", registry=REGISTRY
+)
+SEARCH_REQUESTS = Counter(
+    "search_requests", "Neighborhood searches by whether the result cache answered them", ["result"],
+    registry=REGISTRY
+)
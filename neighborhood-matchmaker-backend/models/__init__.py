@@ -3,5 +3,8 @@ from .amenity import Amenity
 from .neighborhood import Neighborhood
 from .user_preferences import UserPreferences
 from .neighborhood_rent import NeighborhoodRent
+from .seed_run import SeedRun
+from .app_metadata import AppMetadata
+from .fetch_lease import FetchLease
 
 from database import Base
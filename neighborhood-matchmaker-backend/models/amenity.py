@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Enum
+from sqlalchemy import Column, Integer, ForeignKey, Enum, Index, DateTime
 from sqlalchemy.orm import relationship
 from database import Base
 from enums.amenity_type import AmenityTypeEnum
@@ -6,10 +6,20 @@ from enums.amenity_type import AmenityTypeEnum
 
 class Amenity(Base):
     __tablename__ = "amenities"
+    __table_args__ = (
+        # One count per neighborhood, radius and amenity type, required by the bulk upsert. On
+        # Postgres the included count makes stored count lookups index-only
+        Index(
+            "uq_amenities_neighborhood_radius_type", "neighborhood_id", "radius_meters", "type",
+            unique=True, postgresql_include=["count"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     type = Column(Enum(AmenityTypeEnum), nullable=False)
     count = Column(Integer, nullable=False, default=0)
+    radius_meters = Column(Integer, nullable=False, default=1000, server_default="1000")  # rows before radii were counted at 1000 m
+    fetched_at = Column(DateTime(timezone=True))  # when count was last fetched, NULL for legacy rows
 
     neighborhood_id = Column(Integer, ForeignKey("neighborhoods.id"), nullable=False)
 
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String
+from database import Base
+
+class AppMetadata(Base):
+    """Key/value markers such as the schema version, checked at startup"""
+    __tablename__ = "app_metadata"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
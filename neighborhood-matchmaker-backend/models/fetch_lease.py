@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from database import Base
+
+class FetchLease(Base):
+    """Which worker process is fetching a neighborhood's amenities, until the lease expires"""
+    __tablename__ = "amenity_fetch_leases"
+
+    neighborhood_id = Column(Integer, primary_key=True, autoincrement=False)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
 
 class Neighborhood(Base):
     __tablename__ = "neighborhoods"
+    __table_args__ = (
+        # Names are unique within a city, also serves the city filter of every search
+        Index("uq_neighborhoods_city_name", "city", "name", unique=True),
+        # Destination lookups by name without a city
+        Index("ix_neighborhoods_name", "name"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable=False)
@@ -1,10 +1,17 @@
 from database import Base
-from sqlalchemy import Column, Float, Integer, ForeignKey, Enum
+from sqlalchemy import Column, Float, Integer, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from enums.rent_type import RentTypeEnum
 
 class NeighborhoodRent(Base):
     __tablename__ = "neighborhood_rents"
+    __table_args__ = (
+        # One price per rent type and neighborhood, the included price covers the search budget filter
+        Index(
+            "uq_neighborhood_rents_neighborhood_type", "neighborhood_id", "type",
+            unique=True, postgresql_include=["avg_price"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     neighborhood_id = Column(Integer, ForeignKey("neighborhoods.id"), nullable=False)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+class SeedRun(Base):
+    """Content hash of the last seed files loaded for a city, makes reseeding idempotent"""
+    __tablename__ = "seed_runs"
+
+    city = Column(String, primary_key=True)
+    content_hash = Column(String, nullable=False)
+    seeded_at = Column(DateTime(timezone=True), nullable=False)
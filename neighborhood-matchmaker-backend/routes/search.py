@@ -1,31 +1,86 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import aiohttp
 from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
 from dtos.amenity_count_result import AmenityCountResult
-from database import get_db
+from database import get_db, SessionLocal
+from http_client import get_http_session
 from typing import List
 from services.neighborhood_amenity_service import NeighborhoodAmenityService
+from services.overpass_api_service import OverpassAPIService
 import logging
+import asyncio
+import json
 from dtos.search_result import SearchResult
 
 router = APIRouter()
 
+# How often a blocking search checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def cancel_on_disconnect(request: Request, awaitable):
+    """Await a search, cancelling it and its fetch workers if the client goes away first"""
+    
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
+
 @router.post("/search-neighborhoods", response_model=SearchResult)
 async def search_neighborhoods(
     search_dto: NeighborhoodSearchDTO,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: Session = Depends(get_db),
+    http_session: aiohttp.ClientSession = Depends(get_http_session)
 ):
     """Endpoint to search neighborhoods and fetch amenity data"""
     
     try:
-        service = NeighborhoodAmenityService(db)
-        results = await service.process_neighborhood_search(search_dto)
+        service = NeighborhoodAmenityService(db, OverpassAPIService(http_session))
+        results = await cancel_on_disconnect(request, service.process_neighborhood_search(search_dto))
         
         if not results:
             raise HTTPException(status_code=404, detail="No neighborhoods found matching criteria")
         
         return results
         
+    except ClientDisconnected:
+        logging.info("Client disconnected, neighborhood search cancelled")
+        raise HTTPException(status_code=499, detail="Client closed request")
     except Exception as e:
         logging.error(f"Error in neighborhood search: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.post("/search-neighborhoods/stream")
+async def stream_search_neighborhoods(
+    search_dto: NeighborhoodSearchDTO,
+    http_session: aiohttp.ClientSession = Depends(get_http_session)
+):
+    """Streaming search, emits NDJSON events as each neighborhood is scored"""
+    
+    async def events():
+        # The stream outlives yield dependencies, so it owns its session
+        db = SessionLocal()
+        try:
+            service = NeighborhoodAmenityService(db, OverpassAPIService(http_session))
+            async for event in service.stream_neighborhood_search(search_dto):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logging.error(f"Error in streaming neighborhood search: {e}")
+            yield json.dumps({"event": "error", "detail": "Internal server error"}) + "\n"
+        finally:
+            db.close()
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
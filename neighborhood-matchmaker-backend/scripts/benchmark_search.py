@@ -0,0 +1,262 @@
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+import numpy as np
+from database import SessionLocal, migrate_schema
+from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
+from enums.amenity_type import AmenityTypeEnum
+from models.amenity import Amenity
+from models.neighborhood import Neighborhood
+from services.amenity_service import AmenityService
+from services.commute_service import CommuteService, invalidate_commute_matrices
+from services.database_service import DatabaseService
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+from services.overpass_api_service import OverpassAPIService
+from services.overpass_cache import OverpassResponseCache
+from services.overpass_scheduler import OverpassScheduler
+from services.poi_tile_service import POITileService
+from services.scoring_service import ScoringService
+from services.search_result_cache import search_result_cache
+from scripts.generate_synthetic_city import DEFAULT_BBOX, generate_synthetic_city
+from scripts.overpass_stub import OverpassStub, start_overpass_stub
+
+
+class StageRecorder:
+    """Latency samples and wall time per benchmark stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.wall_seconds: Dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def sample(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[stage].append(time.perf_counter() - started)
+
+    @contextmanager
+    def wall(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wall_seconds[stage] += time.perf_counter() - started
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for stage, samples in self.samples.items():
+            milliseconds = np.array(samples) * 1000
+            wall_seconds = self.wall_seconds.get(stage) or float(np.sum(samples))
+            report[stage] = {
+                "n": len(samples),
+                "p50_ms": float(np.percentile(milliseconds, 50)),
+                "p95_ms": float(np.percentile(milliseconds, 95)),
+                "p99_ms": float(np.percentile(milliseconds, 99)),
+                "throughput_per_s": len(samples) / wall_seconds if wall_seconds else 0.0,
+            }
+        return report
+
+
+def reset_amenity_caches():
+    """Forget every fetched tile and response so the next fetch goes to the stub"""
+    POITileService._tiles.clear()
+    OverpassAPIService.cache.clear_memory()
+
+
+async def bench_database(recorder: StageRecorder, city: str, iterations: int) -> List[Neighborhood]:
+    db = SessionLocal()
+    try:
+        database_service = DatabaseService(db)
+        amenity_service = AmenityService(db)
+        for _ in range(iterations):
+            with recorder.sample("db_load"):
+                neighborhoods = database_service.get_neighborhoods_with_coordinates(city)
+            db.expunge_all()
+
+        ids = [neighborhood.id for neighborhood in neighborhoods]
+        for _ in range(iterations):
+            with recorder.sample("db_stored_counts"):
+                amenity_service.get_stored_amenity_counts(ids, list(AmenityTypeEnum))
+        return neighborhoods
+    finally:
+        db.close()
+
+
+def bench_commute(recorder: StageRecorder, city: str, neighborhoods: List[Neighborhood], iterations: int):
+    # A build loads the city's current rows, so it needs a session
+    db = SessionLocal()
+    try:
+        commute_service = CommuteService(db)
+        destination = neighborhoods[0].name
+        for _ in range(iterations):
+            invalidate_commute_matrices(city)
+            with recorder.sample("commute_matrix_build"):
+                commute_service.get_commute_times(city, neighborhoods, destination)
+        for _ in range(iterations):
+            with recorder.sample("commute_lookup"):
+                commute_service.get_commute_times(city, neighborhoods, destination)
+    finally:
+        db.close()
+
+
+def bench_scoring(recorder: StageRecorder, neighborhood_count: int, iterations: int):
+    scoring_service = ScoringService()
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, 6, (neighborhood_count, len(AmenityTypeEnum)))
+    commute_times = rng.uniform(5, 90, neighborhood_count)
+    for search_all in (True, False):
+        amenities = list(AmenityTypeEnum) if search_all else [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK]
+        stage = "scoring_dynamic" if search_all else "scoring_targeted"
+        for _ in range(iterations):
+            with recorder.sample(stage):
+                scoring_service.calculate_neighborhood_scores(counts, amenities, commute_times, 45, None, search_all)
+
+
+async def bench_amenity_fetch(
+    recorder: StageRecorder,
+    neighborhoods: List[Neighborhood],
+    sample_size: int,
+    concurrency: int
+):
+    sample = neighborhoods[:sample_size]
+    semaphore = asyncio.Semaphore(concurrency)
+    db = SessionLocal()
+    amenity_service = AmenityService(db)
+
+    async def fetch(stage: str, neighborhood: Neighborhood):
+        async with semaphore:
+            with recorder.sample(stage):
+                # No stored counts and deferred rows, so only the fetch path is measured
+                await amenity_service.get_amenity_counts(neighborhood, list(AmenityTypeEnum), {}, [])
+
+    try:
+        for stage in ("amenity_fetch_cold", "amenity_fetch_warm_tiles"):
+            if stage == "amenity_fetch_cold":
+                reset_amenity_caches()
+            with recorder.wall(stage):
+                await asyncio.gather(*[fetch(stage, neighborhood) for neighborhood in sample])
+    finally:
+        db.close()
+
+
+def delete_amenity_rows(neighborhoods: List[Neighborhood]):
+    """Drop the stored counts of the benchmark city, earlier runs and stages leave them behind"""
+    db = SessionLocal()
+    try:
+        db.query(Amenity).filter(
+            Amenity.neighborhood_id.in_([neighborhood.id for neighborhood in neighborhoods])
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def bench_search(recorder: StageRecorder, city: str, neighborhoods: List[Neighborhood], iterations: int):
+    # The cold search starts from nothing: no stored counts, tiles or responses
+    delete_amenity_rows(neighborhoods)
+    reset_amenity_caches()
+
+    destination = neighborhoods[0].name
+    for iteration in range(iterations):
+        search_result_cache.clear()
+        stage = "search_cold" if iteration == 0 else "search_warm"
+        db = SessionLocal()
+        try:
+            search_dto = NeighborhoodSearchDTO(
+                city=city, destination_neighborhood=destination, max_commute_time=45,
+                budget=100000, amenities=None, rent_types=None
+            )
+            with recorder.sample(stage):
+                await NeighborhoodAmenityService(db).process_neighborhood_search(search_dto)
+        finally:
+            db.close()
+
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    print(f"{'stage':<26}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+    for stage, stats in report.items():
+        print(
+            f"{stage:<26}{stats['n']:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            f"{stats['p99_ms']:>10.2f}{stats['throughput_per_s']:>12.1f}"
+        )
+
+
+async def run(args) -> Dict:
+    city = f"{args.city_prefix} {args.neighborhoods}"
+    migrate_schema()
+    if args.generate:
+        generate_synthetic_city(city, args.neighborhoods)
+
+    stub = OverpassStub(
+        *DEFAULT_BBOX, poi_count=args.pois,
+        latency_seconds=args.latency, latency_jitter_seconds=args.jitter, throttle_ratio=args.throttle_ratio,
+        retry_after_seconds=0.05
+    )
+    runner = await start_overpass_stub(stub)
+
+    # Benchmarks measure the pipeline, not the production politeness limits or a warm disk cache or POI store
+    OverpassAPIService.cache = OverpassResponseCache(cache_dir=None, max_memory_entries=0)
+    POITileService.store = None
+    OverpassAPIService.scheduler = OverpassScheduler(
+        rate_per_second=args.overpass_rate, burst=args.overpass_concurrency,
+        max_concurrency=args.overpass_concurrency, backoff_base_seconds=0.05
+    )
+
+    recorder = StageRecorder()
+    try:
+        neighborhoods = await bench_database(recorder, city, args.iterations)
+        if not neighborhoods:
+            raise SystemExit(f"No neighborhoods for {city}, run with --generate")
+
+        bench_commute(recorder, city, neighborhoods, args.iterations)
+        bench_scoring(recorder, len(neighborhoods), args.iterations)
+        await bench_amenity_fetch(recorder, neighborhoods, args.sample, args.concurrency)
+        await bench_search(recorder, city, neighborhoods, args.search_iterations)
+    finally:
+        await runner.cleanup()
+
+    report = recorder.report()
+    print(f"🏙️ {city}: {len(neighborhoods)} neighborhoods, stub answered {stub.requests} requests ({stub.throttled} throttled)")
+    print_report(report)
+    return {
+        "city": city,
+        "neighborhoods": len(neighborhoods),
+        "stub_requests": stub.requests,
+        "stub_throttled": stub.throttled,
+        "stages": report,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage benchmarks for the search pipeline against a local Overpass stub")
+    parser.add_argument("--neighborhoods", type=int, default=28, help="Synthetic city size, 28 matches Montreal")
+    parser.add_argument("--city-prefix", default="Synthetic")
+    parser.add_argument("--generate", action="store_true", help="Create or refresh the synthetic city first")
+    parser.add_argument("--iterations", type=int, default=20, help="Repetitions of the DB, commute and scoring stages")
+    parser.add_argument("--search-iterations", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=50, help="Neighborhoods in the amenity fetch stages")
+    parser.add_argument("--concurrency", type=int, default=5, help="Concurrent amenity fetches, like the search batches")
+    parser.add_argument("--pois", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--throttle-ratio", type=float, default=0.0)
+    parser.add_argument("--overpass-rate", type=float, default=50.0, help="Scheduler requests per second")
+    parser.add_argument("--overpass-concurrency", type=int, default=8)
+    parser.add_argument("--json", help="Also write the report to this file, for comparing runs")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+# Runs in a fresh interpreter so nothing is already imported
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({
+    "import_seconds": time.perf_counter() - started,
+    "pandas_imported": "pandas" in sys.modules,
+}))
+"""
+
+
+def measure_import() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_response(timeout_seconds: float = 60) -> float:
+    """Seconds from launching uvicorn until GET / answers"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout_seconds:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"No response within {timeout_seconds}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark: import time and time to first response")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must be set, the first run also migrates and seeds that database")
+
+    imports = [measure_import() for _ in range(args.runs)]
+    first_responses = [measure_first_response() for _ in range(args.runs)]
+    import_seconds = [run["import_seconds"] for run in imports]
+
+    print(f"📦 import main: median {statistics.median(import_seconds) * 1000:.0f} ms, max {max(import_seconds) * 1000:.0f} ms")
+    print(f"🐼 pandas imported at startup: {any(run['pandas_imported'] for run in imports)}")
+    print(
+        f"🚀 time to first response: median {statistics.median(first_responses) * 1000:.0f} ms, "
+        f"max {max(first_responses) * 1000:.0f} ms (first run {first_responses[0] * 1000:.0f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
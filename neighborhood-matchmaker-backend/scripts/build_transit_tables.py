@@ -0,0 +1,68 @@
+import sys
+import time
+import argparse
+from datetime import datetime
+import numpy as np
+from database import SessionLocal
+from services.database_service import DatabaseService
+from services.transit_router import DEFAULT_BUCKETS, TransitTimeTable, TransitTimetable, transit_table_path
+
+
+def parse_bucket(value: str):
+    """name=HH:MM-HH:MM, e.g. am_peak=07:00-09:00"""
+    name, window = value.split("=")
+    start, end = (int(hours) * 3600 + int(minutes) * 60 for hours, minutes in (part.split(":") for part in window.split("-")))
+    return name, start, end
+
+
+def build_city(city: str, feed: str, service_date=None, buckets=DEFAULT_BUCKETS, sample_minutes: int = 10, output=None) -> TransitTimeTable:
+    """Route every neighborhood pair of a city over a GTFS feed and save the travel-time table"""
+
+    started = time.perf_counter()
+    timetable = TransitTimetable.from_gtfs(feed, service_date)
+    print(f"🚇 Loaded {len(timetable.stop_lats)} stops in {len(timetable.patterns)} patterns in {time.perf_counter() - started:.2f}s")
+
+    db = SessionLocal()
+    try:
+        neighborhoods = DatabaseService(db).get_neighborhoods_with_coordinates(city)
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    table = TransitTimeTable.build(
+        timetable,
+        [neighborhood.name for neighborhood in neighborhoods],
+        np.array([neighborhood.coordinates.lat for neighborhood in neighborhoods]),
+        np.array([neighborhood.coordinates.lon for neighborhood in neighborhoods]),
+        buckets,
+        sample_minutes
+    )
+
+    path = output or transit_table_path(city)
+    table.save(path)
+    print(
+        f"✅ Saved {len(neighborhoods)}x{len(neighborhoods)} transit times for {len(buckets)} departure windows "
+        f"to {path} in {time.perf_counter() - started:.2f}s, restart the API to use them"
+    )
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute neighborhood transit times from a GTFS feed")
+    parser.add_argument("--gtfs", required=True, help="GTFS feed, a .zip or an extracted directory (e.g. the STM feed)")
+    parser.add_argument("--city", default="Montreal")
+    parser.add_argument("--date", help="Service day YYYYMMDD, default the busiest day of the feed's first two weeks")
+    parser.add_argument(
+        "--bucket", action="append", type=parse_bucket,
+        help="Departure window name=HH:MM-HH:MM, repeatable, default am_peak, midday, pm_peak and evening"
+    )
+    parser.add_argument("--sample-minutes", type=int, default=10, help="Departures sampled within each window")
+    parser.add_argument("--output", help="Table path, default the one the API loads for the city")
+    args = parser.parse_args(argv)
+
+    service_date = datetime.strptime(args.date, "%Y%m%d").date() if args.date else None
+    build_city(args.city, args.gtfs, service_date, args.bucket or DEFAULT_BUCKETS, args.sample_minutes, args.output)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Tuple
+from sqlalchemy import Integer, cast, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from database import SessionLocal, migrate_schema
+from models import Coordinates, Neighborhood, NeighborhoodRent
+from models.seed_run import SeedRun
+from enums.rent_type import RentTypeEnum
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+COORDINATES_CSV_PATH = os.path.join("data", "neighborhood_coordinates.csv")
+RENTS_CSV_PATH = os.path.join("data", "neighborhood_rents.csv")
+
+
+def content_hash(city: str, *paths: str) -> str:
+    digest = hashlib.sha256(city.encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def load_neighborhoods(db: Session, df: "pd.DataFrame", city: str) -> Dict[str, int]:
+    """Insert new neighborhoods and move existing ones, returns name -> neighborhood id"""
+
+    df = df.drop_duplicates("neighborhood", keep="last")
+
+    # One query maps every existing name of the city
+    existing: Dict[str, Tuple[int, int]] = {
+        name: (neighborhood_id, coordinates_id)
+        for name, neighborhood_id, coordinates_id in db.execute(
+            select(Neighborhood.name, Neighborhood.id, Neighborhood.coordinates_id).where(Neighborhood.city == city)
+        )
+    }
+
+    is_new = ~df["neighborhood"].isin(list(existing))
+    new_rows, old_rows = df[is_new], df[~is_new]
+
+    if len(old_rows):
+        db.execute(update(Coordinates), [
+            {"id": existing[name][1], "lat": float(lat), "lon": float(lon)}
+            for name, lat, lon in old_rows[["neighborhood", "latitude", "longitude"]].itertuples(index=False)
+        ])
+
+    neighborhood_ids = {name: ids[0] for name, ids in existing.items()}
+    if len(new_rows):
+        coordinate_ids = db.scalars(
+            insert(Coordinates).returning(Coordinates.id, sort_by_parameter_order=True),
+            [{"lat": float(lat), "lon": float(lon)} for lat, lon in new_rows[["latitude", "longitude"]].itertuples(index=False)]
+        ).all()
+        inserted_ids = db.scalars(
+            insert(Neighborhood).returning(Neighborhood.id, sort_by_parameter_order=True),
+            [
+                {"name": name, "city": city, "coordinates_id": coordinates_id}
+                for name, coordinates_id in zip(new_rows["neighborhood"], coordinate_ids)
+            ]
+        ).all()
+        neighborhood_ids.update(zip(new_rows["neighborhood"], inserted_ids))
+
+    return neighborhood_ids
+
+
+def load_rents(db: Session, df: "pd.DataFrame", city: str, neighborhood_ids: Dict[str, int]) -> int:
+    """Replace the city's rents and recompute avg_price with one aggregate UPDATE"""
+
+    known = df["neighborhood"].isin(list(neighborhood_ids))
+    if not known.all():
+        missing = sorted(set(df.loc[~known, "neighborhood"]))
+        logging.warning(f"⚠️ Skipping rents of {len(missing)} unknown neighborhoods: {', '.join(missing[:10])}")
+    df = df[known]
+
+    city_ids = select(Neighborhood.id).where(Neighborhood.city == city)
+    db.execute(delete(NeighborhoodRent).where(NeighborhoodRent.neighborhood_id.in_(city_ids)))
+
+    if len(df):
+        db.execute(insert(NeighborhoodRent), [
+            {"neighborhood_id": neighborhood_ids[name], "type": RentTypeEnum(rent_type), "avg_price": float(avg_price)}
+            for name, rent_type, avg_price in df[["neighborhood", "type", "avg_price"]].itertuples(index=False)
+        ])
+
+    average_rent = select(
+        cast(func.round(func.avg(NeighborhoodRent.avg_price)), Integer)
+    ).where(NeighborhoodRent.neighborhood_id == Neighborhood.id).scalar_subquery()
+    db.execute(
+        update(Neighborhood).where(Neighborhood.city == city).values(avg_price=average_rent),
+        execution_options={"synchronize_session": False}
+    )
+
+    return len(df)
+
+
+def seed_city(
+    city: str = "Montreal",
+    coordinates_csv: str = COORDINATES_CSV_PATH,
+    rents_csv: str = RENTS_CSV_PATH,
+    force: bool = False
+) -> bool:
+    """Load a city's neighborhoods and rents in one transaction, skipped when the files are unchanged"""
+
+    seed_hash = content_hash(city, coordinates_csv, rents_csv)
+    db = SessionLocal()
+    try:
+        seed_run = db.get(SeedRun, city)
+        if seed_run is not None and seed_run.content_hash == seed_hash and not force:
+            logging.info(f"{city} already seeded from these files, skipping...")
+            return False
+
+        # pandas is only paid for when files actually changed, not on every startup
+        import pandas as pd
+
+        started = time.perf_counter()
+        neighborhood_ids = load_neighborhoods(db, pd.read_csv(coordinates_csv), city)
+        rent_count = load_rents(db, pd.read_csv(rents_csv), city, neighborhood_ids)
+
+        if seed_run is None:
+            seed_run = SeedRun(city=city)
+            db.add(seed_run)
+        seed_run.content_hash = seed_hash
+        seed_run.seeded_at = datetime.now(timezone.utc)
+
+        db.commit()
+        logging.info(
+            f"✅ Seeded {len(neighborhood_ids)} neighborhoods and {rent_count} rents for {city} "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return True
+
+    except Exception as e:
+        db.rollback()
+        logging.error(f"❌ Error seeding {city}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load neighborhoods and rents of a city from CSV files")
+    parser.add_argument("--city", default="Montreal")
+    parser.add_argument("--coordinates", default=COORDINATES_CSV_PATH, help="CSV with neighborhood,latitude,longitude")
+    parser.add_argument("--rents", default=RENTS_CSV_PATH, help="CSV with neighborhood,type,avg_price")
+    parser.add_argument("--force", action="store_true", help="Reload even if the files were already seeded")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    migrate_schema()
+    seed_city(args.city, args.coordinates, args.rents, args.force)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
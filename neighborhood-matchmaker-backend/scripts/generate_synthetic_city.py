@@ -0,0 +1,66 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from database import SessionLocal, migrate_schema
+from enums.rent_type import RentTypeEnum
+from scripts.bulk_seed import load_neighborhoods, load_rents
+
+# Montreal-sized default footprint
+DEFAULT_BBOX = (45.40, -73.95, 45.70, -73.45)
+
+
+def generate_city_frames(neighborhood_count: int, bbox=DEFAULT_BBOX, seed: int = 42):
+    """Random neighborhoods inside a bounding box with one rent per rent type, as seed-file shaped DataFrames"""
+    rng = np.random.default_rng(seed)
+    south, west, north, east = bbox
+
+    names = [f"Synthetic {i:05d}" for i in range(neighborhood_count)]
+    coordinates = pd.DataFrame({
+        "neighborhood": names,
+        "latitude": rng.uniform(south, north, neighborhood_count).round(6),
+        "longitude": rng.uniform(west, east, neighborhood_count).round(6),
+    })
+
+    # Studio around 1000, every extra bedroom roughly 350 more
+    base_rent = rng.uniform(700, 1400, neighborhood_count)
+    rents = pd.DataFrame({
+        "neighborhood": np.repeat(names, len(RentTypeEnum)),
+        "type": [rent_type.value for rent_type in RentTypeEnum] * neighborhood_count,
+        "avg_price": (
+            np.repeat(base_rent, len(RentTypeEnum))
+            + np.tile(np.arange(len(RentTypeEnum)) * 350, neighborhood_count)
+        ).round(),
+    })
+    return coordinates, rents
+
+
+def generate_synthetic_city(city: str, neighborhood_count: int, bbox=DEFAULT_BBOX, seed: int = 42):
+    """Load (or replace) a synthetic city through the bulk seed pipeline"""
+    coordinates, rents = generate_city_frames(neighborhood_count, bbox, seed)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        neighborhood_ids = load_neighborhoods(db, coordinates, city)
+        load_rents(db, rents, city, neighborhood_ids)
+        db.commit()
+        print(f"✅ Generated {neighborhood_count} neighborhoods for {city} in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic city for benchmarks")
+    parser.add_argument("--city", default="Synthetic")
+    parser.add_argument("--neighborhoods", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    migrate_schema()
+    generate_synthetic_city(args.city, args.neighborhoods, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,184 @@
+import os
+import json
+import queue
+import argparse
+import threading
+from array import array
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+import numpy as np
+from shapely.geometry import shape
+from services.amenity_taxonomy import AMENITY_INDEX, classify_tags
+from services.local_poi_index import LocalPOIIndex, LOCAL_POI_INDEX_PATH
+
+# The .osm.pbf reader hands points over in chunks, at most this many chunks wait for the consumer
+PBF_CHUNK_POINTS = 1024
+PBF_BUFFERED_CHUNKS = 16
+
+
+def classify(tags: Dict[str, str]) -> Optional[str]:
+    """Classify with the same registry as Overpass responses, so offline counts match live ones"""
+    amenity_type = classify_tags(tags)
+    return amenity_type.value if amenity_type else None
+
+
+def iter_geojson_points(path: str) -> Iterator[Tuple[float, float, Dict[str, str]]]:
+    """
+    Stream (lat, lon, tags) from a GeoJSON FeatureCollection or GeoJSON sequence file
+
+    Sequences are read one feature per line. FeatureCollections are streamed
+    with ijson when it is installed, without it the whole file is loaded.
+    """
+    with open(path, "rb") as f:
+        first_line = f.readline()
+        f.seek(0)
+
+        try:
+            is_sequence = json.loads(first_line.strip().lstrip(b"\x1e")).get("type") == "Feature"
+        except (ValueError, AttributeError):
+            is_sequence = False
+
+        features = (
+            json.loads(line.strip().lstrip(b"\x1e")) for line in f if line.strip()
+        ) if is_sequence else iter_collection_features(f)
+
+        for feature in features:
+            geometry = feature.get("geometry")
+            if not geometry:
+                continue
+            min_lon, min_lat, max_lon, max_lat = shape(geometry).bounds
+            yield (min_lat + max_lat) / 2, (min_lon + max_lon) / 2, feature.get("properties") or {}
+
+
+def iter_collection_features(f: BinaryIO) -> Iterator[Dict]:
+    """Features of a FeatureCollection, parsed incrementally when ijson is available"""
+    try:
+        import ijson
+    except ImportError:
+        yield from json.load(f).get("features", [])
+        return
+
+    yield from ijson.items(f, "features.item", use_float=True)
+
+
+def bbox_center(locations: Iterable) -> Optional[Tuple[float, float]]:
+    """Center of the bounding box, the position Overpass `out center` reports for ways"""
+    lats, lons = [], []
+    for location in locations:
+        lats.append(location.lat)
+        lons.append(location.lon)
+    if not lats:
+        return None
+    return (min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2
+
+
+class _ReadStopped(Exception):
+    """Raised inside the osmium handler once the consumer closed the generator"""
+
+
+def iter_pbf_points(path: str) -> Iterator[Tuple[float, float, Dict[str, str]]]:
+    """Stream (lat, lon, tags) for tagged nodes and way bbox centers of an .osm.pbf extract"""
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Reading .osm.pbf extracts requires pyosmium: pip install osmium")
+
+    # osmium pushes elements into a handler, it runs in a thread and blocks while the buffer is full
+    chunks = queue.Queue(maxsize=PBF_BUFFERED_CHUNKS)
+    stopped = threading.Event()
+    errors = []
+
+    def hand_over(chunk) -> bool:
+        while not stopped.is_set():
+            try:
+                chunks.put(chunk, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    class Handler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.chunk = []
+
+        def add(self, lat, lon, tags):
+            self.chunk.append((lat, lon, tags))
+            if len(self.chunk) >= PBF_CHUNK_POINTS:
+                if not hand_over(self.chunk):
+                    raise _ReadStopped()
+                self.chunk = []
+
+        def node(self, node):
+            tags = dict(node.tags)
+            if classify(tags) and node.location.valid():
+                self.add(node.location.lat, node.location.lon, tags)
+
+        def way(self, way):
+            tags = dict(way.tags)
+            if not classify(tags):
+                return
+            center = bbox_center(node.location for node in way.nodes if node.location.valid())
+            if center:
+                self.add(center[0], center[1], tags)
+
+    def read():
+        try:
+            handler = Handler()
+            handler.apply_file(path, locations=True)
+            hand_over(handler.chunk)
+        except _ReadStopped:
+            pass
+        except BaseException as error:
+            errors.append(error)
+        finally:
+            hand_over(None)
+
+    reader = threading.Thread(target=read, name="osm-pbf-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield from chunk
+        if errors:
+            raise errors[0]
+    finally:
+        stopped.set()
+        reader.join()
+
+
+def ingest_osm_extract(input_path: str, output_path: str = LOCAL_POI_INDEX_PATH) -> int:
+    """Classify an OSM extract and write the local POI index, returns the number of points"""
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"OSM extract not found at {input_path}")
+
+    reader = iter_pbf_points if input_path.endswith(".pbf") else iter_geojson_points
+
+    # Typed arrays hold only the matching points, 17 bytes each instead of three Python objects
+    lats, lons, types = array("d"), array("d"), array("b")
+    for lat, lon, tags in reader(input_path):
+        amenity_type = classify(tags)
+        if amenity_type:
+            lats.append(lat)
+            lons.append(lon)
+            types.append(AMENITY_INDEX[amenity_type])
+
+    index = LocalPOIIndex(
+        np.array(lats, dtype=np.float64),
+        np.array(lons, dtype=np.float64),
+        np.array(types, dtype=np.int8)
+    )
+    index.save(output_path)
+
+    print(f"✅ Indexed {len(index)} POIs from {input_path} into {output_path}")
+    return len(index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local POI index from an OSM extract")
+    parser.add_argument("input_path", help="City extract as .osm.pbf, GeoJSON or GeoJSON sequence")
+    parser.add_argument("--output", default=LOCAL_POI_INDEX_PATH, help="Where to write the .npz index")
+    args = parser.parse_args()
+
+    ingest_osm_extract(args.input_path, args.output)
@@ -0,0 +1,139 @@
+import re
+import sys
+import math
+import random
+import asyncio
+import argparse
+import numpy as np
+from aiohttp import web
+from services.amenity_taxonomy import QUERY_TAGS
+from services.overpass_api_service import OverpassAPIService
+
+BBOX_PATTERN = re.compile(r"\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+AROUND_PATTERN = re.compile(r"around:([\d.]+),(-?[\d.]+),(-?[\d.]+)")
+
+# Every tag the real service queries for, so each stub POI classifies to an amenity type
+STUB_TAGS = QUERY_TAGS
+
+
+class OverpassStub:
+    """
+    Local stand-in for the Overpass interpreter endpoint
+
+    Serves random tagged nodes inside a bounding box for bbox and around:
+    queries, with configurable latency and a share of 429 responses carrying
+    Retry-After, so the search pipeline can be measured without the network.
+    """
+
+    def __init__(
+        self,
+        south: float,
+        west: float,
+        north: float,
+        east: float,
+        poi_count: int = 20000,
+        latency_seconds: float = 0.0,
+        latency_jitter_seconds: float = 0.0,
+        throttle_ratio: float = 0.0,
+        retry_after_seconds: float = 1.0,
+        seed: int = 42
+    ):
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.throttle_ratio = throttle_ratio
+        self.retry_after_seconds = retry_after_seconds
+        self.random = random.Random(seed)
+
+        rng = np.random.default_rng(seed)
+        lats = rng.uniform(south, north, poi_count)
+        order = np.argsort(lats)  # sorted by latitude so bbox queries bisect instead of scanning
+        self.lats = lats[order]
+        self.lons = rng.uniform(west, east, poi_count)[order]
+        self.tags = rng.integers(0, len(STUB_TAGS), poi_count)[order]
+
+        self.requests = 0
+        self.throttled = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/interpreter", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        query = await request.text()
+
+        delay = self.latency_seconds + self.random.uniform(0, self.latency_jitter_seconds)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.random.random() < self.throttle_ratio:
+            self.throttled += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after_seconds)})
+
+        return web.json_response({"elements": self._elements(query)})
+
+    def _elements(self, query: str):
+        around = AROUND_PATTERN.search(query)
+        if around:
+            radius, lat, lon = map(float, around.groups())
+            dlat = radius / 111320
+            south, north = lat - dlat, lat + dlat
+        else:
+            south, _, north, _ = map(float, BBOX_PATTERN.search(query).groups())
+
+        start, end = np.searchsorted(self.lats, [south, north])
+        ids = np.arange(start, end) + 1
+        lats, lons, tags = self.lats[start:end], self.lons[start:end], self.tags[start:end]
+
+        if around:
+            lat_rad = math.radians(lat)
+            a = (
+                np.sin(np.radians(lats - lat) / 2) ** 2
+                + math.cos(lat_rad) * np.cos(np.radians(lats)) * np.sin(np.radians(lons - lon) / 2) ** 2
+            )
+            mask = 2 * 6371000 * np.arcsin(np.sqrt(a)) <= radius
+        else:
+            _, west, _, east = map(float, BBOX_PATTERN.search(query).groups())
+            mask = (lons >= west) & (lons <= east)
+
+        return [
+            {"type": "node", "id": int(osm_id), "lat": float(lat), "lon": float(lon), "tags": {STUB_TAGS[tag][0]: STUB_TAGS[tag][1]}}
+            for osm_id, lat, lon, tag in zip(ids[mask], lats[mask], lons[mask], tags[mask])
+        ]
+
+
+async def start_overpass_stub(stub: OverpassStub, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+    """Serve the stub and point OverpassAPIService at it, port 0 picks a free port"""
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    bound_port = site._server.sockets[0].getsockname()[1]
+    OverpassAPIService.api_url = f"http://{host}:{bound_port}/api/interpreter"
+    return runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local Overpass stand-in")
+    parser.add_argument("--bbox", default="45.40,-73.95,45.70,-73.45", help="south,west,north,east of the POIs")
+    parser.add_argument("--pois", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency up to this many seconds")
+    parser.add_argument("--throttle-ratio", type=float, default=0.0, help="Share of requests answered with 429")
+    args = parser.parse_args(argv)
+
+    south, west, north, east = map(float, args.bbox.split(","))
+    stub = OverpassStub(
+        south, west, north, east, args.pois,
+        latency_seconds=args.latency, latency_jitter_seconds=args.jitter, throttle_ratio=args.throttle_ratio
+    )
+
+    print(f"🛰️ Overpass stub on http://127.0.0.1:{args.port}/api/interpreter, set OVERPASS_API_URL to use it")
+    web.run_app(stub.app(), host="127.0.0.1", port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
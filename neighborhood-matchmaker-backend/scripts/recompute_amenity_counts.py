@@ -0,0 +1,64 @@
+import sys
+import time
+import argparse
+from datetime import datetime, timezone
+from database import SessionLocal
+from enums.amenity_type import AmenityTypeEnum
+from services.amenity_service import AmenityService
+from services.database_service import DatabaseService
+from services.poi_store import POI_STORE_DIR, POIStore
+from services.poi_tile_service import POITileService
+
+
+def recompute_city(city: str, store: POIStore) -> int:
+    """Rewrite stored amenity counts of a city at every radius from persisted POI tiles, returns neighborhoods updated"""
+
+    db = SessionLocal()
+    try:
+        tile_service = POITileService(None)
+        tile_service.store = store
+        amenity_service = AmenityService(db)
+
+        started = time.perf_counter()
+        rows, skipped = [], []
+        for neighborhood in DatabaseService(db).get_neighborhoods_with_coordinates(city):
+            stored = tile_service.count_from_store(
+                neighborhood.coordinates.lat, neighborhood.coordinates.lon, list(AmenityTypeEnum), AmenityService.RADII_METERS
+            )
+            if stored is None:
+                skipped.append(neighborhood.name)
+                continue
+
+            counts_by_radius, fetched_at = stored
+            # Counts are only as fresh as the oldest tile behind them
+            fetched_at = datetime.fromtimestamp(fetched_at, timezone.utc)
+            rows.extend(
+                {**row, "fetched_at": fetched_at}
+                for row in amenity_service._build_rows(neighborhood.id, list(AmenityTypeEnum), counts_by_radius)
+            )
+
+        amenity_service.store_amenity_counts(rows)
+
+        updated = len(rows) // (len(AmenityTypeEnum) * len(AmenityService.RADII_METERS))
+        radii = ", ".join(str(radius) for radius in AmenityService.RADII_METERS)
+        print(f"✅ Recomputed {updated} neighborhoods of {city} at {radii} m in {time.perf_counter() - started:.2f}s")
+        if skipped:
+            print(f"⚠️ {len(skipped)} neighborhoods have tiles missing from the store, left as is: {', '.join(skipped[:10])}")
+        return updated
+
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute amenity counts from the POI store without calling Overpass")
+    parser.add_argument("--city", default="Montreal")
+    parser.add_argument("--store", default=POI_STORE_DIR, help="POI store directory")
+    args = parser.parse_args(argv)
+
+    store = POIStore(args.store, POITileService.tile_degrees).open()
+    recompute_city(args.city, store)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
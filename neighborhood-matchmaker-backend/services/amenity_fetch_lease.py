@@ -0,0 +1,109 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import engine, db_executor
+from models.fetch_lease import FetchLease
+
+AMENITY_FETCH_LEASE_ENABLED = os.getenv("AMENITY_FETCH_LEASE_ENABLED", "true").lower() == "true"
+AMENITY_FETCH_LEASE_TIMEOUT_SECONDS = float(os.getenv("AMENITY_FETCH_LEASE_TIMEOUT_SECONDS", 30))
+# A crashed holder blocks nobody for longer than this
+AMENITY_FETCH_LEASE_TTL_SECONDS = float(os.getenv("AMENITY_FETCH_LEASE_TTL_SECONDS", 120))
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... WHERE, the lease is taken in one statement
+LEASE_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+# Multi-process deployments run on Postgres. Elsewhere fetched rows go to the search's single bulk write
+LEASE_DIALECTS = {"postgresql"}
+
+
+class AmenityFetchLease:
+    """
+    Cross-process lease on fetching the amenities of one neighborhood
+
+    Backed by a row in amenity_fetch_leases that expires, so workers of a
+    multi-process deployment fetch a neighborhood one at a time. Taking and
+    releasing it are single short transactions, no connection is held while
+    the fetch runs.
+    """
+
+    def __init__(self, neighborhood_id: int):
+        self.neighborhood_id = neighborhood_id
+        self.held = False
+        self.contended = False  # another process held it first, stored counts may have changed
+
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def try_acquire(self) -> bool:
+        """Insert the lease row, or take it over once the previous holder's lease expired"""
+        now = datetime.now(timezone.utc)
+        statement = LEASE_INSERTS[engine.dialect.name](FetchLease).values(
+            neighborhood_id=self.neighborhood_id,
+            holder=self.holder,
+            expires_at=now + timedelta(seconds=AMENITY_FETCH_LEASE_TTL_SECONDS)
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[FetchLease.neighborhood_id],
+            set_={"holder": statement.excluded.holder, "expires_at": statement.excluded.expires_at},
+            where=FetchLease.expires_at < now
+        )
+
+        with engine.begin() as connection:
+            self.held = connection.execute(statement).rowcount == 1
+        return self.held
+
+    def release(self):
+        if not self.held:
+            return
+        try:
+            with engine.begin() as connection:
+                connection.execute(FetchLease.__table__.delete().where(
+                    FetchLease.neighborhood_id == self.neighborhood_id,
+                    FetchLease.holder == self.holder
+                ))
+        except Exception as e:
+            # The row expires on its own, waiters take it over then
+            logging.error(f"Error releasing amenity fetch lease {self.neighborhood_id}: {e}")
+        finally:
+            self.held = False
+
+
+@asynccontextmanager
+async def amenity_fetch_lease(neighborhood_id: int, poll_seconds: float = 0.2) -> AsyncIterator[AmenityFetchLease]:
+    """Wait for the cross-process fetch lease of a neighborhood, giving up after the configured timeout"""
+
+    lease = AmenityFetchLease(neighborhood_id)
+    if not AMENITY_FETCH_LEASE_ENABLED or engine.dialect.name not in LEASE_DIALECTS:
+        yield lease
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + AMENITY_FETCH_LEASE_TIMEOUT_SECONDS
+    try:
+        while True:
+            try:
+                if await loop.run_in_executor(db_executor, lease.try_acquire):
+                    break
+            except Exception as e:
+                logging.error(f"Error taking amenity fetch lease {neighborhood_id}, fetching without it: {e}")
+                break
+            lease.contended = True
+            if time.monotonic() >= deadline:
+                logging.warning(f"Timed out waiting for amenity fetch lease {neighborhood_id}, fetching anyway")
+                break
+            await asyncio.sleep(poll_seconds)
+
+        yield lease
+
+    finally:
+        await loop.run_in_executor(db_executor, lease.release)
@@ -0,0 +1,182 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from database import SessionLocal, run_db
+from enums.amenity_type import AmenityTypeEnum
+from models.amenity import Amenity
+from models.neighborhood import Neighborhood
+from services.amenity_service import AmenityService
+from services.overpass_api_service import OverpassAPIService
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+
+AMENITY_REFRESH_ENABLED = os.getenv("AMENITY_REFRESH_ENABLED", "false").lower() == "true"
+
+
+class AmenityRefreshWorker:
+    """
+    Background warm-up and refresh of stored amenity counts
+
+    Every pass fills in amenity types a neighborhood has never been counted for
+    and recounts rows older than the staleness window, so searches read from the
+    database instead of waiting on Overpass. Work only starts while no search is
+    running and the Overpass scheduler is idle, and the Overpass requests it
+    causes are capped per hour: each refresh reserves one request per tile it
+    still has to fetch before it starts. Refreshes share the single-flight
+    fetch and the cross-process lease with searches.
+    """
+
+    def __init__(
+        self,
+        overpass_service: OverpassAPIService,
+        interval_seconds: float = 3600,
+        stale_after_seconds: float = 30 * 24 * 3600,
+        max_requests_per_hour: int = 120,
+        idle_poll_seconds: float = 1.0
+    ):
+        self.overpass_service = overpass_service
+        self.interval_seconds = interval_seconds
+        self.stale_after_seconds = stale_after_seconds
+        self.max_requests_per_hour = max_requests_per_hour
+        self.idle_poll_seconds = idle_poll_seconds
+
+        self._task: Optional[asyncio.Task] = None
+        self._requests: "deque[Tuple[float, int]]" = deque()  # (monotonic time, Overpass requests) per refresh
+
+        self.refreshed = 0
+        self.failed = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Amenity refresh pass failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def refresh_once(self) -> int:
+        """Refresh every missing or stale amenity count once, returns the number of neighborhoods refreshed"""
+
+        db = SessionLocal()
+        try:
+            amenity_service = AmenityService(db, self.overpass_service)
+            work = await run_db(db, self._find_work, db)
+            if work:
+                logging.info(f"Refreshing amenity counts for {len(work)} neighborhoods")
+
+            refreshed = 0
+            for neighborhood, amenity_types in work:
+                await self._wait_until_idle()
+
+                # Reserve one request per tile the refresh has to fetch before starting it
+                reserved = amenity_service.amenity_counter.uncached_tile_count(
+                    neighborhood.coordinates.lat, neighborhood.coordinates.lon, max(AmenityService.RADII_METERS)
+                )
+                await self._reserve_budget(reserved)
+
+                requests_before = OverpassAPIService.scheduler.requests
+                try:
+                    await amenity_service.refresh_amenity_counts(neighborhood, amenity_types)
+                except Exception as e:
+                    self.failed += 1
+                    logging.error(f"Error refreshing amenities for {neighborhood.name}: {e}")
+                    continue
+                finally:
+                    # Retries can issue more than reserved, charge the difference
+                    issued = OverpassAPIService.scheduler.requests - requests_before
+                    if issued > reserved:
+                        self._requests.append((time.monotonic(), issued - reserved))
+
+                refreshed += 1
+                self.refreshed += 1
+
+            return refreshed
+        finally:
+            db.close()
+
+    def _find_work(self, db: Session) -> List[Tuple[Neighborhood, List[AmenityTypeEnum]]]:
+        """Neighborhoods with the amenity types that are missing or older than the staleness window"""
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=self.stale_after_seconds)
+
+        neighborhoods = db.query(Neighborhood).options(joinedload(Neighborhood.coordinates)).all()
+
+        # A type is fresh once every radius has a recent row, all radii are written together
+        fresh_radii: Dict[Tuple[int, AmenityTypeEnum], set] = {}
+        for neighborhood_id, amenity_type, radius_meters, fetched_at in db.query(
+            Amenity.neighborhood_id, Amenity.type, Amenity.radius_meters, Amenity.fetched_at
+        ):
+            if fetched_at is None:
+                continue
+            # SQLite hands back naive timestamps, they are stored in UTC
+            if fetched_at.tzinfo is None:
+                fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+            if fetched_at >= stale_before:
+                fresh_radii.setdefault((neighborhood_id, amenity_type), set()).add(radius_meters)
+
+        work = []
+        for neighborhood in neighborhoods:
+            if neighborhood.coordinates is None:
+                continue
+            amenity_types = [
+                amenity for amenity in AmenityTypeEnum
+                if len(fresh_radii.get((neighborhood.id, amenity), ())) < len(AmenityService.RADII_METERS)
+            ]
+            if amenity_types:
+                work.append((neighborhood, amenity_types))
+        return work
+
+    async def _wait_until_idle(self):
+        # Interactive searches and their queued Overpass calls always go first
+        while NeighborhoodAmenityService.active_searches or OverpassAPIService.scheduler.queue_depth:
+            await asyncio.sleep(self.idle_poll_seconds)
+
+    async def _reserve_budget(self, requests: int):
+        """Wait until the requests fit in the hourly budget and count them, a refresh never needs more than all of it"""
+        requests = min(requests, self.max_requests_per_hour)
+        while True:
+            window_start = time.monotonic() - 3600
+            while self._requests and self._requests[0][0] < window_start:
+                self._requests.popleft()
+
+            if sum(count for _, count in self._requests) + requests <= self.max_requests_per_hour:
+                self._requests.append((time.monotonic(), requests))
+                return
+            await asyncio.sleep(self._requests[0][0] - window_start)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "requests_last_hour": sum(count for _, count in self._requests),
+        }
+
+
+def create_amenity_refresh_worker_from_env(overpass_service: OverpassAPIService) -> AmenityRefreshWorker:
+    """Build the refresh worker from AMENITY_REFRESH_* environment variables"""
+    return AmenityRefreshWorker(
+        overpass_service,
+        interval_seconds=float(os.getenv("AMENITY_REFRESH_INTERVAL_SECONDS", 3600)),
+        stale_after_seconds=float(os.getenv("AMENITY_STALE_AFTER_SECONDS", 30 * 24 * 3600)),
+        max_requests_per_hour=int(os.getenv("AMENITY_REFRESH_MAX_REQUESTS_PER_HOUR", 120))
+    )
@@ -1,46 +1,110 @@
-from typing import Dict, List
+import asyncio
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from models.amenity import Amenity
+from models.neighborhood import Neighborhood
+from database import SessionLocal, run_db
 from enums.amenity_type import AmenityTypeEnum
+from enums.amenity_radius import AmenityRadiusEnum
 from services.overpass_api_service import OverpassAPIService
+from services.poi_tile_service import POITileService
+from services.local_poi_index import get_local_poi_index
+from services.search_result_cache import SearchVersion, search_result_cache
+from services.amenity_fetch_lease import amenity_fetch_lease
+from datetime import datetime, timezone
+from metrics import AMENITY_LOOKUPS, SEARCH_STAGE_SECONDS
 import logging
+import os
+
+AMENITY_SOURCE = os.getenv("AMENITY_SOURCE", "overpass")
 
 
 class AmenityService:
     """Service to handle amenity-related operations"""
     
-    def __init__(self, db_session: Session):
+    # Dialects supporting a native multi-row INSERT ... ON CONFLICT upsert
+    UPSERT_INSERTS = {
+        "postgresql": postgresql_insert,
+        "sqlite": sqlite_insert,
+    }
+    
+    DEFAULT_RADIUS_METERS = AmenityRadiusEnum.WALK
+    
+    # Every fetch counts all of these from the POIs covering the largest, so switching radius is free
+    RADII_METERS = [int(radius) for radius in AmenityRadiusEnum]
+    
+    # Fetches in progress per (neighborhood_id, missing amenity set), shared by concurrent searches
+    _inflight: Dict[Tuple[int, FrozenSet[AmenityTypeEnum]], asyncio.Future] = {}
+    
+    def __init__(self, db_session: Session, overpass_service: Optional[OverpassAPIService] = None, amenity_counter=None):
         self.db = db_session
+        self.overpass_service = overpass_service or OverpassAPIService()
+        
+        # Offline mode answers every count from the ingested OSM index, no Overpass calls
+        if amenity_counter is not None:
+            self.amenity_counter = amenity_counter
+        elif AMENITY_SOURCE == "local":
+            self.amenity_counter = get_local_poi_index()
+        else:
+            self.amenity_counter = POITileService(self.overpass_service)
+        
+    async def get_amenity_counts(
+        self, 
+        neighborhood, 
+        amenity_types: List[AmenityTypeEnum],
+        stored_counts: Optional[Dict[AmenityTypeEnum, int]] = None,
+        pending_rows: Optional[List[Dict]] = None,
+        radius_meters: int = DEFAULT_RADIUS_METERS,
+        search_version: Optional[SearchVersion] = None
+    ) -> Dict[str, int]:
+        """
+        Get amenity counts - check database first, then fetch from API if needed
         
-    async def get_amenity_counts(self, neighborhood, amenity_types: List[AmenityTypeEnum]) -> Dict[str, int]:
-        """Get amenity counts - check database first, then fetch from API if needed"""
+        Args:
+            neighborhood: Neighborhood with loaded coordinates
+            amenity_types: Amenities to count
+            stored_counts: Counts at radius_meters already loaded with get_stored_amenity_counts, skips the lookup
+            pending_rows: Collects fetched rows for a later store_amenity_counts call instead of writing now
+            radius_meters: One of RADII_METERS, rows for all of them are stored by any fetch
+            search_version: The calling search's version, claims the rows stored here and records failed fetches
+        """
         
         # Check what we have in database
-        existing_amenities = self._get_stored_amenities(neighborhood.id, amenity_types)
-        existing_counts = {a.type: a.count for a in existing_amenities}
+        existing_counts = stored_counts
+        if existing_counts is None:
+            stored = await run_db(self.db, self.get_stored_amenity_counts, [neighborhood.id], amenity_types, radius_meters)
+            existing_counts = stored.get(neighborhood.id, {})
         
         # Identify missing amenities
         missing_amenities = [amenity for amenity in amenity_types if amenity not in existing_counts]
         
         # If we have all amenities stored, return them
         if not missing_amenities:
+            AMENITY_LOOKUPS.labels(source="database").inc()
             logging.info(f"Using stored amenity data for neighborhood {neighborhood.name}")
             return {amenity.value: existing_counts.get(amenity, 0) for amenity in amenity_types}
         
-        # Fetch missing amenities from external API
+        # Count missing amenities from the shared POI tile grid or the local index
         logging.info(f"Fetching {len(missing_amenities)} missing amenities for {neighborhood.name}")
+        AMENITY_LOOKUPS.labels(source="fetched").inc()
         
         try:
-            fetched_counts = await OverpassAPIService.get_amenity_counts(
-                neighborhood.coordinates.lat,
-                neighborhood.coordinates.lon,
-                missing_amenities,
-                radius_meters=1000
-            )
+            with SEARCH_STAGE_SECONDS.labels(stage="amenity_fetch").time():
+                counts_by_radius, stored, invalidated = await self._fetch_missing_counts(neighborhood, missing_amenities)
+            fetched_counts = counts_by_radius[int(radius_meters)]
             
-            # Store the newly fetched amenity data
-            self._store_amenity_data(neighborhood.id, fetched_counts, missing_amenities)
+            # Store the newly fetched amenity data, or defer it to the caller's bulk write
+            if not stored:
+                rows = self._build_rows(neighborhood.id, missing_amenities, counts_by_radius)
+                if pending_rows is None:
+                    invalidated = await run_db(self.db, self.store_amenity_counts, rows)
+                else:
+                    pending_rows.extend(rows)
+            if search_version is not None:
+                search_version.claim(invalidated)
             
             # Combine existing and fetched data
             final_counts = {}
@@ -54,47 +118,221 @@ class AmenityService:
             
         except Exception as e:
             logging.error(f"Error fetching amenities for {neighborhood.name}: {e}")
+            if search_version is not None:
+                search_version.failed_fetches += 1
             # Return what we have in database, zeros for missing
             return {amenity.value: existing_counts.get(amenity, 0) for amenity in amenity_types}
     
-    def _get_stored_amenities(self, neighborhood_id: int, amenity_types: List[AmenityTypeEnum]) -> List[Amenity]:
-        """Get amenities stored in database"""
-        return self.db.query(Amenity).filter(
-            and_(
-                Amenity.neighborhood_id == neighborhood_id,
-                Amenity.type.in_(amenity_types)
-            )
-        ).all()
+    async def refresh_amenity_counts(self, neighborhood, amenity_types: List[AmenityTypeEnum]):
+        """Recount amenity types at every radius and store them, sharing the fetch and lease with searches"""
+        
+        counts_by_radius, stored, _ = await self._fetch_missing_counts(neighborhood, amenity_types)
+        if not stored:
+            await run_db(self.db, self.store_amenity_counts, self._build_rows(neighborhood.id, amenity_types, counts_by_radius))
     
-    def _store_amenity_data(self, neighborhood_id: int, amenity_counts: Dict[str, int], amenity_types: List[AmenityTypeEnum]):
-        """Store amenity data in database"""
+    async def _fetch_missing_counts(
+        self, 
+        neighborhood, 
+        missing_amenities: List[AmenityTypeEnum]
+    ) -> Tuple[Dict[int, Dict[str, int]], bool, Dict[str, int]]:
+        """
+        Counts per radius for the missing amenities, one fetch per key at a time
+        
+        Also returns whether they are already stored, and the city versions
+        storing them created, which every search sharing the fetch claims.
+        """
+        
+        key = (neighborhood.id, frozenset(missing_amenities))
+        
+        # Single flight: join the fetch another search already started for the same rows
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_under_lease(neighborhood, missing_amenities))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shielded so one cancelled search does not cancel the shared fetch
+        return await asyncio.shield(future)
+    
+    async def _fetch_under_lease(
+        self, 
+        neighborhood, 
+        missing_amenities: List[AmenityTypeEnum]
+    ) -> Tuple[Dict[int, Dict[str, int]], bool, Dict[str, int]]:
+        # Shared by every joining search, so it must not use the session of the one that started it
+        shared = AmenityService(SessionLocal(), self.overpass_service, self.amenity_counter)
         try:
-            for amenity_enum in amenity_types:
-                count = amenity_counts.get(amenity_enum.value, 0)
+            async with amenity_fetch_lease(neighborhood.id) as lease:
+                counts_by_radius = {radius: {} for radius in self.RADII_METERS}
+                remaining = missing_amenities
                 
-                # Check if record already exists
-                existing_record = self.db.query(Amenity).filter(
-                    and_(
-                        Amenity.type == amenity_enum,
-                        Amenity.neighborhood_id == neighborhood_id
+                # Another worker process fetched while we waited, reuse what it stored at every radius
+                if lease.contended:
+                    for radius in self.RADII_METERS:
+                        stored = await run_db(shared.db, shared.get_stored_amenity_counts, [neighborhood.id], missing_amenities, radius)
+                        counts_by_radius[radius] = {amenity.value: count for amenity, count in stored.get(neighborhood.id, {}).items()}
+                    remaining = [
+                        amenity for amenity in missing_amenities
+                        if any(amenity.value not in counts for counts in counts_by_radius.values())
+                    ]
+                
+                if remaining:
+                    fetched = await self.amenity_counter.get_amenity_counts_by_radius(
+                        neighborhood.coordinates.lat,
+                        neighborhood.coordinates.lon,
+                        remaining,
+                        self.RADII_METERS
                     )
-                ).first()
+                    for radius, counts in fetched.items():
+                        counts_by_radius[radius].update(counts)
                 
-                if existing_record:
-                    # Update existing record
-                    existing_record.count = count
-                else:
-                    # Create new record
-                    new_amenity = Amenity(
-                        type=amenity_enum,
-                        count=count,
-                        neighborhood_id=neighborhood_id
+                # Under a lease the rows must be written before it is released, or the next process fetches again
+                invalidated = {}
+                if lease.held and remaining:
+                    invalidated = await run_db(
+                        shared.db, shared.store_amenity_counts, self._build_rows(neighborhood.id, remaining, counts_by_radius)
                     )
-                    self.db.add(new_amenity)
+                
+                return counts_by_radius, lease.held or not remaining, invalidated
+        finally:
+            shared.db.close()
+    
+    def _build_rows(
+        self, 
+        neighborhood_id: int, 
+        amenity_types: List[AmenityTypeEnum], 
+        counts_by_radius: Dict[int, Dict[str, int]]
+    ) -> List[Dict]:
+        return [
+            {
+                "neighborhood_id": neighborhood_id,
+                "radius_meters": radius,
+                "type": amenity_enum,
+                "count": counts.get(amenity_enum.value, 0)
+            }
+            for radius, counts in counts_by_radius.items()
+            for amenity_enum in amenity_types
+        ]
+    
+    @SEARCH_STAGE_SECONDS.labels(stage="stored_counts").time()
+    def get_stored_amenity_counts(
+        self, 
+        neighborhood_ids: List[int], 
+        amenity_types: List[AmenityTypeEnum],
+        radius_meters: int = DEFAULT_RADIUS_METERS
+    ) -> Dict[int, Dict[AmenityTypeEnum, int]]:
+        """Get stored amenity counts at one radius for many neighborhoods with a single query"""
+        
+        if not neighborhood_ids:
+            return {}
+        
+        rows = self.db.query(Amenity.neighborhood_id, Amenity.type, Amenity.count).filter(
+            and_(
+                Amenity.neighborhood_id.in_(neighborhood_ids),
+                Amenity.radius_meters == int(radius_meters),
+                Amenity.type.in_(amenity_types)
+            )
+        ).all()
+        
+        stored_counts = {}
+        for neighborhood_id, amenity_type, count in rows:
+            stored_counts.setdefault(neighborhood_id, {})[amenity_type] = count
+        
+        return stored_counts
+    
+    @SEARCH_STAGE_SECONDS.labels(stage="store_counts").time()
+    def store_amenity_counts(self, rows: List[Dict]) -> Dict[str, int]:
+        """
+        Upsert amenity rows (neighborhood_id, radius_meters, type, count) in one statement
+        
+        Returns the cities whose cached search results it invalidated, with the
+        new version of each.
+        """
+        
+        # Last write wins for duplicate keys, a single upsert cannot touch a row twice
+        unique_rows = list({(row["neighborhood_id"], row["radius_meters"], row["type"]): row for row in rows}.values())
+        if not unique_rows:
+            return {}
+        
+        fetched_at = datetime.now(timezone.utc)
+        unique_rows = [{**row, "fetched_at": row.get("fetched_at", fetched_at)} for row in unique_rows]
+        
+        try:
+            changed_neighborhood_ids = self._changed_neighborhood_ids(unique_rows)
+            insert = self.UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+            
+            if insert is not None:
+                self.db.execute(self._upsert_statement(insert, unique_rows))
+            else:
+                self._store_amenity_counts_fallback(unique_rows)
             
             self.db.commit()
             
+            # Cached search results for these cities no longer match the stored counts
+            if not changed_neighborhood_ids:
+                return {}
+            cities = self.db.query(Neighborhood.city).filter(
+                Neighborhood.id.in_(changed_neighborhood_ids)
+            ).distinct().all()
+            return {city: search_result_cache.invalidate_city(city) for (city,) in cities}
+            
         except Exception as e:
             self.db.rollback()
             logging.error(f"Error storing amenity data: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def _changed_neighborhood_ids(self, rows: List[Dict]) -> Set[int]:
+        """
+        Neighborhoods whose stored counts the rows would insert or change
+        
+        A cached result may have scored a missing row with zeros from a failed
+        fetch, so first-time rows make it stale too. Rewriting a count with the
+        same value, as refreshes mostly do, does not.
+        """
+        existing_counts = dict(
+            ((neighborhood_id, radius_meters, amenity_type), count)
+            for neighborhood_id, radius_meters, amenity_type, count in self.db.query(
+                Amenity.neighborhood_id, Amenity.radius_meters, Amenity.type, Amenity.count
+            ).filter(
+                and_(
+                    Amenity.neighborhood_id.in_({row["neighborhood_id"] for row in rows}),
+                    Amenity.radius_meters.in_({row["radius_meters"] for row in rows}),
+                    Amenity.type.in_({row["type"] for row in rows})
+                )
+            )
+        )
+        
+        return {
+            row["neighborhood_id"] for row in rows
+            if existing_counts.get((row["neighborhood_id"], row["radius_meters"], row["type"])) != row["count"]
+        }
+    
+    def _upsert_statement(self, insert, rows: List[Dict]):
+        """INSERT ... ON CONFLICT DO UPDATE on the (neighborhood_id, radius_meters, type) unique index"""
+        statement = insert(Amenity).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[Amenity.neighborhood_id, Amenity.radius_meters, Amenity.type],
+            set_={"count": statement.excluded.count, "fetched_at": statement.excluded.fetched_at}
+        )
+    
+    def _store_amenity_counts_fallback(self, rows: List[Dict]):
+        """Portable upsert: one SELECT for existing rows, then bulk update and insert"""
+        
+        existing_records = self.db.query(Amenity).filter(
+            and_(
+                Amenity.neighborhood_id.in_({row["neighborhood_id"] for row in rows}),
+                Amenity.radius_meters.in_({row["radius_meters"] for row in rows}),
+                Amenity.type.in_({row["type"] for row in rows})
+            )
+        ).all()
+        existing_by_key = {
+            (record.neighborhood_id, record.radius_meters, record.type): record for record in existing_records
+        }
+        
+        for row in rows:
+            existing_record = existing_by_key.get((row["neighborhood_id"], row["radius_meters"], row["type"]))
+            if existing_record:
+                existing_record.count = row["count"]
+                existing_record.fetched_at = row["fetched_at"]
+            else:
+                self.db.add(Amenity(**row))
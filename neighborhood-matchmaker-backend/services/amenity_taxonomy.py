@@ -0,0 +1,111 @@
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+from enums.amenity_type import AmenityTypeEnum
+
+# Single source of truth per amenity type: the OSM tags that count as one, the
+# scoring weight, and whether it is essential (scored on a stricter curve).
+# Everything below is compiled from it once at import.
+AMENITY_TAXONOMY = {
+    AmenityTypeEnum.GROCERY: {
+        "tags": {"shop": ["supermarket", "convenience", "grocery"]},
+        "weight": 10,
+        "essential": True,
+    },
+    AmenityTypeEnum.TRANSIT: {
+        "tags": {"public_transport": ["station"], "railway": ["station"]},
+        "weight": 9,
+        "essential": True,
+    },
+    AmenityTypeEnum.HOSPITAL: {
+        "tags": {"amenity": ["hospital", "clinic"]},
+        "weight": 9,
+        "essential": True,
+    },
+    AmenityTypeEnum.RESTAURANT: {
+        "tags": {"amenity": ["restaurant", "fast_food"]},
+        "weight": 8,
+        "essential": False,
+    },
+    AmenityTypeEnum.SCHOOL: {
+        "tags": {"amenity": ["school", "university"]},
+        "weight": 7,
+        "essential": False,
+    },
+    AmenityTypeEnum.PARK: {
+        "tags": {"leisure": ["park", "playground"]},
+        "weight": 7,
+        "essential": False,
+    },
+    AmenityTypeEnum.CAFE: {
+        "tags": {"amenity": ["cafe", "bar"], "shop": ["bakery"]},
+        "weight": 6,
+        "essential": False,
+    },
+    AmenityTypeEnum.GYM: {
+        "tags": {"leisure": ["fitness_centre", "sports_centre"], "amenity": ["gym"]},
+        "weight": 6,
+        "essential": False,
+    },
+    AmenityTypeEnum.LIBRARY: {
+        "tags": {"amenity": ["library"]},
+        "weight": 5,
+        "essential": False,
+    },
+}
+
+# An element matching several types is classified by the first of its keys in this order
+KEY_PRECEDENCE = ("shop", "amenity", "leisure", "public_transport", "railway")
+
+
+def _compile_tag_types() -> Dict[str, Dict[str, AmenityTypeEnum]]:
+    tag_types: Dict[str, Dict[str, AmenityTypeEnum]] = {key: {} for key in KEY_PRECEDENCE}
+    for amenity, definition in AMENITY_TAXONOMY.items():
+        for key, values in definition["tags"].items():
+            if key not in tag_types:
+                raise ValueError(f"Tag key {key} of {amenity} is missing from KEY_PRECEDENCE")
+            for value in values:
+                if value in tag_types[key]:
+                    raise ValueError(f"{key}={value} is mapped to both {tag_types[key][value]} and {amenity}")
+                tag_types[key][value] = amenity
+    return tag_types
+
+
+# key -> value -> amenity type, classification is one dict lookup per precedence key
+TAG_TYPES = _compile_tag_types()
+
+# Column layout shared by count matrices, POI type arrays and weight arrays
+AMENITY_INDEX = {amenity.value: index for index, amenity in enumerate(AmenityTypeEnum)}
+AMENITY_WEIGHTS = np.array([AMENITY_TAXONOMY[amenity]["weight"] for amenity in AmenityTypeEnum], dtype=np.int64)
+ESSENTIAL_AMENITIES: FrozenSet[AmenityTypeEnum] = frozenset(
+    amenity for amenity, definition in AMENITY_TAXONOMY.items() if definition["essential"]
+)
+
+# Every (key, value) pair an Overpass query can return
+QUERY_TAGS: List[Tuple[str, str]] = [
+    (key, value) for key, values in TAG_TYPES.items() for value in values
+]
+
+
+def classify_tags(tags: Dict[str, str]) -> Optional[AmenityTypeEnum]:
+    """Amenity type of an OSM element from its tags, None when no registered tag matches"""
+    for key in KEY_PRECEDENCE:
+        value = tags.get(key)
+        if value is not None:
+            amenity = TAG_TYPES[key].get(value)
+            if amenity is not None:
+                return amenity
+    return None
+
+
+def overpass_filters(amenity_types: List[AmenityTypeEnum]) -> List[str]:
+    """One regex-union tag filter per key, e.g. ["amenity"~"^(bar|cafe)$"], covering the given types"""
+    values_by_key: Dict[str, set] = {}
+    for amenity in amenity_types:
+        for key, values in AMENITY_TAXONOMY[amenity]["tags"].items():
+            values_by_key.setdefault(key, set()).update(values)
+
+    return [
+        f'["{key}"~"^({"|".join(re.escape(value) for value in sorted(values_by_key[key]))})$"]'
+        for key in KEY_PRECEDENCE if key in values_by_key
+    ]
@@ -1,17 +1,165 @@
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from models.neighborhood import Neighborhood
 from models.coordinates import Coordinates
+import numpy as np
+import os
 import math
 import logging
+from metrics import SEARCH_STAGE_SECONDS
+from services.transit_router import get_transit_time_table
+
+
+class CommuteMatrix:
+    """All-pairs commute minutes for the neighborhoods of one city, rows and columns keyed by neighborhood id"""
+    
+    def __init__(self, neighborhoods: List[Tuple[int, str, float, float]], commute_minutes: np.ndarray, fingerprint: Optional[int] = None):
+        self.fingerprint = fingerprint  # Hash of the city's (id, name, lat, lon) rows it was built from
+        self.index = {neighborhood_id: i for i, (neighborhood_id, _, _, _) in enumerate(neighborhoods)}
+        self.coordinates = {neighborhood_id: (lat, lon) for neighborhood_id, _, lat, lon in neighborhoods}
+        self.commute_minutes = commute_minutes  # uint16, the only N x N array kept
+        
+        # Searches name their destination, the lowest id wins if a name repeats
+        self.name_index: Dict[str, int] = {}
+        for i, (_, name, _, _) in enumerate(neighborhoods):
+            self.name_index.setdefault(name, i)
+    
+    def commute_time(self, origin_id: int, destination_id: int) -> Optional[int]:
+        """O(1) commute time lookup, None if either neighborhood is unknown"""
+        origin = self.index.get(origin_id)
+        destination = self.index.get(destination_id)
+        if origin is None or destination is None:
+            return None
+        return int(self.commute_minutes[origin, destination])
+
+
+# In-memory commute matrices keyed by city, rebuilt when the city's rows change
+_commute_matrices: Dict[str, CommuteMatrix] = {}
+
+
+def invalidate_commute_matrices(city: Optional[str] = None):
+    """Drop cached commute matrices for a city, or all cities"""
+    if city is None:
+        _commute_matrices.clear()
+    else:
+        _commute_matrices.pop(city, None)
 
 
 class CommuteService:
     """Service to handle commute time calculations"""
     
+    # Departure window read from precomputed GTFS tables, see scripts/build_transit_tables.py
+    DEPARTURE_BUCKET = os.getenv("COMMUTE_DEPARTURE_BUCKET", "am_peak")
+    
+    # Matrix rows computed per step, bounds the float64 distance temporaries
+    BUILD_CHUNK_ROWS = 256
+    
     def __init__(self, db_session: Session):
         self.db = db_session
     
+    @SEARCH_STAGE_SECONDS.labels(stage="commute").time()
+    def get_commute_times(
+        self, 
+        city: str, 
+        neighborhoods: List[Neighborhood], 
+        destination_neighborhood_name: Optional[str]
+    ) -> Dict[int, Optional[int]]:
+        """Commute times from every neighborhood to the destination, keyed by neighborhood id"""
+        
+        if not destination_neighborhood_name:
+            return {neighborhood.id: None for neighborhood in neighborhoods}
+        
+        matrix = self.get_commute_matrix(city, neighborhoods)
+        destination = matrix.name_index.get(destination_neighborhood_name)
+        
+        if destination is not None:
+            column = matrix.commute_minutes[:, destination]
+            return {
+                neighborhood.id: int(column[matrix.index[neighborhood.id]])
+                for neighborhood in neighborhoods
+            }
+        
+        # Destination outside this city, fall back to a single lookup
+        dest_coords = self._get_destination_coordinates(destination_neighborhood_name)
+        if not dest_coords:
+            return {neighborhood.id: None for neighborhood in neighborhoods}
+        
+        lats = np.array([neighborhood.coordinates.lat for neighborhood in neighborhoods], dtype=np.float64)
+        lons = np.array([neighborhood.coordinates.lon for neighborhood in neighborhoods], dtype=np.float64)
+        distance_km = self._calculate_distance_matrix_km(lats, lons, np.array([dest_coords[0]]), np.array([dest_coords[1]]))
+        commute_minutes = self._estimate_transit_times(distance_km[:, 0])
+        
+        return {neighborhood.id: int(minutes) for neighborhood, minutes in zip(neighborhoods, commute_minutes)}
+    
+    def get_commute_matrix(self, city: str, neighborhoods: List[Neighborhood]) -> CommuteMatrix:
+        """Get the cached commute matrix for a city, rebuilt from the city's current rows when any of them changed"""
+        
+        # Budget-filtered searches pass a subset, staleness is checked against every row of the city
+        rows = {row[0]: tuple(row) for row in self._load_city_neighborhoods(city)}
+        fingerprint = hash(tuple(sorted(rows.values())))
+        matrix = _commute_matrices.get(city)
+        if matrix is not None and matrix.fingerprint == fingerprint and all(
+            neighborhood.id in matrix.index for neighborhood in neighborhoods
+        ):
+            return matrix
+        
+        # Always the whole city, so the destination is in it and deleted neighborhoods drop out
+        rows.update({
+            neighborhood.id: (neighborhood.id, neighborhood.name, neighborhood.coordinates.lat, neighborhood.coordinates.lon)
+            for neighborhood in neighborhoods
+        })
+        city_neighborhoods = [rows[neighborhood_id] for neighborhood_id in sorted(rows)]
+        
+        logging.info(f"Building commute matrix for {len(city_neighborhoods)} neighborhoods in {city}")
+        
+        lats = np.array([lat for _, _, lat, _ in city_neighborhoods], dtype=np.float64)
+        lons = np.array([lon for _, _, _, lon in city_neighborhoods], dtype=np.float64)
+        commute_minutes = np.empty((len(city_neighborhoods), len(city_neighborhoods)), dtype=np.uint16)
+        
+        # Row blocks bound the float64 distance temporaries to BUILD_CHUNK_ROWS x N
+        for start in range(0, len(city_neighborhoods), self.BUILD_CHUNK_ROWS):
+            end = start + self.BUILD_CHUNK_ROWS
+            distance_km = self._calculate_distance_matrix_km(lats[start:end], lons[start:end], lats, lons)
+            commute_minutes[start:end] = np.minimum(self._estimate_transit_times(distance_km), np.iinfo(np.uint16).max)
+        
+        self._apply_transit_table(city, city_neighborhoods, lats, lons, commute_minutes)
+        
+        matrix = CommuteMatrix(city_neighborhoods, commute_minutes, fingerprint)
+        _commute_matrices[city] = matrix
+        return matrix
+    
+    def _load_city_neighborhoods(self, city: str) -> List[Tuple[int, str, float, float]]:
+        """(id, name, lat, lon) of every neighborhood of the city with coordinates"""
+        return self.db.query(Neighborhood.id, Neighborhood.name, Coordinates.lat, Coordinates.lon).join(
+            Coordinates, Neighborhood.coordinates_id == Coordinates.id
+        ).filter(Neighborhood.city == city).all()
+    
+    def _apply_transit_table(
+        self, 
+        city: str, 
+        city_neighborhoods: List[Tuple[int, str, float, float]], 
+        lats: np.ndarray, 
+        lons: np.ndarray, 
+        commute_minutes: np.ndarray
+    ):
+        """Overwrite estimates with precomputed GTFS times for neighborhoods the city's table covers"""
+        
+        table = get_transit_time_table(city)
+        minutes = table.bucket(self.DEPARTURE_BUCKET) if table is not None else None
+        if minutes is None:
+            return
+        
+        # Neighborhoods added or moved since the table was built keep the estimate
+        table_rows = np.array([table.index.get(name, -1) for _, name, _, _ in city_neighborhoods])
+        covered = table_rows >= 0
+        covered[covered] = (
+            np.isclose(table.lats[table_rows[covered]], lats[covered], rtol=0, atol=1e-6) &
+            np.isclose(table.lons[table_rows[covered]], lons[covered], rtol=0, atol=1e-6)
+        )
+        
+        rows = np.nonzero(covered)[0]
+        commute_minutes[np.ix_(rows, rows)] = minutes[np.ix_(table_rows[rows], table_rows[rows])]
+    
     def calculate_commute_time(self, origin_lat: float, origin_lon: float, destination_neighborhood_name: Optional[str]) -> Optional[int]:
         """Calculate estimated commute time between origin and destination"""
         
@@ -64,6 +212,38 @@ class CommuteService:
         c = 2 * math.asin(math.sqrt(a))
         return 6371 * c  # Earth's radius in km
     
+    def _calculate_distance_matrix_km(
+        self, 
+        lats1: np.ndarray, 
+        lons1: np.ndarray, 
+        lats2: np.ndarray, 
+        lons2: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized Haversine distances between every point of set 1 and set 2"""
+        
+        lat1_rad, lon1_rad = np.radians(lats1)[:, None], np.radians(lons1)[:, None]
+        lat2_rad, lon2_rad = np.radians(lats2)[None, :], np.radians(lons2)[None, :]
+        
+        dlat = lat2_rad - lat1_rad
+        dlon = lon2_rad - lon1_rad
+        
+        a = (np.sin(dlat/2)**2 + 
+             np.cos(lat1_rad) * np.cos(lat2_rad) * 
+             np.sin(dlon/2)**2)
+        
+        c = 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        return 6371 * c  # Earth's radius in km
+    
+    def _estimate_transit_times(self, distance_km: np.ndarray) -> np.ndarray:
+        """Vectorized _estimate_transit_time using the same distance bands"""
+        
+        bands = [distance_km <= 2, distance_km <= 5, distance_km <= 10]
+        avg_speed_kmh = np.select(bands, [15, 18, 25], default=22)
+        base_waiting_time = np.select(bands, [5, 8, 10], default=15)
+        
+        travel_time = np.trunc((distance_km / avg_speed_kmh) * 60).astype(int)
+        return np.maximum(travel_time + base_waiting_time, 5)  # Minimum 5 minutes
+    
     def _estimate_transit_time(self, distance_km: float) -> int:
         """Estimate transit time based on Montreal transportation patterns"""
         
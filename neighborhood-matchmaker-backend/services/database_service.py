@@ -1,7 +1,11 @@
-from typing import List
+from typing import List, Optional
+from sqlalchemy import or_
 from sqlalchemy.orm import Session, joinedload
 from models.neighborhood import Neighborhood
 from models.coordinates import Coordinates
+from models.neighborhood_rent import NeighborhoodRent
+from enums.rent_type import RentTypeEnum
+from metrics import SEARCH_STAGE_SECONDS
 import logging
 
 
@@ -10,14 +14,43 @@ class DatabaseService:
     def __init__(self, db_session: Session):
         self.db = db_session
     
-    def get_neighborhoods_with_coordinates(self, city: str) -> List[Neighborhood]:
-        """Get neighborhoods with coordinates using optimized query"""
+    @SEARCH_STAGE_SECONDS.labels(stage="db_load").time()
+    def get_neighborhoods_with_coordinates(
+        self, 
+        city: str, 
+        budget: Optional[int] = None, 
+        rent_types: Optional[List[RentTypeEnum]] = None
+    ) -> List[Neighborhood]:
+        """
+        Get neighborhoods with coordinates using optimized query
+        
+        With a budget only affordable neighborhoods are returned: at least one of
+        the requested rent types at or under budget, or the neighborhood's
+        average price when no rent types are given. Neighborhoods without any
+        rent data have no average price and are kept rather than dropped.
+        """
         try:
-            neighborhoods = self.db.query(Neighborhood).options(
+            query = self.db.query(Neighborhood).options(
                 joinedload(Neighborhood.coordinates)
             ).join(Coordinates).filter(
                 Neighborhood.city == city
-            ).all()
+            )
+            
+            if budget is not None:
+                if rent_types:
+                    affordable_rent = self.db.query(NeighborhoodRent.id).filter(
+                        NeighborhoodRent.neighborhood_id == Neighborhood.id,
+                        NeighborhoodRent.type.in_(rent_types),
+                        NeighborhoodRent.avg_price <= budget
+                    ).exists()
+                    query = query.filter(affordable_rent)
+                else:
+                    query = query.filter(or_(
+                        Neighborhood.avg_price.is_(None),
+                        Neighborhood.avg_price <= budget
+                    ))
+            
+            neighborhoods = query.all()
             
             logging.info(f"Retrieved {len(neighborhoods)} neighborhoods for city: {city}")
             return neighborhoods
@@ -0,0 +1,126 @@
+import os
+import math
+import logging
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from enums.amenity_type import AmenityTypeEnum
+from services.poi_tile_service import count_points_within_radii
+
+LOCAL_POI_INDEX_PATH = os.getenv("LOCAL_POI_INDEX_PATH", os.path.join("data", "osm", "poi_index.npz"))
+
+
+class LocalPOIIndex:
+    """
+    Array-backed grid index over classified POIs from an ingested OSM extract
+
+    Points are sorted by grid cell so every cell is one contiguous slice of the
+    lat/lon/type arrays, radius counts only touch the cells covering the circle.
+    """
+
+    def __init__(self, lats: np.ndarray, lons: np.ndarray, types: np.ndarray, cell_degrees: float = 0.01):
+        self.cell_degrees = cell_degrees
+
+        rows = np.floor(lats / cell_degrees).astype(np.int64)
+        cols = np.floor(lons / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+
+        self.lats = np.ascontiguousarray(lats[order], dtype=np.float64)
+        self.lons = np.ascontiguousarray(lons[order], dtype=np.float64)
+        self.types = np.ascontiguousarray(types[order], dtype=np.int8)
+
+        # Cell -> (start, end) slice into the sorted arrays
+        cells, starts, sizes = np.unique(
+            np.stack([rows[order], cols[order]], axis=1), axis=0, return_index=True, return_counts=True
+        )
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {
+            (int(row), int(col)): (int(start), int(start + size))
+            for (row, col), start, size in zip(cells, starts, sizes)
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "LocalPOIIndex":
+        with np.load(path) as data:
+            return cls(data["lats"], data["lons"], data["types"], float(data["cell_degrees"]))
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, lats=self.lats, lons=self.lons, types=self.types, cell_degrees=self.cell_degrees)
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    async def get_amenity_counts(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radius_meters: int = 1000
+    ) -> Dict[str, int]:
+        """Same interface as POITileService, answered from memory without any I/O"""
+        return self.count_within_radius(lat, lon, amenity_types, radius_meters)
+
+    async def get_amenity_counts_by_radius(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radii_meters: Sequence[int]
+    ) -> Dict[int, Dict[str, int]]:
+        return self.count_within_radii(lat, lon, amenity_types, radii_meters)
+
+    def uncached_tile_count(self, lat: float, lon: float, radius_meters: int) -> int:
+        """Counts never call Overpass"""
+        return 0
+
+    def count_within_radius(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radius_meters: int = 1000
+    ) -> Dict[str, int]:
+        return self.count_within_radii(lat, lon, amenity_types, [radius_meters])[int(radius_meters)]
+
+    def count_within_radii(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radii_meters: Sequence[int]
+    ) -> Dict[int, Dict[str, int]]:
+        radius_meters = max(radii_meters)
+        dlat = radius_meters / 111320
+        dlon = radius_meters / (111320 * max(math.cos(math.radians(lat)), 1e-6))
+
+        min_row, max_row = math.floor((lat - dlat) / self.cell_degrees), math.floor((lat + dlat) / self.cell_degrees)
+        min_col, max_col = math.floor((lon - dlon) / self.cell_degrees), math.floor((lon + dlon) / self.cell_degrees)
+
+        slices = [
+            self.cells[(row, col)]
+            for row in range(min_row, max_row + 1)
+            for col in range(min_col, max_col + 1)
+            if (row, col) in self.cells
+        ]
+        if not slices:
+            return {int(radius): {amenity.value: 0 for amenity in amenity_types} for radius in radii_meters}
+
+        index = np.concatenate([np.arange(start, end) for start, end in slices])
+
+        return count_points_within_radii(
+            self.lats[index], self.lons[index], self.types[index],
+            lat, lon, amenity_types, radii_meters
+        )
+
+
+@lru_cache(maxsize=1)
+def get_local_poi_index() -> LocalPOIIndex:
+    """Load the ingested index once per process"""
+    if not os.path.exists(LOCAL_POI_INDEX_PATH):
+        raise FileNotFoundError(
+            f"Local POI index not found at {LOCAL_POI_INDEX_PATH}, run scripts/ingest_osm_extract.py first"
+        )
+
+    index = LocalPOIIndex.load(LOCAL_POI_INDEX_PATH)
+    logging.info(f"Loaded local POI index with {len(index)} points from {LOCAL_POI_INDEX_PATH}")
+    return index
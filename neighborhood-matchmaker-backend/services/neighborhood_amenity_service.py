@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
 from dtos.search_result import NeighborhoodSearchResult, SearchResult
@@ -6,39 +6,83 @@ from services.amenity_service import AmenityService
 from services.commute_service import CommuteService
 from services.scoring_service import ScoringService
 from services.database_service import DatabaseService
+from services.overpass_api_service import OverpassAPIService
+from services.search_result_cache import SearchVersion, make_search_key, search_result_cache
 from enums.amenity_type import AmenityTypeEnum
+from models.neighborhood import Neighborhood
+from database import SessionLocal, db_executor, run_db
+from metrics import AMENITY_LOOKUPS, SEARCH_REQUESTS, SEARCH_STAGE_SECONDS
+import numpy as np
 import logging
 import asyncio
+import heapq
+import os
 
 
 class NeighborhoodAmenityService:
     """Service to handle neighborhood amenity processing"""
     
-    def __init__(self, db_session: Session):
+    TOP_K = 10
+    
+    # Concurrent amenity fetches per search, bounded overall by the Overpass scheduler
+    FETCH_WORKERS = int(os.getenv("SEARCH_FETCH_WORKERS", 5))
+    
+    # Interactive searches in progress, background work yields while this is non-zero
+    active_searches = 0
+    
+    def __init__(self, db_session: Session, overpass_service: Optional[OverpassAPIService] = None):
         self.db = db_session
-        self.amenity_service = AmenityService(db_session)
+        self.amenity_service = AmenityService(db_session, overpass_service)
         self.commute_service = CommuteService(db_session)
         self.scoring_service = ScoringService()
         self.database_service = DatabaseService(db_session)
     
     async def process_neighborhood_search(self, search_dto: NeighborhoodSearchDTO) -> SearchResult:
-        """Process neighborhood search with clean architecture"""
+        """Process neighborhood search, served from the result cache when possible"""
         
-        # If no amenities selected, use all available amenities
-        amenities_to_search = search_dto.amenities or list(AmenityTypeEnum)
+        cache_key = make_search_key(search_dto)
+        cached_result = search_result_cache.get(cache_key)
+        if cached_result is not None:
+            SEARCH_REQUESTS.labels(result="cache_hit").inc()
+            # Echo this request's criteria, equivalent searches may list them in another order
+            return cached_result.model_copy(update={"search_criteria": search_dto.model_dump()})
+        
+        # Taken before computing, so amenity writes by others during the search leave the entry stale
+        search_version = SearchVersion(search_dto.city)
+        
+        SEARCH_REQUESTS.labels(result="computed").inc()
+        NeighborhoodAmenityService.active_searches += 1
+        try:
+            with SEARCH_STAGE_SECONDS.labels(stage="search").time():
+                result = await self._run_search(search_dto, search_version)
+        finally:
+            NeighborhoodAmenityService.active_searches -= 1
+        
+        self._cache_result(cache_key, result, search_version)
+        return result
+    
+    def _cache_result(self, cache_key, result: SearchResult, search_version: SearchVersion):
+        """Cache a computed result unless it may already be stale"""
+        version = search_version.cacheable_version()
+        if result.neighborhoods and version is not None:
+            search_result_cache.put(cache_key, result, version)
+    
+    async def _run_search(self, search_dto: NeighborhoodSearchDTO, search_version: Optional[SearchVersion] = None) -> SearchResult:
+        """Process neighborhood search with clean architecture"""
         
-        # Get neighborhoods 
-        neighborhoods = self.database_service.get_neighborhoods_with_coordinates(search_dto.city)
+        amenities_to_search, neighborhoods, commute_times = await self._prepare_search(search_dto)
         
         if not neighborhoods:
             return self._create_empty_result(search_dto)
         
         # Process neighborhoods in batches for better performance
-        results = await self._process_neighborhoods_batch(neighborhoods, search_dto, amenities_to_search)
+        results = await self._process_neighborhoods_batch(
+            neighborhoods, search_dto, amenities_to_search, commute_times, search_version
+        )
         
         # Sort by score and limit results
         results.sort(key=lambda x: x.score, reverse=True)
-        top_results = results[:10]
+        top_results = results[:self.TOP_K]
         
         return SearchResult(
             neighborhoods=top_results,
@@ -46,87 +90,373 @@ class NeighborhoodAmenityService:
             search_criteria=search_dto.model_dump()
         )
     
+    async def stream_neighborhood_search(self, search_dto: NeighborhoodSearchDTO) -> AsyncIterator[Dict]:
+        """
+        Yield each neighborhood result as soon as it is scored, with the running top 10
+        
+        Events are {"event": "result", ...} per neighborhood and one final
+        {"event": "done", "search_result": ...} holding the same top 10 as
+        process_neighborhood_search.
+        """
+        
+        cache_key = make_search_key(search_dto)
+        cached_result = search_result_cache.get(cache_key)
+        if cached_result is not None:
+            SEARCH_REQUESTS.labels(result="cache_hit").inc()
+            result = cached_result.model_copy(update={"search_criteria": search_dto.model_dump()})
+            for completed, neighborhood_result in enumerate(result.neighborhoods, start=1):
+                yield self._result_event(neighborhood_result, result.neighborhoods[:completed], completed, len(result.neighborhoods))
+            yield {"event": "done", "search_result": result.model_dump(mode="json")}
+            return
+        
+        SEARCH_REQUESTS.labels(result="computed").inc()
+        search_version = SearchVersion(search_dto.city)
+        top_results: List[NeighborhoodSearchResult] = []
+        completed = 0
+        
+        # Accounted like process_neighborhood_search from the first query on. Every neighborhood
+        # is reported, so nothing is pruned. Closing this generator (client went away) cancels
+        # the pipeline workers
+        NeighborhoodAmenityService.active_searches += 1
+        try:
+            with SEARCH_STAGE_SECONDS.labels(stage="search").time():
+                amenities_to_search, neighborhoods, commute_times = await self._prepare_search(search_dto)
+                
+                async for scored in self._search_pipeline(
+                    neighborhoods, search_dto, amenities_to_search, commute_times, prune=False, search_version=search_version
+                ):
+                    for neighborhood_result in scored:
+                        completed += 1
+                        top_results.append(neighborhood_result)
+                        top_results.sort(key=lambda x: x.score, reverse=True)
+                        del top_results[self.TOP_K:]
+                        
+                        yield self._result_event(neighborhood_result, top_results, completed, len(neighborhoods))
+        finally:
+            NeighborhoodAmenityService.active_searches -= 1
+        
+        result = SearchResult(
+            neighborhoods=top_results,
+            total_results=len(top_results),
+            search_criteria=search_dto.model_dump()
+        )
+        self._cache_result(cache_key, result, search_version)
+        
+        yield {"event": "done", "search_result": result.model_dump(mode="json")}
+    
+    def _result_event(
+        self, 
+        neighborhood_result: NeighborhoodSearchResult, 
+        top_results: List[NeighborhoodSearchResult], 
+        completed: int, 
+        total: int
+    ) -> Dict:
+        return {
+            "event": "result",
+            "result": neighborhood_result.model_dump(mode="json"),
+            "top": [{"neighborhood_id": r.neighborhood_id, "score": r.score} for r in top_results],
+            "completed": completed,
+            "total": total
+        }
+    
+    async def _prepare_search(
+        self, 
+        search_dto: NeighborhoodSearchDTO
+    ) -> Tuple[List[AmenityTypeEnum], List[Neighborhood], Dict[int, Optional[int]]]:
+        """Load the city's neighborhoods and commute times shared by every search mode"""
+        
+        # If no amenities selected, use all available amenities
+        amenities_to_search = search_dto.amenities or list(AmenityTypeEnum)
+        
+        # Get affordable neighborhoods, every DB call runs off the event loop
+        neighborhoods = await run_db(
+            self.db, self.database_service.get_neighborhoods_with_coordinates,
+            search_dto.city, search_dto.budget, search_dto.rent_types
+        )
+        
+        if not neighborhoods:
+            return amenities_to_search, [], {}
+        
+        # Commute times come from the in-memory city matrix, no per-neighborhood queries
+        commute_times = await run_db(
+            self.db, self.commute_service.get_commute_times,
+            search_dto.city, neighborhoods, search_dto.destination_neighborhood
+        )
+        
+        return amenities_to_search, neighborhoods, commute_times
+    
     async def _process_neighborhoods_batch(
         self, 
         neighborhoods: List, 
         search_dto: NeighborhoodSearchDTO, 
-        amenities_to_search: List[AmenityTypeEnum]
+        amenities_to_search: List[AmenityTypeEnum],
+        commute_times: Dict[int, Optional[int]],
+        search_version: Optional[SearchVersion] = None
     ) -> List[NeighborhoodSearchResult]:
-        """Process neighborhoods in batches"""
+        """Top-k search: every neighborhood that can still make the top k, scored"""
         
         results = []
-        batch_size = 5  # Process 5 neighborhoods concurrently
+        async for scored in self._search_pipeline(
+            neighborhoods, search_dto, amenities_to_search, commute_times, prune=True, search_version=search_version
+        ):
+            results.extend(scored)
+        return results
+    
+    async def _search_pipeline(
+        self,
+        neighborhoods: List[Neighborhood],
+        search_dto: NeighborhoodSearchDTO,
+        amenities_to_search: List[AmenityTypeEnum],
+        commute_times: Dict[int, Optional[int]],
+        prune: bool,
+        search_version: Optional[SearchVersion] = None
+    ) -> AsyncIterator[List[NeighborhoodSearchResult]]:
+        """
+        Yield scored results as a producer -> fetch workers -> scorer pipeline completes them
         
-        for i in range(0, len(neighborhoods), batch_size):
-            batch = neighborhoods[i:i + batch_size]
-            
-            # Process batch concurrently
-            batch_tasks = [
-                self._process_single_neighborhood(neighborhood, search_dto, amenities_to_search)
-                for neighborhood in batch
-            ]
-            
-            batch_results = await asyncio.gather(*batch_tasks, return_exceptions=True)
-            
-            # Add successful results
-            for result in batch_results:
-                if not isinstance(result, Exception) and result is not None:
-                    results.append(result)
+        Stored counts are looked up for the whole city at once and complete
+        neighborhoods are scored immediately. The rest are queued in upper-bound
+        order for FETCH_WORKERS workers, a slow fetch only holds its own worker.
+        Bounded queues keep the producer at most a few items ahead. With prune,
+        items whose bound is below the current k-th best score are skipped.
+        search_version collects the city versions created by storing the
+        fetched rows and any failed fetch.
+        """
+        
+        # DB cache lookup stage: one query for every stored count at the searched radius,
+        # one upsert for everything fetched (at every radius)
+        stored_counts = await run_db(
+            self.db, self.amenity_service.get_stored_amenity_counts,
+            [neighborhood.id for neighborhood in neighborhoods], amenities_to_search, search_dto.radius_meters
+        )
+        pending_rows = []
+        
+        complete, candidates = [], []
+        for neighborhood in neighborhoods:
+            known = stored_counts.get(neighborhood.id, {})
+            if all(amenity in known for amenity in amenities_to_search):
+                amenity_counts = {amenity.value: known[amenity] for amenity in amenities_to_search}
+                complete.append((neighborhood, amenity_counts, commute_times.get(neighborhood.id)))
+            else:
+                candidates.append(neighborhood)
+        AMENITY_LOOKUPS.labels(source="database").inc(len(complete))
+        
+        # Min-heap of the k best scores so far, its root is the pruning threshold
+        top_scores: List[int] = []
+        
+        def record(scored: List[NeighborhoodSearchResult]):
+            for result in scored:
+                if len(top_scores) < self.TOP_K:
+                    heapq.heappush(top_scores, result.score)
+                elif result.score > top_scores[0]:
+                    heapq.heapreplace(top_scores, result.score)
+        
+        def is_pruned(bound: int) -> bool:
+            # Anything bounded below the current k-th best score cannot enter the top k
+            return prune and len(top_scores) >= self.TOP_K and bound < top_scores[0]
+        
+        scored = self._score_neighborhoods(complete, search_dto, amenities_to_search)
+        record(scored)
+        if scored:
+            yield scored
+        
+        # Visit the most promising neighborhoods first
+        bounds = self._score_upper_bounds(candidates, stored_counts, search_dto, amenities_to_search, commute_times)
+        ranked = sorted(zip(bounds, candidates), key=lambda pair: pair[0], reverse=True)
+        
+        workers = max(1, min(self.FETCH_WORKERS, len(ranked)))
+        candidate_queue: asyncio.Queue = asyncio.Queue(maxsize=workers)
+        fetched_queue: asyncio.Queue = asyncio.Queue(maxsize=workers)
+        
+        async def produce():
+            for position, (bound, neighborhood) in enumerate(ranked):
+                if is_pruned(bound):
+                    logging.info(f"Pruned {len(ranked) - position} of {len(neighborhoods)} neighborhoods by upper bound")
+                    break
+                await candidate_queue.put((bound, neighborhood))
+            for _ in range(workers):
+                await candidate_queue.put(None)
+        
+        async def fetch_worker():
+            while True:
+                item = await candidate_queue.get()
+                if item is None:
+                    break
+                bound, neighborhood = item
+                if is_pruned(bound):
+                    continue
+                fetched = await self._fetch_neighborhood_data(
+                    neighborhood, amenities_to_search, commute_times,
+                    stored_counts.get(neighborhood.id, {}), pending_rows, search_dto.radius_meters, search_version
+                )
+                if fetched is not None:
+                    await fetched_queue.put(fetched)
+            await fetched_queue.put(None)
+        
+        tasks = []
+        if ranked:
+            tasks.append(asyncio.ensure_future(produce()))
+            tasks.extend(asyncio.ensure_future(fetch_worker()) for _ in range(workers))
+        
+        try:
+            # Scoring stage: score whatever has arrived so far in one batch call
+            running = workers if ranked else 0
+            while running:
+                batch = [await fetched_queue.get()]
+                while not fetched_queue.empty():
+                    batch.append(fetched_queue.get_nowait())
+                
+                running -= batch.count(None)
+                scored = self._score_neighborhoods(
+                    [item for item in batch if item is not None], search_dto, amenities_to_search
+                )
+                record(scored)
+                if scored:
+                    yield scored
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
             
-            # Small delay between batches to be nice to external APIs
-            if i + batch_size < len(neighborhoods):
-                await asyncio.sleep(0.5)
+            # Also runs when the client went away or the search was cancelled, fetched counts are not lost
+            if pending_rows:
+                loop = asyncio.get_running_loop()
+                invalidated = await asyncio.shield(loop.run_in_executor(db_executor, self._store_pending_rows, pending_rows))
+                if search_version is not None:
+                    search_version.claim(invalidated)
+    
+    def _store_pending_rows(self, rows: List[Dict]) -> Dict[str, int]:
+        """Write fetched rows on their own session, the search's session may already be closing"""
+        db = SessionLocal()
+        try:
+            return AmenityService(db, self.amenity_service.overpass_service, self.amenity_service.amenity_counter).store_amenity_counts(rows)
+        except Exception as e:
+            logging.error(f"Error storing fetched amenity counts: {e}")
+            return {}
+        finally:
+            db.close()
+    
+    def _score_upper_bounds(
+        self,
+        neighborhoods: List[Neighborhood],
+        stored_counts: Dict[int, Dict[AmenityTypeEnum, int]],
+        search_dto: NeighborhoodSearchDTO,
+        amenities_to_search: List[AmenityTypeEnum],
+        commute_times: Dict[int, Optional[int]]
+    ) -> List[int]:
+        """Optimistic score per neighborhood from stored counts, commute and preferred bonus"""
         
-        return results
+        if not neighborhoods:
+            return []
+        
+        amenity_columns = self.scoring_service.amenity_columns
+        preferred = set(search_dto.preferred_neighborhoods or [])
+        
+        # -1 marks counts that still have to be fetched
+        known_count_matrix = np.full((len(neighborhoods), len(amenity_columns)), -1, dtype=np.int64)
+        for row, neighborhood in enumerate(neighborhoods):
+            for amenity_enum, count in stored_counts.get(neighborhood.id, {}).items():
+                known_count_matrix[row, amenity_columns[amenity_enum]] = count
+        
+        bounds = self.scoring_service.calculate_score_upper_bounds(
+            known_count_matrix=known_count_matrix,
+            requested_amenities=amenities_to_search,
+            commute_times=np.array(
+                [np.nan if commute_times.get(n.id) is None else commute_times[n.id] for n in neighborhoods],
+                dtype=np.float64
+            ),
+            max_commute_time=search_dto.max_commute_time,
+            preferred_mask=np.array([neighborhood.name in preferred for neighborhood in neighborhoods]),
+            search_all_amenities=(not search_dto.amenities)
+        )
+        
+        return [int(bound) for bound in bounds]
     
-    async def _process_single_neighborhood(
+    async def _fetch_neighborhood_data(
         self, 
         neighborhood, 
-        search_dto: NeighborhoodSearchDTO,
-        amenities_to_search: List[AmenityTypeEnum]
-    ) -> Optional[NeighborhoodSearchResult]:
-        """Process a single neighborhood"""
+        amenities_to_search: List[AmenityTypeEnum],
+        commute_times: Dict[int, Optional[int]],
+        stored_counts: Dict[AmenityTypeEnum, int],
+        pending_rows: List[Dict],
+        radius_meters: int,
+        search_version: Optional[SearchVersion] = None
+    ) -> Optional[Tuple[Neighborhood, Dict[str, int], Optional[int]]]:
+        """Fetch amenity counts for a single neighborhood"""
         
         try:
             # Get amenity counts
             amenity_counts = await self.amenity_service.get_amenity_counts(
-                neighborhood, amenities_to_search
-            )
-            
-            # Calculate commute time
-            commute_time = self.commute_service.calculate_commute_time(
-                neighborhood.coordinates.lat,
-                neighborhood.coordinates.lon,
-                search_dto.destination_neighborhood
-            )
-            
-            # Calculate score
-            score = self.scoring_service.calculate_neighborhood_score(
-                amenity_counts=amenity_counts,
-                requested_amenities=amenities_to_search,
-                commute_time=commute_time,
-                max_commute_time=search_dto.max_commute_time,
-                is_preferred=(neighborhood.name in (search_dto.preferred_neighborhoods or [])),
-                search_all_amenities=(not search_dto.amenities)  # Flag for dynamic scoring
+                neighborhood, amenities_to_search, stored_counts, pending_rows, radius_meters, search_version
             )
             
-            return NeighborhoodSearchResult(
-                neighborhood_id=neighborhood.id,
-                neighborhood_name=neighborhood.name,
-                amenity_counts=amenity_counts,
-                total_amenities=sum(amenity_counts.values()),
-                commute_time=commute_time or 0,
-                score=score,
-                coordinates={
-                    "lat": neighborhood.coordinates.lat,
-                    "lng": neighborhood.coordinates.lon
-                }
-            )
+            return neighborhood, amenity_counts, commute_times.get(neighborhood.id)
             
         except Exception as e:
             logging.error(f"Error processing neighborhood {neighborhood.name}: {e}")
+            if search_version is not None:
+                search_version.failed_fetches += 1
             return None
     
+    def _score_neighborhoods(
+        self,
+        fetched: List[Tuple[Neighborhood, Dict[str, int], Optional[int]]],
+        search_dto: NeighborhoodSearchDTO,
+        amenities_to_search: List[AmenityTypeEnum]
+    ) -> List[NeighborhoodSearchResult]:
+        """Score all fetched neighborhoods in a single batch call"""
+        
+        if not fetched:
+            return []
+        
+        amenity_columns = self.scoring_service.amenity_columns
+        preferred = set(search_dto.preferred_neighborhoods or [])
+        
+        count_matrix = np.zeros((len(fetched), len(amenity_columns)), dtype=np.int64)
+        for row, (_, amenity_counts, _) in enumerate(fetched):
+            for amenity_enum in amenities_to_search:
+                count_matrix[row, amenity_columns[amenity_enum]] = amenity_counts.get(amenity_enum.value, 0)
+        
+        commute_times = np.array(
+            [np.nan if commute_time is None else commute_time for _, _, commute_time in fetched],
+            dtype=np.float64
+        )
+        preferred_mask = np.array([neighborhood.name in preferred for neighborhood, _, _ in fetched])
+        
+        scores = self.scoring_service.calculate_neighborhood_scores(
+            count_matrix=count_matrix,
+            requested_amenities=amenities_to_search,
+            commute_times=commute_times,
+            max_commute_time=search_dto.max_commute_time,
+            preferred_mask=preferred_mask,
+            search_all_amenities=(not search_dto.amenities)  # Flag for dynamic scoring
+        )
+        
+        return [
+            self._build_result(neighborhood, amenity_counts, commute_time, int(score))
+            for (neighborhood, amenity_counts, commute_time), score in zip(fetched, scores)
+        ]
+    
+    def _build_result(
+        self, 
+        neighborhood, 
+        amenity_counts: Dict[str, int], 
+        commute_time: Optional[int], 
+        score: int
+    ) -> NeighborhoodSearchResult:
+        return NeighborhoodSearchResult(
+            neighborhood_id=neighborhood.id,
+            neighborhood_name=neighborhood.name,
+            amenity_counts=amenity_counts,
+            total_amenities=sum(amenity_counts.values()),
+            commute_time=commute_time or 0,
+            score=score,
+            coordinates={
+                "lat": neighborhood.coordinates.lat,
+                "lng": neighborhood.coordinates.lon
+            }
+        )
+    
     def _create_empty_result(self, search_dto: NeighborhoodSearchDTO) -> SearchResult:
         """Create empty result when no neighborhoods found"""
         return SearchResult(
@@ -1,16 +1,30 @@
+import os
+import json
 import aiohttp
-import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from enums.amenity_type import AmenityTypeEnum
+from services.amenity_taxonomy import classify_tags, overpass_filters
+from metrics import OVERPASS_CACHE_HITS, OVERPASS_RESPONSE_BYTES, OVERPASS_RESPONSES
+from services.overpass_cache import create_overpass_cache_from_env
+from services.overpass_scheduler import OverpassRetryableError, create_overpass_scheduler_from_env, parse_retry_after
 
 
 class OverpassAPIService:
-    """Clean Overpass API service without caching"""
+    """Overpass API service with a content-addressed response cache"""
+    
+    api_url = os.getenv("OVERPASS_API_URL", 'https://overpass-api.de/api/interpreter')
+    cache = create_overpass_cache_from_env()
+    scheduler = create_overpass_scheduler_from_env()
+    
+    RETRYABLE_STATUSES = {429, 502, 503, 504}
+    
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Shared pooled session from the app lifespan, a one-off session is used without it
+        self.session = session
     
-    @classmethod
     async def get_amenity_counts(
-        cls, 
+        self, 
         lat: float, 
         lon: float, 
         amenity_types: List[AmenityTypeEnum], 
@@ -18,64 +32,115 @@ class OverpassAPIService:
     ) -> Dict[str, int]:
         """Get amenity counts from Overpass API"""
         
-        query = cls._build_overpass_query(lat, lon, amenity_types, radius_meters)
+        # Normalize so equivalent requests share one cache entry
+        amenity_types = sorted(set(amenity_types), key=lambda amenity: amenity.value)
+        query = self._build_overpass_query(round(lat, 6), round(lon, 6), amenity_types, int(radius_meters))
+        
+        data = await self._fetch_query_data(query)
+        if data is None:
+            return {amenity.value: 0 for amenity in amenity_types}
+        
+        return self._parse_amenity_response(data, amenity_types)
+    
+    async def get_classified_elements(
+        self, 
+        south: float, 
+        west: float, 
+        north: float, 
+        east: float, 
+        amenity_types: List[AmenityTypeEnum]
+    ) -> List[Tuple[int, float, float, str]]:
+        """Get (OSM id, lat, lon, amenity type) of every classified element in a bounding box"""
+        
+        amenity_types = sorted(set(amenity_types), key=lambda amenity: amenity.value)
+        query = self._build_bbox_query(south, west, north, east, amenity_types)
+        
+        data = await self._fetch_query_data(query)
+        if data is None:
+            raise RuntimeError(f"Overpass query failed for bbox {south},{west},{north},{east}")
+        
+        return self._parse_classified_elements(data, amenity_types)
+    
+    async def _fetch_query_data(self, query: str) -> Optional[Dict]:
+        """Run a query through the response cache, returns None on API errors"""
+        
+        cache_key = self.cache.make_key(query)
+        
+        # Raises OverpassCacheMiss in replay mode, never falls through to the network
+        cached_data = await self.cache.get(cache_key)
+        if cached_data is not None:
+            OVERPASS_CACHE_HITS.inc()
+            return cached_data
         
         try:
-            # Add small delay to be respectful to the API
-            await asyncio.sleep(1)
+            # Paced, bounded and retried by the process-wide scheduler, no fixed sleeps
+            data = await self.scheduler.run(lambda: self._post_query(query))
+            
+            if data is not None:
+                await self.cache.put(cache_key, data)
+            return data
             
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(
-                    'https://overpass-api.de/api/interpreter',
-                    data=query,
-                    headers={'Content-Type': 'text/plain'}
-                ) as response:
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        return cls._parse_amenity_response(data, amenity_types)
-                    
-                    elif response.status == 429:  # Rate limited
-                        logging.warning("Rate limited by Overpass API, waiting...")
-                        await asyncio.sleep(30)
-                        return await cls.get_amenity_counts(lat, lon, amenity_types, radius_meters)
-                    
-                    else:
-                        logging.error(f"Overpass API error: {response.status}")
-                        return {amenity.value: 0 for amenity in amenity_types}
-                        
+        except OverpassRetryableError as e:
+            logging.error(f"Overpass API still failing after retries: {e}")
+            return None
         except Exception as e:
             logging.error(f"Error querying Overpass API: {e}")
-            return {amenity.value: 0 for amenity in amenity_types}
+            return None
+    
+    async def _post_query(self, query: str) -> Optional[Dict]:
+        """POST a query on the shared session, or a one-off session without one"""
+        
+        if self.session is not None:
+            return await self._post_query_with_session(self.session, query)
+        
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            return await self._post_query_with_session(session, query)
+    
+    async def _post_query_with_session(self, session: aiohttp.ClientSession, query: str) -> Optional[Dict]:
+        """POST a query to the Overpass interpreter and return the raw response"""
+        
+        async with session.post(
+            self.api_url,
+            data=query,
+            headers={'Content-Type': 'text/plain'}
+        ) as response:
+            
+            OVERPASS_RESPONSES.labels(status=str(response.status)).inc()
+            
+            if response.status == 200:
+                body = await response.read()
+                OVERPASS_RESPONSE_BYTES.inc(len(body))
+                return json.loads(body)
+            
+            elif response.status in self.RETRYABLE_STATUSES:  # Rate limited or overloaded
+                raise OverpassRetryableError(
+                    response.status, parse_retry_after(response.headers.get('Retry-After'))
+                )
+            
+            else:
+                logging.error(f"Overpass API error: {response.status}")
+                return None
     
     @classmethod
     def _build_overpass_query(cls, lat: float, lon: float, amenity_types: List[AmenityTypeEnum], radius: int) -> str:
         """Build Overpass query for multiple amenities"""
+        return cls._build_area_query(amenity_types, f"around:{radius},{lat},{lon}")
+    
+    @classmethod
+    def _build_bbox_query(cls, south: float, west: float, north: float, east: float, amenity_types: List[AmenityTypeEnum]) -> str:
+        """Build Overpass query for multiple amenities inside a bounding box"""
+        return cls._build_area_query(amenity_types, f"{south},{west},{north},{east}")
+    
+    @classmethod
+    def _build_area_query(cls, amenity_types: List[AmenityTypeEnum], area: str) -> str:
+        """Build Overpass query for multiple amenities inside an area filter"""
         
-        # Map amenity types to Overpass tags
-        amenity_tags = {
-            AmenityTypeEnum.GROCERY: ['shop=supermarket', 'shop=convenience', 'shop=grocery'],
-            AmenityTypeEnum.RESTAURANT: ['amenity=restaurant', 'amenity=fast_food'],
-            AmenityTypeEnum.CAFE: ['amenity=cafe', 'amenity=bar'],
-            AmenityTypeEnum.HOSPITAL: ['amenity=hospital', 'amenity=clinic'],
-            AmenityTypeEnum.SCHOOL: ['amenity=school', 'amenity=university'],
-            AmenityTypeEnum.PARK: ['leisure=park', 'leisure=playground'],
-            AmenityTypeEnum.TRANSIT: ['public_transport=station', 'railway=station'],
-            AmenityTypeEnum.GYM: ['leisure=fitness_centre', 'leisure=sports_centre'],
-            AmenityTypeEnum.LIBRARY: ['amenity=library']
-        }
-        
-        # Build query parts
+        # One regex-union filter per tag key instead of one clause per tag
         query_parts = []
-        
-        for amenity_type in amenity_types:
-            tags = amenity_tags.get(amenity_type, [f'amenity={amenity_type.value}'])
-            
-            for tag in tags:
-                key, value = tag.split('=')
-                query_parts.append(f'node["{key}"="{value}"](around:{radius},{lat},{lon});')
-                query_parts.append(f'way["{key}"="{value}"](around:{radius},{lat},{lon});')
+        for tag_filter in overpass_filters(amenity_types):
+            query_parts.append(f'node{tag_filter}({area});')
+            query_parts.append(f'way{tag_filter}({area});')
         
         # Combine into single query
         query = f"""
@@ -92,6 +157,7 @@ class OverpassAPIService:
     def _parse_amenity_response(cls, data: Dict, amenity_types: List[AmenityTypeEnum]) -> Dict[str, int]:
         """Parse Overpass response and count amenities"""
         
+        wanted = set(amenity_types)
         counts = {amenity.value: 0 for amenity in amenity_types}
         
         if 'elements' not in data:
@@ -99,49 +165,30 @@ class OverpassAPIService:
         
         # Count amenities by type
         for element in data['elements']:
-            tags = element.get('tags', {})
-            amenity_type = cls._classify_amenity(tags)
+            amenity_type = classify_tags(element.get('tags', {}))
             
-            if amenity_type and amenity_type in counts:
-                counts[amenity_type] += 1
+            if amenity_type in wanted:
+                counts[amenity_type.value] += 1
         
         return counts
     
     @classmethod
-    def _classify_amenity(cls, tags: Dict[str, str]) -> Optional[str]:
-        """Classify amenity based on its tags"""
-        
-        # Simple classification based on primary tags
-        if 'shop' in tags:
-            shop_type = tags['shop']
-            if shop_type in ['supermarket', 'convenience', 'grocery']:
-                return AmenityTypeEnum.GROCERY.value
-            elif shop_type == 'bakery':
-                return AmenityTypeEnum.CAFE.value
-        
-        if 'amenity' in tags:
-            amenity_type = tags['amenity']
-            if amenity_type in ['restaurant', 'fast_food']:
-                return AmenityTypeEnum.RESTAURANT.value
-            elif amenity_type in ['cafe', 'bar']:
-                return AmenityTypeEnum.CAFE.value
-            elif amenity_type in ['hospital', 'clinic']:
-                return AmenityTypeEnum.HOSPITAL.value
-            elif amenity_type in ['school', 'university']:
-                return AmenityTypeEnum.SCHOOL.value
-            elif amenity_type == 'library':
-                return AmenityTypeEnum.LIBRARY.value
-            elif amenity_type == 'gym':
-                return AmenityTypeEnum.GYM.value
-        
-        if 'leisure' in tags:
-            leisure_type = tags['leisure']
-            if leisure_type in ['park', 'playground']:
-                return AmenityTypeEnum.PARK.value
-            elif leisure_type in ['fitness_centre', 'sports_centre']:
-                return AmenityTypeEnum.GYM.value
-        
-        if 'public_transport' in tags or 'railway' in tags:
-            return AmenityTypeEnum.TRANSIT.value
-        
-        return None
\ No newline at end of file
+    def _parse_classified_elements(cls, data: Dict, amenity_types: List[AmenityTypeEnum]) -> List[Tuple[int, float, float, str]]:
+        """Parse Overpass response into (OSM id, lat, lon, amenity type) points"""
+        
+        wanted = set(amenity_types)
+        points = []
+        
+        for element in data.get('elements', []):
+            amenity_type = classify_tags(element.get('tags', {}))
+            if amenity_type not in wanted:
+                continue
+            
+            # Nodes carry their own position, ways their center from "out center"
+            position = element if 'lat' in element else element.get('center')
+            if position:
+                # Node and way ids overlap, ways are stored negated to keep one id column
+                osm_id = element.get('id', 0) if element.get('type') != 'way' else -element.get('id', 0)
+                points.append((osm_id, position['lat'], position['lon'], amenity_type.value))
+        
+        return points
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class OverpassCacheMiss(Exception):
+    """Raised in replay mode when a query has no stored response"""
+
+
+class OverpassResponseCache:
+    """
+    Content-addressed cache for raw Overpass responses
+
+    Two tiers: an in-process LRU and an on-disk store with TTL and size-based
+    eviction. In replay mode every response must come from disk, expired or
+    not, and a miss raises OverpassCacheMiss instead of going to the network.
+
+    Disk reads, writes and JSON work run in threads off the event loop. Entry
+    sizes are tracked in an index built by one directory scan on first use and
+    kept up to date on every write and removal, so writes never rescan.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str],
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        max_memory_entries: int = 256,
+        replay_only: bool = False
+    ):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        self.replay_only = replay_only
+
+        self._memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+        # path -> size on disk, oldest first, guarded by _disk_lock as writes run in several threads
+        self._disk_entries: "Optional[OrderedDict[str, int]]" = None
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str) -> str:
+        """Content address of a normalized Overpass query"""
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Get a cached response, memory first then disk"""
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            stored_at, data = entry
+            if self.replay_only or not self._is_expired(stored_at):
+                self._memory.move_to_end(key)
+                return data
+            del self._memory[key]
+
+        stored = await asyncio.to_thread(self._read_from_disk, key) if self.cache_dir else None
+        if stored is not None:
+            stored_at, data = stored
+            self._remember(key, data, stored_at)
+            return data
+
+        if self.replay_only:
+            raise OverpassCacheMiss(f"No stored Overpass response for query {key}")
+
+        return None
+
+    async def put(self, key: str, data: Dict):
+        """Store a response in both tiers"""
+
+        if self.replay_only:
+            return
+
+        self._remember(key, data, time.time())
+        if self.cache_dir:
+            await asyncio.to_thread(self._write_to_disk, key, data)
+
+    def clear_memory(self):
+        self._memory.clear()
+
+    def _is_expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def _remember(self, key: str, data: Dict, stored_at: float):
+        self._memory[key] = (stored_at, data)
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_from_disk(self, key: str) -> Optional[Tuple[float, Dict]]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if not self.replay_only and self._is_expired(stat.st_mtime):
+                with self._disk_lock:
+                    self._remove(path)
+                return None
+
+            with open(path, "r", encoding="utf-8") as f:
+                return stat.st_mtime, json.load(f)
+
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable Overpass cache entry {key}: {e}")
+            return None
+
+    def _write_to_disk(self, key: str, data: Dict):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+            # Atomic replace so concurrent readers never see a partial file
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+            with self._disk_lock:
+                entries = self._get_disk_entries()
+                self._disk_bytes += len(payload) - entries.pop(path, 0)
+                entries[path] = len(payload)  # Newest last
+                self._evict_to_size()
+
+        except OSError as e:
+            logging.warning(f"Could not write Overpass cache entry {key}: {e}")
+
+    def _get_disk_entries(self) -> "OrderedDict[str, int]":
+        """Index of the files on disk, scanned once, callers hold _disk_lock"""
+        if self._disk_entries is None:
+            scanned = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        scanned.append((stat.st_mtime, entry.path, stat.st_size))
+
+            self._disk_entries = OrderedDict((path, size) for _, path, size in sorted(scanned))
+            self._disk_bytes = sum(self._disk_entries.values())
+        return self._disk_entries
+
+    def _evict_to_size(self):
+        # Oldest entries go first
+        while self._disk_bytes > self.max_disk_bytes and self._disk_entries:
+            self._remove(next(iter(self._disk_entries)))
+
+    def _remove(self, path: str):
+        """Delete an entry and drop it from the index, callers hold _disk_lock"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        if self._disk_entries is not None:
+            self._disk_bytes -= self._disk_entries.pop(path, 0)
+
+
+def create_overpass_cache_from_env() -> OverpassResponseCache:
+    """Build the process-wide cache from OVERPASS_CACHE_* environment variables"""
+    return OverpassResponseCache(
+        cache_dir=os.getenv("OVERPASS_CACHE_DIR", os.path.join("data", "overpass_cache")),
+        ttl_seconds=int(os.getenv("OVERPASS_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+        max_disk_bytes=int(os.getenv("OVERPASS_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+        max_memory_entries=int(os.getenv("OVERPASS_CACHE_MEMORY_ENTRIES", 256)),
+        replay_only=os.getenv("OVERPASS_CACHE_MODE", "").lower() == "replay"
+    )
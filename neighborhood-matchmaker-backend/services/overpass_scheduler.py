@@ -0,0 +1,168 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class OverpassRetryableError(Exception):
+    """Upstream asked us to back off (429) or is temporarily overloaded (5xx)"""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"Overpass API returned {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header as seconds, it may be a number or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class OverpassScheduler:
+    """
+    Process-wide scheduler for Overpass calls
+
+    A token bucket paces request starts and a semaphore bounds concurrency.
+    The rate adapts (halved on every 429, raised slowly on success). Retryable
+    errors pause every caller until Retry-After or an exponential backoff with
+    jitter has passed, and each call gets a bounded number of retries.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float = 1.0,
+        burst: int = 2,
+        max_concurrency: int = 2,
+        max_retries: int = 4,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 60.0,
+        min_rate_per_second: float = 0.05
+    ):
+        self.max_rate = rate_per_second
+        self.min_rate = min(min_rate_per_second, rate_per_second)
+        self.rate = rate_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._token_lock = asyncio.Lock()
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.exhausted = 0
+
+    async def run(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """Run an operation under the rate limit, retrying OverpassRetryableError"""
+
+        for attempt in range(self.max_retries + 1):
+            self.queue_depth += 1
+            try:
+                await self._concurrency.acquire()
+                try:
+                    await self._take_token()
+                except BaseException:
+                    self._concurrency.release()
+                    raise
+            finally:
+                self.queue_depth -= 1
+
+            self.in_flight += 1
+            self.requests += 1
+            try:
+                result = await operation()
+                self._on_success()
+                return result
+
+            except OverpassRetryableError as e:
+                self._on_retryable(e, attempt)
+                if attempt == self.max_retries:
+                    self.exhausted += 1
+                    raise
+                self.retries += 1
+
+            finally:
+                self.in_flight -= 1
+                self._concurrency.release()
+
+    async def _take_token(self):
+        # The lock keeps waiters in FIFO order, only its holder sleeps for the next token
+        async with self._token_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def _on_success(self):
+        # Additive increase back towards the configured rate
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def _on_retryable(self, error: OverpassRetryableError, attempt: int):
+        if error.status == 429:
+            # Multiplicative decrease
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+
+        backoff = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt)
+        delay = error.retry_after if error.retry_after is not None else random.uniform(0, backoff)
+
+        # Everyone waits, so a 429 storm does not pile up new requests
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self._tokens = 0.0
+        logging.warning(f"Overpass API returned {error.status}, pausing {delay:.1f}s (attempt {attempt + 1})")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate_per_second": self.rate,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "exhausted": self.exhausted,
+            "paused_for_seconds": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+
+def create_overpass_scheduler_from_env() -> OverpassScheduler:
+    """Build the process-wide scheduler from OVERPASS_* environment variables"""
+    return OverpassScheduler(
+        rate_per_second=float(os.getenv("OVERPASS_RATE_PER_SECOND", 1.0)),
+        burst=int(os.getenv("OVERPASS_BURST", 2)),
+        max_concurrency=int(os.getenv("OVERPASS_MAX_CONCURRENCY", 2)),
+        max_retries=int(os.getenv("OVERPASS_MAX_RETRIES", 4)),
+        backoff_base_seconds=float(os.getenv("OVERPASS_BACKOFF_BASE_SECONDS", 1.0)),
+        backoff_max_seconds=float(os.getenv("OVERPASS_BACKOFF_MAX_SECONDS", 60.0))
+    )
@@ -0,0 +1,260 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows, compactions of processes sharing a directory are not serialized
+    fcntl = None
+
+TileKey = Tuple[int, int]
+
+POI_STORE_DIR = os.getenv("POI_STORE_DIR", os.path.join("data", "poi_store"))
+
+# One .npy file per column, memory-mapped read-only once written
+COLUMNS = {"ids": np.int64, "lats": np.float64, "lons": np.float64, "types": np.int8}
+
+# Tile directory of a segment, every tile is one contiguous slice of the columns
+TILE_DTYPE = np.dtype([
+    ("row", np.int64), ("col", np.int64), ("start", np.int64), ("end", np.int64), ("fetched_at", np.float64)
+])
+
+TileColumns = Dict[str, np.ndarray]
+
+
+class POISegment:
+    """Immutable generation of tiles written by one flush, columns memory-mapped from disk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.columns: TileColumns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in COLUMNS
+        }
+        self.tiles = np.load(os.path.join(path, "tiles.npy"))
+
+    @classmethod
+    def write(cls, path: str, tiles: List[Tuple[TileKey, float, TileColumns]]) -> "POISegment":
+        """Write tiles as a new segment, renamed into place only once complete"""
+
+        # Segment paths are unique per writer, so is the temporary one
+        temporary_path = f"{path}.tmp"
+        os.makedirs(temporary_path)
+
+        directory = np.zeros(len(tiles), dtype=TILE_DTYPE)
+        start = 0
+        for i, ((row, col), fetched_at, columns) in enumerate(tiles):
+            end = start + len(columns["ids"])
+            directory[i] = (row, col, start, end, fetched_at)
+            start = end
+
+        for name, dtype in COLUMNS.items():
+            data = np.concatenate([columns[name] for _, _, columns in tiles]) if tiles else []
+            np.save(os.path.join(temporary_path, f"{name}.npy"), np.asarray(data, dtype=dtype))
+        np.save(os.path.join(temporary_path, "tiles.npy"), directory)
+
+        os.rename(temporary_path, path)
+        return cls(path)
+
+    def tile_columns(self, start: int, end: int) -> TileColumns:
+        # Slices of the maps, nothing is read until the points are used
+        return {name: column[start:end] for name, column in self.columns.items()}
+
+
+class POIStore:
+    """
+    Columnar on-disk store of classified POIs per tile
+
+    Fetched tiles are buffered and flushed as a new segment of .npy columns
+    (id, lat, lon, type) plus a tile directory. Segments are memory-mapped when
+    the store opens, the most recently fetched copy of a tile wins, and
+    segments are compacted into one once there are too many. Counts for any
+    radius can be recomputed from the stored points without refetching.
+
+    put_tile, flush and compact are meant to run in a worker thread. Files are
+    written outside the index lock, so readers on the event loop only wait for
+    dictionary updates. Processes may share a directory: segment names are
+    unique per writer and compaction holds a file lock.
+    """
+
+    def __init__(self, directory: str, tile_degrees: float, flush_tiles: int = 64, max_segments: int = 16):
+        # Tiles of another grid size never match, so each grid gets its own directory
+        self.directory = os.path.join(directory, f"tiles_{tile_degrees:g}")
+        self.tile_degrees = tile_degrees
+        self.flush_tiles = flush_tiles
+        self.max_segments = max_segments
+
+        self.segments: List[POISegment] = []
+        self._tiles: Dict[TileKey, Tuple[POISegment, int, int, float]] = {}
+        self._pending: Dict[TileKey, Tuple[float, TileColumns]] = {}
+
+        self._lock = threading.Lock()  # segments, _tiles and _pending
+        self._write_lock = threading.Lock()  # one flush or compaction at a time in this process
+
+    def open(self) -> "POIStore":
+        """Map every complete segment, leftovers of interrupted flushes are ignored"""
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_new_segments()
+
+        logging.info(f"Opened POI store with {len(self._tiles)} tiles in {len(self.segments)} segments from {self.directory}")
+        return self
+
+    def get_tile(self, key: TileKey) -> Optional[Tuple[float, TileColumns]]:
+        """(fetched_at, columns) of a stored tile, fetched_at in seconds since the epoch"""
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending
+
+            entry = self._tiles.get(key)
+        if entry is None:
+            return None
+
+        segment, start, end, fetched_at = entry
+        return fetched_at, segment.tile_columns(start, end)
+
+    def put_tile(self, key: TileKey, fetched_at: float, columns: TileColumns):
+        with self._lock:
+            self._pending[key] = (fetched_at, columns)
+            full = len(self._pending) >= self.flush_tiles
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write buffered tiles as one segment, compacting when segments pile up"""
+
+        with self._write_lock:
+            with self._lock:
+                pending = dict(self._pending)
+            if not pending:
+                return
+
+            tiles = [(key, fetched_at, columns) for key, (fetched_at, columns) in pending.items()]
+            try:
+                segment = POISegment.write(self._new_segment_path(), tiles)
+            except OSError as e:
+                logging.error(f"Error writing POI store segment: {e}")
+                return
+
+            with self._lock:
+                self._index(segment)
+                # Tiles put again while the segment was written stay pending
+                for key, entry in pending.items():
+                    if self._pending.get(key) is entry:
+                        del self._pending[key]
+                compact = len(self.segments) > self.max_segments
+
+            if compact:
+                self._compact()
+
+    def compact(self):
+        """Rewrite the live copy of every tile as a single segment and drop the old ones"""
+        with self._write_lock:
+            self._compact()
+
+    def _compact(self):
+        started = time.perf_counter()
+        with self._directory_lock():
+            # Other processes sharing the directory may have flushed since, their segments are compacted too
+            self._load_new_segments()
+            with self._lock:
+                old_segments = list(self.segments)
+                tiles = [
+                    (key, fetched_at, segment.tile_columns(start, end))
+                    for key, (segment, start, end, fetched_at) in self._tiles.items()
+                ]
+
+            try:
+                segment = POISegment.write(self._new_segment_path(), tiles)
+            except OSError as e:
+                logging.error(f"Error compacting POI store: {e}")
+                return
+
+            with self._lock:
+                self.segments, self._tiles = [], {}
+                self._index(segment)
+
+            # Maps held by cached tiles, here or in other processes, stay valid after the files are unlinked
+            for old_segment in old_segments:
+                shutil.rmtree(old_segment.path, ignore_errors=True)
+
+        logging.info(f"Compacted {len(old_segments)} POI store segments in {time.perf_counter() - started:.2f}s")
+
+    def iter_tiles(self, include_pending: bool = True) -> Iterator[Tuple[TileKey, float, TileColumns]]:
+        with self._lock:
+            stored = list(self._tiles.items())
+            pending = dict(self._pending) if include_pending else {}
+
+        for key, (segment, start, end, fetched_at) in stored:
+            if key not in pending:
+                yield key, fetched_at, segment.tile_columns(start, end)
+        for key, (fetched_at, columns) in pending.items():
+            yield key, fetched_at, columns
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(set(self._tiles) | set(self._pending))
+
+    def _load_new_segments(self):
+        """Map complete segments on disk that are not indexed yet"""
+        with self._lock:
+            known = {segment.path for segment in self.segments}
+
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if name.startswith("segment-") and not name.endswith(".tmp") and path not in known:
+                try:
+                    segment = POISegment(path)
+                except OSError:
+                    continue  # Removed by another process's compaction meanwhile
+                with self._lock:
+                    self._index(segment)
+
+    def _index(self, segment: POISegment):
+        self.segments.append(segment)
+        for row, col, start, end, fetched_at in segment.tiles.tolist():
+            current = self._tiles.get((row, col))
+            if current is None or fetched_at >= current[3]:
+                self._tiles[(row, col)] = (segment, start, end, fetched_at)
+
+    def _new_segment_path(self) -> str:
+        # Time first so names sort by age, pid and a random suffix keep writers sharing the directory apart
+        return os.path.join(self.directory, f"segment-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+
+    @contextmanager
+    def _directory_lock(self):
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(self.directory, ".compact.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def open_poi_store_from_env(tile_degrees: float) -> Optional[POIStore]:
+    """Open the store configured by the environment, None when POI_STORE_ENABLED is off"""
+
+    if os.getenv("POI_STORE_ENABLED", "true").lower() != "true":
+        return None
+
+    try:
+        return POIStore(
+            POI_STORE_DIR,
+            tile_degrees,
+            flush_tiles=int(os.getenv("POI_STORE_FLUSH_TILES", 64)),
+            max_segments=int(os.getenv("POI_STORE_MAX_SEGMENTS", 16))
+        ).open()
+    except OSError as e:
+        logging.error(f"Error opening POI store at {POI_STORE_DIR}: {e}")
+        return None
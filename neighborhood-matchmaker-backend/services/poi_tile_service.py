@@ -0,0 +1,241 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from enums.amenity_type import AmenityTypeEnum
+from services.amenity_taxonomy import AMENITY_INDEX
+from services.overpass_api_service import OverpassAPIService
+from services.poi_store import POIStore, TileKey
+
+
+def count_points_within_radii(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    types: np.ndarray,
+    lat: float,
+    lon: float,
+    amenity_types: List[AmenityTypeEnum],
+    radii_meters: Sequence[int]
+) -> Dict[int, Dict[str, int]]:
+    """Count classified points within each radius of a center, per amenity type, from one distance pass"""
+
+    # Haversine distance in meters from the center to every POI
+    lat_rad, lon_rad = math.radians(lat), math.radians(lon)
+    dlat = np.radians(lats) - lat_rad
+    dlon = np.radians(lons) - lon_rad
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat_rad) * np.cos(np.radians(lats)) * np.sin(dlon / 2) ** 2
+    distances = 2 * 6371000 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    counts_by_radius = {}
+    for radius_meters in radii_meters:
+        counts = np.bincount(types[distances <= radius_meters], minlength=len(AMENITY_INDEX))
+        counts_by_radius[int(radius_meters)] = {
+            amenity.value: int(counts[AMENITY_INDEX[amenity.value]]) for amenity in amenity_types
+        }
+    return counts_by_radius
+
+
+class POITile:
+    """Classified POIs of one grid tile as compact arrays"""
+
+    __slots__ = ("ids", "lats", "lons", "types", "fetched_at")
+
+    def __init__(self, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray, types: np.ndarray, fetched_at: float):
+        self.ids = ids
+        self.lats = lats
+        self.lons = lons
+        self.types = types
+        self.fetched_at = fetched_at  # Seconds since the epoch, tiles outlive the process in the POI store
+
+    @classmethod
+    def from_points(cls, points: List[Tuple[int, float, float, str]]) -> "POITile":
+        return cls(
+            np.array([osm_id for osm_id, _, _, _ in points], dtype=np.int64),
+            np.array([lat for _, lat, _, _ in points], dtype=np.float64),
+            np.array([lon for _, _, lon, _ in points], dtype=np.float64),
+            np.array([AMENITY_INDEX[amenity] for _, _, _, amenity in points], dtype=np.int8),
+            time.time()
+        )
+
+    @classmethod
+    def from_columns(cls, fetched_at: float, columns: Dict[str, np.ndarray]) -> "POITile":
+        return cls(columns["ids"], columns["lats"], columns["lons"], columns["types"], fetched_at)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {"ids": self.ids, "lats": self.lats, "lons": self.lons, "types": self.types}
+
+
+class POITileService:
+    """
+    Fixed geographic tile grid of classified POIs
+
+    Every tile is fetched once with all amenity types, then counts for any set
+    of radii are computed locally from the tiles covering the circle. Tiles and in-flight
+    fetches are shared process-wide, so concurrent searches trigger at most one
+    Overpass request per uncached tile. With a POI store, tiles are also
+    persisted and read back from disk before Overpass is asked again.
+    """
+
+    tile_degrees = float(os.getenv("POI_TILE_DEGREES", 0.02))
+    max_tiles = int(os.getenv("POI_TILE_CACHE_SIZE", 4096))
+    tile_ttl_seconds = float(os.getenv("POI_TILE_TTL_SECONDS", 24 * 3600))
+
+    _tiles: "OrderedDict[TileKey, POITile]" = OrderedDict()
+    _inflight: Dict[TileKey, asyncio.Future] = {}
+
+    # Opened by the app lifespan, tiles are only kept in memory without it
+    store: Optional[POIStore] = None
+
+    def __init__(self, overpass_service: OverpassAPIService):
+        self.overpass_service = overpass_service
+
+    async def get_amenity_counts(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radius_meters: int = 1000
+    ) -> Dict[str, int]:
+        """Count amenities within radius of a point from the covering tiles"""
+
+        counts_by_radius = await self.get_amenity_counts_by_radius(lat, lon, amenity_types, [radius_meters])
+        return counts_by_radius[int(radius_meters)]
+
+    async def get_amenity_counts_by_radius(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radii_meters: Sequence[int]
+    ) -> Dict[int, Dict[str, int]]:
+        """Counts for every radius from the tiles covering the largest one"""
+
+        tile_keys = self._covering_tiles(lat, lon, max(radii_meters))
+        tiles = await asyncio.gather(*[self._get_tile(key) for key in tile_keys])
+
+        return self._count_within_radii(tiles, lat, lon, amenity_types, radii_meters)
+
+    async def _get_tile(self, key: TileKey) -> POITile:
+        tile = self._tiles.get(key)
+        if tile is not None and self._is_fresh(tile.fetched_at):
+            self._tiles.move_to_end(key)
+            return tile
+
+        stored = self.store.get_tile(key) if self.store is not None else None
+        if stored is not None and self._is_fresh(stored[0]):
+            return self._remember(key, POITile.from_columns(*stored))
+
+        # Single flight: join the fetch already running for this tile
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_tile(key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shielded so one cancelled search does not cancel the shared fetch
+        return await asyncio.shield(future)
+
+    async def _fetch_tile(self, key: TileKey) -> POITile:
+        south, west, north, east = self._tile_bounds(key)
+        logging.info(f"Fetching POI tile {key}")
+
+        points = await self.overpass_service.get_classified_elements(
+            south, west, north, east, list(AmenityTypeEnum)
+        )
+
+        # Ways crossing a tile edge come back for both tiles, keep each point in one tile only
+        tile = POITile.from_points([
+            (osm_id, lat, lon, amenity) for osm_id, lat, lon, amenity in points
+            if key == self._tile_key(lat, lon)
+        ])
+        if self.store is not None:
+            # A put can flush and compact segments, file writes stay off the event loop
+            await asyncio.to_thread(self.store.put_tile, key, tile.fetched_at, tile.columns())
+
+        return self._remember(key, tile)
+
+    def _remember(self, key: TileKey, tile: POITile) -> POITile:
+        self._tiles[key] = tile
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _is_fresh(self, fetched_at: float) -> bool:
+        return time.time() - fetched_at <= self.tile_ttl_seconds
+
+    def uncached_tile_count(self, lat: float, lon: float, radius_meters: int) -> int:
+        """Overpass requests counting around a point would issue now, tiles already being fetched are free"""
+        return sum(
+            1 for key in self._covering_tiles(lat, lon, radius_meters)
+            if not self._is_cached(key) and key not in self._inflight
+        )
+
+    def _is_cached(self, key: TileKey) -> bool:
+        tile = self._tiles.get(key)
+        if tile is not None and self._is_fresh(tile.fetched_at):
+            return True
+        stored = self.store.get_tile(key) if self.store is not None else None
+        return stored is not None and self._is_fresh(stored[0])
+
+    def count_from_store(
+        self,
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radii_meters: Sequence[int]
+    ) -> Optional[Tuple[Dict[int, Dict[str, int]], float]]:
+        """
+        Counts per radius and the oldest fetch time from stored tiles regardless of age
+
+        None unless every tile covering the largest radius is in the store, nothing is fetched.
+        """
+
+        stored = [self.store.get_tile(key) for key in self._covering_tiles(lat, lon, max(radii_meters))]
+        if any(entry is None for entry in stored):
+            return None
+
+        tiles = [POITile.from_columns(*entry) for entry in stored]
+        counts_by_radius = self._count_within_radii(tiles, lat, lon, amenity_types, radii_meters)
+        return counts_by_radius, min(tile.fetched_at for tile in tiles)
+
+    def _tile_key(self, lat: float, lon: float) -> TileKey:
+        return math.floor(lat / self.tile_degrees), math.floor(lon / self.tile_degrees)
+
+    def _tile_bounds(self, key: TileKey) -> Tuple[float, float, float, float]:
+        row, col = key
+        size = self.tile_degrees
+        return (
+            round(row * size, 6),
+            round(col * size, 6),
+            round((row + 1) * size, 6),
+            round((col + 1) * size, 6)
+        )
+
+    def _covering_tiles(self, lat: float, lon: float, radius_meters: int) -> List[TileKey]:
+        """Tiles intersecting the bounding box of the search circle"""
+        dlat = radius_meters / 111320
+        dlon = radius_meters / (111320 * max(math.cos(math.radians(lat)), 1e-6))
+
+        min_row, min_col = self._tile_key(lat - dlat, lon - dlon)
+        max_row, max_col = self._tile_key(lat + dlat, lon + dlon)
+
+        return [(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
+
+    def _count_within_radii(
+        self,
+        tiles: List[POITile],
+        lat: float,
+        lon: float,
+        amenity_types: List[AmenityTypeEnum],
+        radii_meters: Sequence[int]
+    ) -> Dict[int, Dict[str, int]]:
+        return count_points_within_radii(
+            np.concatenate([tile.lats for tile in tiles]),
+            np.concatenate([tile.lons for tile in tiles]),
+            np.concatenate([tile.types for tile in tiles]),
+            lat, lon, amenity_types, radii_meters
+        )
@@ -1,23 +1,31 @@
 from typing import Dict, List, Optional
+import numpy as np
 from enums.amenity_type import AmenityTypeEnum
+from services.amenity_taxonomy import AMENITY_INDEX, AMENITY_TAXONOMY, AMENITY_WEIGHTS, ESSENTIAL_AMENITIES
+from metrics import SEARCH_STAGE_SECONDS
 
 
 class ScoringService:
     """Service to handle neighborhood scoring with dynamic amenity weighting"""
     
     def __init__(self):
-        # Base weights for different amenities
-        self.amenity_weights = {
-            AmenityTypeEnum.GROCERY: 10,
-            AmenityTypeEnum.TRANSIT: 9,
-            AmenityTypeEnum.HOSPITAL: 9,
-            AmenityTypeEnum.RESTAURANT: 8,
-            AmenityTypeEnum.SCHOOL: 7,
-            AmenityTypeEnum.PARK: 7,
-            AmenityTypeEnum.CAFE: 6,
-            AmenityTypeEnum.GYM: 6,
-            AmenityTypeEnum.LIBRARY: 5,
-        }
+        # Base weights for different amenities, declared in the amenity taxonomy
+        self.amenity_weights = {amenity: definition["weight"] for amenity, definition in AMENITY_TAXONOMY.items()}
+        
+        # Column layout of the count matrices used by batch scoring
+        self.amenity_columns = {amenity: AMENITY_INDEX[amenity.value] for amenity in AmenityTypeEnum}
+        
+        # Per-amenity score lookup tables indexed by min(count, 3), built from the
+        # scalar helpers so batch scores match calculate_neighborhood_score exactly
+        self.dynamic_score_table = np.array([
+            [self._get_dynamic_amenity_score(count, self.amenity_weights.get(amenity, 5), amenity) for count in range(4)]
+            for amenity in AmenityTypeEnum
+        ])
+        self.targeted_score_table = np.array([
+            [self._get_targeted_amenity_score(count, self.amenity_weights.get(amenity, 5)) for count in range(4)]
+            for amenity in AmenityTypeEnum
+        ])
+        self.weight_array = AMENITY_WEIGHTS
     
     def calculate_neighborhood_score(
         self, 
@@ -64,6 +72,85 @@ class ScoringService:
         
         return max(0, percentage_score)
     
+    @SEARCH_STAGE_SECONDS.labels(stage="scoring").time()
+    def calculate_neighborhood_scores(
+        self,
+        count_matrix: np.ndarray,
+        requested_amenities: List[AmenityTypeEnum],
+        commute_times: np.ndarray,
+        max_commute_time: Optional[int] = None,
+        preferred_mask: Optional[np.ndarray] = None,
+        search_all_amenities: bool = False
+    ) -> np.ndarray:
+        """
+        Batch version of calculate_neighborhood_score for a whole city
+        
+        Args:
+            count_matrix: (neighborhoods x AmenityTypeEnum) counts, columns in amenity_columns order
+            requested_amenities: List of amenities to consider
+            commute_times: Commute time in minutes per neighborhood, NaN when unknown
+            max_commute_time: Maximum acceptable commute time
+            preferred_mask: Boolean mask of preferred neighborhoods
+            search_all_amenities: Whether user selected specific amenities or searching all
+        """
+        
+        counts = np.asarray(count_matrix, dtype=np.int64).reshape(-1, len(self.amenity_columns))
+        commute_times = np.asarray(commute_times, dtype=np.float64)
+        if preferred_mask is None:
+            preferred_mask = np.zeros(len(counts), dtype=bool)
+        
+        # Amenity scores via table lookup on clipped counts
+        columns = np.array([self.amenity_columns[amenity] for amenity in requested_amenities], dtype=np.intp)
+        score_table = self.dynamic_score_table if search_all_amenities else self.targeted_score_table
+        tiers = np.clip(counts[:, columns], 0, 3)
+        amenity_score = score_table[columns, tiers].sum(axis=1)
+        max_amenity_score = int(self.weight_array[columns].sum())
+        
+        if search_all_amenities:
+            amenity_score = amenity_score + self._calculate_diversity_bonuses(counts[:, np.unique(columns)])
+            max_amenity_score += 10  # Max diversity bonus
+        
+        commute_score, max_commute_score = self._calculate_commute_scores(commute_times, max_commute_time)
+        
+        preferred_bonus = np.where(preferred_mask, 5, 0)
+        
+        total_score = amenity_score + commute_score + preferred_bonus
+        max_possible_score = max_amenity_score + max_commute_score + preferred_bonus
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percentage_score = np.minimum(100, np.trunc((total_score / max_possible_score) * 100))
+        percentage_score = np.where(max_possible_score > 0, percentage_score, 0)
+        
+        return np.maximum(0, percentage_score).astype(int)
+    
+    def calculate_score_upper_bounds(
+        self,
+        known_count_matrix: np.ndarray,
+        requested_amenities: List[AmenityTypeEnum],
+        commute_times: np.ndarray,
+        max_commute_time: Optional[int] = None,
+        preferred_mask: Optional[np.ndarray] = None,
+        search_all_amenities: bool = False
+    ) -> np.ndarray:
+        """
+        Optimistic scores before amenities are fetched
+        
+        Unknown counts (negative entries) are treated as saturated, the maximum
+        achievable amenity score. Scores only grow with counts, so no
+        neighborhood can end up above its bound, and fully known rows are exact.
+        """
+        saturated = self.dynamic_score_table.shape[1] - 1
+        optimistic_counts = np.where(np.asarray(known_count_matrix) < 0, saturated, known_count_matrix)
+        
+        return self.calculate_neighborhood_scores(
+            count_matrix=optimistic_counts,
+            requested_amenities=requested_amenities,
+            commute_times=commute_times,
+            max_commute_time=max_commute_time,
+            preferred_mask=preferred_mask,
+            search_all_amenities=search_all_amenities
+        )
+    
     def _calculate_dynamic_amenity_score(self, amenity_counts: Dict[str, int], all_amenities: List[AmenityTypeEnum]) -> tuple[int, int]:
         """
         Dynamic scoring when user didn't select specific amenities
@@ -117,9 +204,7 @@ class ScoringService:
         Dynamic amenity scoring - considers both quantity and essential vs nice-to-have
         """
         # Essential amenities (grocery, transit, hospital) - higher threshold for full points
-        essential_amenities = {AmenityTypeEnum.GROCERY, AmenityTypeEnum.TRANSIT, AmenityTypeEnum.HOSPITAL}
-        
-        if amenity_type in essential_amenities:
+        if amenity_type in ESSENTIAL_AMENITIES:
             if count >= 2:
                 return weight  # Full points for 2+ essential amenities
             elif count == 1:
@@ -173,6 +258,33 @@ class ScoringService:
         else:
             return 0   # Very limited diversity
     
+    def _calculate_diversity_bonuses(self, counts: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_diversity_bonus over rows of a count matrix"""
+        diversity_percentage = (counts > 0).sum(axis=1) / len(AmenityTypeEnum)
+        
+        return np.select(
+            [diversity_percentage >= 0.8, diversity_percentage >= 0.6, diversity_percentage >= 0.4, diversity_percentage >= 0.2],
+            [10, 7, 4, 2],
+            default=0
+        )
+    
+    def _calculate_commute_scores(self, commute_times: np.ndarray, max_commute_time: Optional[int]) -> tuple[np.ndarray, np.ndarray]:
+        """Vectorized _calculate_commute_score, NaN commute times score 0 out of 0"""
+        max_commute_points = 15
+        
+        if max_commute_time is not None:
+            thresholds = [max_commute_time * 0.7, max_commute_time, max_commute_time * 1.2]
+            points = [max_commute_points, int(max_commute_points * 0.7), int(max_commute_points * 0.3)]
+        else:
+            thresholds = [15, 25, 35, 45]
+            points = [max_commute_points, int(max_commute_points * 0.8), int(max_commute_points * 0.6), int(max_commute_points * 0.3)]
+        
+        known = ~np.isnan(commute_times)
+        commute_score = np.select([known & (commute_times <= threshold) for threshold in thresholds], points, default=0)
+        max_commute_score = np.where(known, max_commute_points, 0)
+        
+        return commute_score, max_commute_score
+    
     def _calculate_commute_score(self, commute_time: Optional[int], max_commute_time: Optional[int]) -> tuple[int, int]:
         """Calculate commute-based score"""
         max_commute_points = 15  # Increased weight for commute
@@ -0,0 +1,119 @@
+import os
+import time
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Set, Tuple
+from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
+from dtos.search_result import SearchResult
+
+SearchKey = Tuple
+
+
+def make_search_key(search_dto: NeighborhoodSearchDTO) -> SearchKey:
+    """Canonical search key, order of amenities, rent types and preferred neighborhoods does not matter"""
+
+    def as_set(values) -> Optional[Tuple]:
+        if not values:
+            return None
+        return tuple(sorted({getattr(value, "value", value) for value in values}))
+
+    return (
+        search_dto.city,
+        search_dto.destination_neighborhood,
+        search_dto.max_commute_time,
+        search_dto.budget,
+        as_set(search_dto.amenities),  # None keeps dynamic "all amenities" scoring distinct
+        as_set(search_dto.rent_types),
+        as_set(search_dto.preferred_neighborhoods),
+        int(search_dto.radius_meters),
+    )
+
+
+class SearchResultCache:
+    """
+    Bounded LRU of search results with a TTL
+
+    Every entry remembers the amenity data version of its city. Inserting or
+    changing stored amenity counts of a city bumps that version, which
+    invalidates all of its entries. Versions are per process, across workers
+    the TTL bounds staleness.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[SearchKey, Tuple[float, int, SearchResult]]" = OrderedDict()
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._versions_lock = threading.Lock()  # Counts are stored from executor threads
+
+    def get_version(self, city: str) -> int:
+        return self._versions[city]
+
+    def invalidate_city(self, city: str) -> int:
+        """Bump the city's version, returns the new one"""
+        with self._versions_lock:
+            self._versions[city] += 1
+            return self._versions[city]
+
+    def get(self, key: SearchKey) -> Optional[SearchResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, version, result = entry
+        city = key[0]
+        if version != self._versions[city] or time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: SearchKey, result: SearchResult, version: int):
+        """Store a result computed from the data at the given city version"""
+        self._entries[key] = (time.monotonic(), version, result)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SearchVersion:
+    """
+    Tracks the city version one search computes its result from
+
+    The rows a search fetches bump the city version like any other write. The
+    search claims the versions its own writes created, so its result is still
+    cached, at the version after them. A version it did not create, or a
+    neighborhood scored with zeros from a failed fetch, keeps it out.
+    """
+
+    def __init__(self, city: str, cache: Optional[SearchResultCache] = None):
+        self.city = city
+        self.cache = cache or search_result_cache
+        self.start = self.cache.get_version(city)
+        self.own_versions: Set[int] = set()
+        self.failed_fetches = 0
+
+    def claim(self, invalidated: Dict[str, int]):
+        """Record the versions returned by a store of counts this search scored with"""
+        version = invalidated.get(self.city)
+        if version is not None and version > self.start:
+            self.own_versions.add(version)
+
+    def cacheable_version(self) -> Optional[int]:
+        """Version to cache the result at, None when it may already be stale"""
+        current = self.cache.get_version(self.city)
+        if self.failed_fetches or set(range(self.start + 1, current + 1)) != self.own_versions:
+            return None
+        return current
+
+
+search_result_cache = SearchResultCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 1024)),
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 300))
+)
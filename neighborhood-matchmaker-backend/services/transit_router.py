@@ -0,0 +1,388 @@
+import os
+import logging
+import zipfile
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+TRANSIT_TABLES_DIR = os.getenv("TRANSIT_TABLES_DIR", os.path.join("data", "gtfs"))
+
+# Walking legs: straight-line distance stretched for street detours, at about 4.7 km/h
+WALK_SPEED_METERS_PER_SECOND = 1.3
+WALK_DETOUR_FACTOR = 1.25
+ACCESS_RADIUS_METERS = 800  # Neighborhood center to stop
+TRANSFER_RADIUS_METERS = 250  # Stop to stop between two rides
+MAX_ROUNDS = 5  # Rides per journey, 4 transfers
+
+# Departure windows a table is computed for, (name, start, end) in seconds after midnight
+DEFAULT_BUCKETS = [
+    ("am_peak", 7 * 3600, 9 * 3600),
+    ("midday", 11 * 3600, 13 * 3600),
+    ("pm_peak", 16 * 3600, 18 * 3600),
+    ("evening", 19 * 3600, 21 * 3600),
+]
+
+UNREACHED = np.float32(np.inf)
+
+
+def walk_seconds_matrix(lats1: np.ndarray, lons1: np.ndarray, lats2: np.ndarray, lons2: np.ndarray) -> np.ndarray:
+    """Walking seconds between every point of set 1 and set 2"""
+    lat1, lon1 = np.radians(lats1)[:, None], np.radians(lons1)[:, None]
+    lat2, lon2 = np.radians(lats2)[None, :], np.radians(lons2)[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    meters = 2 * 6371000 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return (meters * WALK_DETOUR_FACTOR / WALK_SPEED_METERS_PER_SECOND).astype(np.float32)
+
+
+def _pairs_within(
+    lats1: np.ndarray, lons1: np.ndarray, lats2: np.ndarray, lons2: np.ndarray, max_seconds: float, chunk: int = 512
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(index in set 1, index in set 2, walk seconds) of every pair within max_seconds"""
+
+    # Latitude-sorted chunks of set 1 are only compared to the band of set 2 they can reach
+    max_degrees = max_seconds * WALK_SPEED_METERS_PER_SECOND / WALK_DETOUR_FACTOR / 111000 + 1e-6
+    order1, order2 = np.argsort(lats1), np.argsort(lats2)
+    sorted_lats2 = lats2[order2]
+
+    firsts, seconds, walks = [], [], []
+    for start in range(0, len(lats1), chunk):
+        rows = order1[start:start + chunk]
+        low, high = np.searchsorted(sorted_lats2, [lats1[rows[0]] - max_degrees, lats1[rows[-1]] + max_degrees])
+        cols = order2[low:high]
+        walk = walk_seconds_matrix(lats1[rows], lons1[rows], lats2[cols], lons2[cols])
+        near_rows, near_cols = np.nonzero(walk <= max_seconds)
+        firsts.append(rows[near_rows])
+        seconds.append(cols[near_cols])
+        walks.append(walk[near_rows, near_cols])
+    if not firsts:
+        return np.zeros(0, np.intp), np.zeros(0, np.intp), np.zeros(0, np.float32)
+    return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(walks)
+
+
+class TransitPattern:
+    """Trips serving the same stop sequence, as [trips x stops] time arrays sorted so no trip overtakes another"""
+
+    __slots__ = ("stops", "loops", "departures", "arrivals", "_span", "_offsets", "_search_keys")
+
+    def __init__(self, stops: np.ndarray, departures: np.ndarray, arrivals: np.ndarray):
+        self.stops = stops
+        self.loops = len(np.unique(stops)) < len(stops)  # Visits a stop twice, updates need ufunc.at
+        self.departures = departures
+        self.arrivals = np.vstack([arrivals, np.full((1, len(stops)), UNREACHED, dtype=np.float32)])
+
+        # Every column is sorted, offsetting column i by i * span makes one sorted array,
+        # so the first catchable trip at every stop is a single searchsorted call
+        self._span = float(departures.max()) + 1
+        self._offsets = np.arange(len(stops)) * self._span
+        self._search_keys = (departures.T.astype(np.float64) + self._offsets[:, None]).ravel()
+
+    def first_catchable(self, ready: np.ndarray) -> np.ndarray:
+        """[stops x queries] index of the first trip leaving at or after ready, len(trips) when none does"""
+        trip_count = len(self.departures)
+
+        # Past the last departure (or unreached) stays inside its own column and finds no trip
+        keys = np.minimum(ready.astype(np.float64), self._span - 0.5) + self._offsets[:, None]
+        return np.searchsorted(self._search_keys, keys, side="left") - (np.arange(len(self.stops)) * trip_count)[:, None]
+
+
+class TransitTimetable:
+    """
+    One service day of a GTFS feed as compact arrays for RAPTOR
+
+    Stops are indexed 0..S-1, trips are grouped into patterns by stop sequence,
+    and stop-to-stop transfers within walking distance are precomputed.
+    """
+
+    def __init__(self, stop_lats: np.ndarray, stop_lons: np.ndarray, patterns: List[TransitPattern]):
+        self.stop_lats = stop_lats
+        self.stop_lons = stop_lons
+        self.patterns = patterns
+
+        # Flat (pattern, stop) incidence, finds the patterns serving improved stops
+        self._pattern_of_entry = np.concatenate([np.full(len(p.stops), i) for i, p in enumerate(patterns)]) if patterns else np.zeros(0, np.intp)
+        self._stop_of_entry = np.concatenate([p.stops for p in patterns]) if patterns else np.zeros(0, np.intp)
+
+        self.transfer_from, self.transfer_to, self.transfer_seconds = _pairs_within(
+            stop_lats, stop_lons, stop_lats, stop_lons,
+            TRANSFER_RADIUS_METERS * WALK_DETOUR_FACTOR / WALK_SPEED_METERS_PER_SECOND
+        )
+        # Sorted by target stop, so one reduceat finds the best transfer into every stop
+        keep = np.flatnonzero(self.transfer_from != self.transfer_to)
+        keep = keep[np.argsort(self.transfer_to[keep], kind="stable")]
+        self.transfer_from, self.transfer_to, self.transfer_seconds = (
+            self.transfer_from[keep], self.transfer_to[keep], self.transfer_seconds[keep]
+        )
+        self._transfer_targets, self._transfer_groups = np.unique(self.transfer_to, return_index=True)
+
+    @classmethod
+    def from_gtfs(cls, path: str, service_date: Optional[date] = None) -> "TransitTimetable":
+        """Load the trips running on service_date (default: busiest day of the feed's first two weeks)"""
+        # pandas only for this offline step, the API never loads a feed
+        import pandas as pd
+
+        def read(name: str, **kwargs) -> "pd.DataFrame":
+            if os.path.isdir(path):
+                file_path = os.path.join(path, name)
+                return pd.read_csv(file_path, dtype=str, **kwargs) if os.path.exists(file_path) else pd.DataFrame()
+            with zipfile.ZipFile(path) as archive:
+                if name not in archive.namelist():
+                    return pd.DataFrame()
+                with archive.open(name) as f:
+                    return pd.read_csv(f, dtype=str, **kwargs)
+
+        stops = read("stops.txt", usecols=lambda column: column in {"stop_id", "stop_lat", "stop_lon", "location_type"})
+        if "location_type" in stops:
+            stops = stops[stops["location_type"].fillna("0").isin(["0", ""])]
+        trips = read("trips.txt", usecols=["trip_id", "service_id"])
+        services = _active_services(read("calendar.txt"), read("calendar_dates.txt"), trips, service_date)
+        trips = trips[trips["service_id"].isin(services)]
+
+        stop_times = read("stop_times.txt", usecols=["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"])
+        stop_times = stop_times[stop_times["trip_id"].isin(set(trips["trip_id"])) & stop_times["stop_id"].isin(set(stops["stop_id"]))]
+        stop_times = stop_times.assign(stop_sequence=stop_times["stop_sequence"].astype(int)).sort_values(["trip_id", "stop_sequence"])
+
+        # Stops without a time are not timepoints, they take the previous stop's time
+        for column in ("arrival_time", "departure_time"):
+            stop_times[column] = _parse_gtfs_seconds(stop_times[column])
+        stop_times[["arrival_time", "departure_time"]] = stop_times.groupby("trip_id")[["arrival_time", "departure_time"]].ffill()
+        stop_times["arrival_time"] = stop_times["arrival_time"].fillna(stop_times["departure_time"])
+        stop_times["departure_time"] = stop_times["departure_time"].fillna(stop_times["arrival_time"])
+        stop_times = stop_times.dropna(subset=["arrival_time"])
+
+        stop_index = {stop_id: i for i, stop_id in enumerate(stops["stop_id"])}
+        stop_times["stop"] = stop_times["stop_id"].map(stop_index).astype(np.int64)
+
+        patterns = _build_patterns(stop_times)
+        timetable = cls(
+            stops["stop_lat"].astype(float).to_numpy(), stops["stop_lon"].astype(float).to_numpy(), patterns
+        )
+        logging.info(
+            f"Loaded GTFS feed {path}: {len(stops)} stops, {trips.shape[0]} trips in {len(patterns)} patterns, "
+            f"{len(timetable.transfer_from)} transfers"
+        )
+        return timetable
+
+    def earliest_arrivals(self, access_stops: List[Tuple[np.ndarray, np.ndarray]], departures: np.ndarray) -> np.ndarray:
+        """
+        RAPTOR earliest arrival at every stop for many queries at once, [stops x queries] seconds
+
+        access_stops holds (stop indices, walk seconds) per query. Each round
+        scans the patterns serving stops improved in the previous round, boarding
+        the first catchable trip, then relaxes transfers. Queries are columns, so
+        every pattern scan is a handful of array operations for all of them.
+        """
+        best = np.full((len(self.stop_lats), len(departures)), UNREACHED, dtype=np.float32)
+        for query, (stops, walk) in enumerate(access_stops):
+            np.minimum.at(best[:, query], stops, departures[query] + walk)
+
+        self._walk_transfers(best, np.isfinite(best))
+
+        marked = np.isfinite(best).any(axis=1)
+        for _ in range(MAX_ROUNDS):
+            if not marked.any():
+                break
+            ready = best.copy()  # Labels of the previous round, boarding uses only these
+
+            for pattern_index in np.unique(self._pattern_of_entry[marked[self._stop_of_entry]]):
+                pattern = self.patterns[pattern_index]
+                catchable = pattern.first_catchable(ready[pattern.stops])
+
+                # Ride the earliest trip boarded at any earlier stop of the pattern
+                boarded = np.minimum.accumulate(catchable, axis=0)
+                riding = np.vstack([np.full((1, catchable.shape[1]), len(pattern.departures)), boarded[:-1]])
+                arrivals = pattern.arrivals[riding, np.arange(len(pattern.stops))[:, None]]
+                if pattern.loops:
+                    np.minimum.at(best, pattern.stops, arrivals)
+                else:
+                    best[pattern.stops] = np.minimum(best[pattern.stops], arrivals)
+
+            self._walk_transfers(best, best < ready)
+            marked = (best < ready).any(axis=1)
+
+        return best
+
+    def _walk_transfers(self, best: np.ndarray, improved: np.ndarray):
+        """Walk one transfer from every label improved by the last ride, walks never chain"""
+        if len(self.transfer_from):
+            start = np.where(improved[self.transfer_from], best[self.transfer_from], UNREACHED)
+            walked = np.minimum.reduceat(start + self.transfer_seconds[:, None], self._transfer_groups, axis=0)
+            best[self._transfer_targets] = np.minimum(best[self._transfer_targets], walked)
+
+
+def _parse_gtfs_seconds(times) -> "np.ndarray":
+    """HH:MM:SS to seconds after midnight, hours may exceed 24 for trips past midnight"""
+    import pandas as pd
+
+    # A feed repeats a few thousand distinct times millions of times, parse each once
+    codes, distinct = pd.factorize(times)
+    seconds = np.array([_time_to_seconds(value) for value in distinct] + [np.nan])
+    return seconds[codes]
+
+
+def _time_to_seconds(value: str) -> float:
+    try:
+        hours, minutes, seconds = value.strip().split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return np.nan
+
+
+def _active_services(calendar, calendar_dates, trips, service_date: Optional[date]) -> set:
+    def services_on(day: date) -> set:
+        active = set()
+        if len(calendar):
+            weekday = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"][day.weekday()]
+            day_key = day.strftime("%Y%m%d")
+            running = (calendar[weekday] == "1") & (calendar["start_date"] <= day_key) & (calendar["end_date"] >= day_key)
+            active = set(calendar.loc[running, "service_id"])
+        if len(calendar_dates):
+            exceptions = calendar_dates[calendar_dates["date"] == day.strftime("%Y%m%d")]
+            active |= set(exceptions.loc[exceptions["exception_type"] == "1", "service_id"])
+            active -= set(exceptions.loc[exceptions["exception_type"] == "2", "service_id"])
+        return active
+
+    if service_date is not None:
+        return services_on(service_date)
+
+    starts = list(calendar.get("start_date", [])) + list(calendar_dates.get("date", []))
+    if not starts:
+        return set(trips["service_id"])
+
+    first_day = datetime.strptime(min(starts), "%Y%m%d").date()
+    trips_per_service = trips["service_id"].value_counts()
+    candidates = [first_day + timedelta(days=offset) for offset in range(14)]
+    return max((services_on(day) for day in candidates), key=lambda services: trips_per_service.reindex(list(services)).sum())
+
+
+def _build_patterns(stop_times) -> List[TransitPattern]:
+    # Rows are sorted by trip, so each trip is one contiguous slice
+    trip_codes = stop_times["trip_id"].factorize()[0]
+    starts = np.flatnonzero(np.r_[True, trip_codes[1:] != trip_codes[:-1]])
+    ends = np.r_[starts[1:], len(trip_codes)]
+    stops = stop_times["stop"].to_numpy()
+    all_departures = stop_times["departure_time"].to_numpy(dtype=np.float32)
+    all_arrivals = stop_times["arrival_time"].to_numpy(dtype=np.float32)
+
+    trips_by_sequence: Dict[bytes, List[int]] = {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if end - start >= 2:
+            trips_by_sequence.setdefault(stops[start:end].tobytes(), []).append(start)
+
+    patterns = []
+    for sequence, trip_starts in trips_by_sequence.items():
+        stop_array = np.frombuffer(sequence, dtype=stops.dtype).astype(np.intp)
+        rows = np.array(trip_starts)[:, None] + np.arange(len(stop_array))
+        departures, arrivals = all_departures[rows], all_arrivals[rows]
+        order = np.argsort(departures[:, 0], kind="stable")
+
+        # Split into chains where no trip overtakes the one before it, searchsorted needs sorted columns
+        chains: List[List[int]] = []
+        for trip in order:
+            for chain in chains:
+                if np.all(departures[trip] >= departures[chain[-1]]) and np.all(arrivals[trip] >= arrivals[chain[-1]]):
+                    chain.append(trip)
+                    break
+            else:
+                chains.append([trip])
+
+        for chain in chains:
+            patterns.append(TransitPattern(stop_array, departures[chain], arrivals[chain]))
+    return patterns
+
+
+class TransitTimeTable:
+    """Precomputed door-to-door transit minutes between the neighborhoods of a city, per departure bucket"""
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        lats: np.ndarray,
+        lons: np.ndarray,
+        bucket_names: Sequence[str],
+        minutes: np.ndarray
+    ):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.bucket_names = list(bucket_names)
+        self.minutes = minutes  # [buckets x origins x destinations], uint16
+
+    @classmethod
+    def build(
+        cls,
+        timetable: TransitTimetable,
+        names: Sequence[str],
+        lats: np.ndarray,
+        lons: np.ndarray,
+        buckets: Sequence[Tuple[str, int, int]] = DEFAULT_BUCKETS,
+        sample_minutes: int = 10,
+        origins_per_batch: int = 64
+    ) -> "TransitTimeTable":
+        """Median door-to-door minutes over departures every sample_minutes of each bucket"""
+
+        lats, lons = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+        access_radius_seconds = ACCESS_RADIUS_METERS * WALK_DETOUR_FACTOR / WALK_SPEED_METERS_PER_SECOND
+
+        # Walking legs: neighborhood <-> stop within the access radius, and neighborhood to neighborhood
+        hood, stop, walk = _pairs_within(lats, lons, timetable.stop_lats, timetable.stop_lons, access_radius_seconds)
+        access = [(stop[hood == i], walk[hood == i]) for i in range(len(lats))]
+        direct_walk = walk_seconds_matrix(lats, lons, lats, lons)
+
+        minutes = np.zeros((len(buckets), len(lats), len(lats)), dtype=np.uint16)
+        for bucket_index, (_, start, end) in enumerate(buckets):
+            departures = np.arange(start, end, sample_minutes * 60, dtype=np.float32)
+
+            for first in range(0, len(lats), origins_per_batch):
+                origins = range(first, min(first + origins_per_batch, len(lats)))
+                query_origins = np.repeat(np.array(origins), len(departures))
+                query_departures = np.tile(departures, len(origins))
+
+                arrivals = timetable.earliest_arrivals([access[o] for o in query_origins], query_departures)
+
+                # Egress: best stop arrival plus the walk to each destination, or walking all the way
+                travel = direct_walk[query_origins].copy()
+                for destination in range(len(lats)):
+                    stops, egress = access[destination]
+                    if len(stops):
+                        ride = (arrivals[stops] + egress[:, None]).min(axis=0) - query_departures
+                        travel[:, destination] = np.minimum(travel[:, destination], ride)
+
+                travel_minutes = np.median(travel.reshape(len(origins), len(departures), len(lats)), axis=1) / 60
+                minutes[bucket_index, first:first + len(origins)] = np.clip(np.ceil(travel_minutes), 0, 65535)
+
+        return cls(names, lats, lons, [name for name, _, _ in buckets], minutes)
+
+    @classmethod
+    def load(cls, path: str) -> "TransitTimeTable":
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["lats"], data["lons"], data["bucket_names"].tolist(), data["minutes"])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path, names=np.array(self.names), lats=self.lats, lons=self.lons,
+            bucket_names=np.array(self.bucket_names), minutes=self.minutes
+        )
+
+    def bucket(self, name: str) -> Optional[np.ndarray]:
+        if name not in self.bucket_names:
+            return None
+        return self.minutes[self.bucket_names.index(name)]
+
+
+def transit_table_path(city: str) -> str:
+    return os.path.join(TRANSIT_TABLES_DIR, f"transit_times_{city.lower().replace(' ', '_')}.npz")
+
+
+@lru_cache(maxsize=None)
+def get_transit_time_table(city: str) -> Optional[TransitTimeTable]:
+    """Precomputed table of a city, None without one, loaded once per process"""
+    path = transit_table_path(city)
+    if not os.path.exists(path):
+        return None
+
+    table = TransitTimeTable.load(path)
+    logging.info(f"Loaded transit times for {len(table.names)} neighborhoods of {city} from {path}")
+    return table
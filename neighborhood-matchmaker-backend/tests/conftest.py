@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+# The backend is imported as top-level modules, as when uvicorn runs from this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database creates its engine at import, point it at a throwaway SQLite file before anything imports it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.sqlite')}")
+os.environ.setdefault("OVERPASS_CACHE_DIR", "")
+os.environ.setdefault("POI_STORE_ENABLED", "false")
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    """Session on empty neighborhood, rent, amenity and fetch lease tables"""
+    from database import Base, SessionLocal, engine
+    from models import Amenity, Coordinates, FetchLease, Neighborhood, NeighborhoodRent
+
+    tables = [model.__table__ for model in (Coordinates, Neighborhood, NeighborhoodRent, Amenity, FetchLease)]
+    Base.metadata.drop_all(engine, tables=tables)
+    Base.metadata.create_all(engine, tables=tables)
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_neighborhoods(db):
+    """Create n neighborhoods of a city spread over Montreal, returns them with coordinates loaded"""
+    from models import Coordinates, Neighborhood
+
+    def make(n, city="Montreal", seed=0):
+        import random
+        rng = random.Random(seed)
+        neighborhoods = []
+        for i in range(n):
+            coordinates = Coordinates(lat=45.45 + rng.random() * 0.15, lon=-73.7 + rng.random() * 0.2)
+            db.add(coordinates)
+            db.flush()
+            neighborhood = Neighborhood(name=f"N{i}", city=city, coordinates_id=coordinates.id, avg_price=rng.choice([900, 1500, 2000]))
+            db.add(neighborhood)
+            neighborhoods.append(neighborhood)
+        db.commit()
+        return neighborhoods
+
+    return make
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from models import FetchLease
+from services.amenity_fetch_lease import AmenityFetchLease, amenity_fetch_lease
+
+
+def test_lease_is_exclusive_until_released(db):
+    first, second = AmenityFetchLease(1), AmenityFetchLease(1)
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert AmenityFetchLease(2).try_acquire()  # Leases are per neighborhood
+
+    first.release()
+    assert second.try_acquire()
+    assert db.query(FetchLease).filter(FetchLease.neighborhood_id == 1).one().holder == second.holder
+
+
+def test_expired_lease_is_taken_over(db):
+    crashed, waiter = AmenityFetchLease(1), AmenityFetchLease(1)
+    assert crashed.try_acquire()
+    db.query(FetchLease).update({"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)})
+    db.commit()
+
+    assert waiter.try_acquire()
+
+    # The stale holder must not delete the row its successor now owns
+    crashed.release()
+    db.expire_all()
+    assert db.query(FetchLease).one().holder == waiter.holder
+
+
+def test_waiter_sees_contention_and_gets_the_lease_after_release(db, monkeypatch):
+    monkeypatch.setattr("services.amenity_fetch_lease.LEASE_DIALECTS", {"postgresql", "sqlite"})
+    events = []
+
+    async def fetch():
+        async with amenity_fetch_lease(1, poll_seconds=0.01) as lease:
+            events.append((lease.held, lease.contended))
+            await asyncio.sleep(0.1)
+
+    async def both():
+        await asyncio.gather(fetch(), fetch())
+
+    asyncio.run(both())
+
+    # Whichever took it first held it alone, the other waited for the release
+    assert events == [(True, False), (True, True)]
+    assert db.query(FetchLease).count() == 0
@@ -0,0 +1,115 @@
+import asyncio
+from collections import OrderedDict
+import numpy as np
+import pytest
+from enums.amenity_type import AmenityTypeEnum
+from services.amenity_service import AmenityService
+from services.amenity_taxonomy import AMENITY_INDEX
+from services.local_poi_index import LocalPOIIndex
+from services.poi_tile_service import POITileService, count_points_within_radii
+
+RADII = [250, 500, 1000, 2000]
+CENTER = (45.5, -73.6)
+METERS_PER_DEGREE_LAT = 6371000 * np.pi / 180
+
+
+def random_points(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = CENTER[0] + rng.uniform(-0.04, 0.04, n)
+    lons = CENTER[1] + rng.uniform(-0.05, 0.05, n)
+    types = rng.integers(0, len(AMENITY_INDEX), n).astype(np.int8)
+    return lats, lons, types
+
+
+def test_counts_points_at_known_distances():
+    # Due north of the center at 100, 400, 900, 1500 and 2500 m
+    distances = np.array([100, 400, 900, 1500, 2500])
+    lats = CENTER[0] + distances / METERS_PER_DEGREE_LAT
+    lons = np.full(len(distances), CENTER[1])
+    types = np.full(len(distances), AMENITY_INDEX["cafe"], dtype=np.int8)
+
+    counts = count_points_within_radii(lats, lons, types, *CENTER, [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK], RADII)
+
+    assert {radius: counts[radius]["cafe"] for radius in RADII} == {250: 1, 500: 2, 1000: 3, 2000: 4}
+    assert all(counts[radius]["park"] == 0 for radius in RADII)
+
+
+def test_one_pass_matches_separate_radii_and_grows_with_radius():
+    lats, lons, types = random_points()
+    amenities = list(AmenityTypeEnum)
+
+    together = count_points_within_radii(lats, lons, types, *CENTER, amenities, RADII)
+
+    for radius in RADII:
+        assert together[radius] == count_points_within_radii(lats, lons, types, *CENTER, amenities, [radius])[radius]
+    for smaller, larger in zip(RADII, RADII[1:]):
+        assert all(together[smaller][amenity.value] <= together[larger][amenity.value] for amenity in amenities)
+    assert together[2000]["cafe"] > together[250]["cafe"]
+
+
+@pytest.mark.parametrize("center", [CENTER, (45.515, -73.57), (45.47, -73.64)])
+def test_local_index_grid_matches_a_full_scan(center):
+    lats, lons, types = random_points()
+    index = LocalPOIIndex(lats, lons, types)
+    amenities = list(AmenityTypeEnum)
+
+    assert index.count_within_radii(*center, amenities, RADII) == count_points_within_radii(
+        lats, lons, types, *center, amenities, RADII
+    )
+
+
+class FakeOverpass:
+    """Serves the random points inside each requested bbox, counting requests"""
+
+    def __init__(self, lats, lons, types):
+        self.points = [
+            (osm_id, float(lat), float(lon), list(AmenityTypeEnum)[amenity].value)
+            for osm_id, (lat, lon, amenity) in enumerate(zip(lats, lons, types))
+        ]
+        self.requests = 0
+
+    async def get_classified_elements(self, south, west, north, east, amenity_types):
+        self.requests += 1
+        return [point for point in self.points if south <= point[1] <= north and west <= point[2] <= east]
+
+
+@pytest.fixture
+def tile_service(monkeypatch):
+    monkeypatch.setattr(POITileService, "_tiles", OrderedDict())
+    monkeypatch.setattr(POITileService, "_inflight", {})
+    monkeypatch.setattr(POITileService, "store", None)
+    lats, lons, types = random_points()
+    return POITileService(FakeOverpass(lats, lons, types)), (lats, lons, types)
+
+
+def test_tile_counts_at_every_radius_come_from_one_fetch(tile_service):
+    service, (lats, lons, types) = tile_service
+    amenities = list(AmenityTypeEnum)
+
+    counts = asyncio.run(service.get_amenity_counts_by_radius(*CENTER, amenities, RADII))
+    requests = service.overpass_service.requests
+
+    assert counts == count_points_within_radii(lats, lons, types, *CENTER, amenities, RADII)
+    assert requests == len(service._covering_tiles(*CENTER, max(RADII)))
+
+    # Any radius inside the fetched one is answered from the cached tiles
+    for radius in RADII:
+        assert asyncio.run(service.get_amenity_counts(*CENTER, amenities, radius)) == counts[radius]
+    assert service.overpass_service.requests == requests
+
+
+def test_fetch_stores_every_radius(db, make_neighborhoods):
+    neighborhood = make_neighborhoods(1)[0]
+    lats, lons, types = random_points()
+    service = AmenityService(db, amenity_counter=LocalPOIIndex(lats, lons, types))
+    cafe = [AmenityTypeEnum.CAFE]
+
+    counts_1000 = asyncio.run(service.get_amenity_counts(neighborhood, cafe, radius_meters=1000))
+    expected = LocalPOIIndex(lats, lons, types).count_within_radii(
+        neighborhood.coordinates.lat, neighborhood.coordinates.lon, cafe, RADII
+    )
+
+    assert counts_1000 == expected[1000]
+    for radius in RADII:
+        stored = service.get_stored_amenity_counts([neighborhood.id], cafe, radius)
+        assert stored[neighborhood.id][AmenityTypeEnum.CAFE] == expected[radius]["cafe"]
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from enums.amenity_type import AmenityTypeEnum
+from models import Amenity
+from services.amenity_refresh_worker import AmenityRefreshWorker
+from services.amenity_service import AmenityService
+from services.overpass_api_service import OverpassAPIService
+
+
+class FakeTileCounter:
+    """Every count needs `tiles` uncached tiles and issues one scheduler request per tile"""
+
+    def __init__(self, tiles=4, delay=0.0):
+        self.tiles = tiles
+        self.delay = delay
+        self.fetches = 0
+
+    def uncached_tile_count(self, lat, lon, radius_meters):
+        return self.tiles
+
+    async def get_amenity_counts_by_radius(self, lat, lon, amenity_types, radii_meters):
+        self.fetches += 1
+        await asyncio.sleep(self.delay)
+        OverpassAPIService.scheduler.requests += self.tiles
+        return {radius: {amenity.value: 1 for amenity in amenity_types} for radius in radii_meters}
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    counter = FakeTileCounter()
+    monkeypatch.setattr("services.amenity_service.POITileService", lambda overpass_service: counter)
+    return counter
+
+
+def test_refresh_reserves_a_request_per_uncached_tile(db, make_neighborhoods, counter):
+    make_neighborhoods(3)
+    worker = AmenityRefreshWorker(OverpassAPIService(), max_requests_per_hour=10, idle_poll_seconds=0.01)
+
+    async def refresh():
+        # The third refresh needs 4 more requests than the hour has left, it waits
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(worker.refresh_once(), timeout=0.5)
+
+    asyncio.run(refresh())
+
+    assert worker.refreshed == 2
+    assert counter.fetches == 2
+    assert worker.stats()["requests_last_hour"] == 8
+
+
+def test_refresh_charges_requests_beyond_the_reservation(db, make_neighborhoods, counter):
+    make_neighborhoods(2)
+    worker = AmenityRefreshWorker(OverpassAPIService(), max_requests_per_hour=100, idle_poll_seconds=0.01)
+    counter.uncached_tile_count = lambda lat, lon, radius_meters: 1  # Under-estimated, e.g. retries
+
+    assert asyncio.run(worker.refresh_once()) == 2
+    assert worker.stats()["requests_last_hour"] == 2 * counter.tiles
+
+
+def test_refresh_joins_a_search_fetching_the_same_rows(db, make_neighborhoods, counter):
+    neighborhood = make_neighborhoods(1)[0]
+    counter.delay = 0.1
+    worker = AmenityRefreshWorker(OverpassAPIService(), max_requests_per_hour=100, idle_poll_seconds=0.01)
+    search_service = AmenityService(db)
+
+    async def search_and_refresh():
+        search = asyncio.ensure_future(search_service._fetch_missing_counts(neighborhood, list(AmenityTypeEnum)))
+        await asyncio.sleep(0)
+        await worker.refresh_once()
+        await search
+
+    asyncio.run(search_and_refresh())
+
+    assert counter.fetches == 1
+    assert db.query(Amenity).count() == len(AmenityTypeEnum) * len(AmenityService.RADII_METERS)
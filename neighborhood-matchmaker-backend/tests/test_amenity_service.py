@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from sqlalchemy.dialects import postgresql
+from enums.amenity_type import AmenityTypeEnum
+from models import Amenity
+from services.amenity_service import AmenityService
+
+
+def rows_for(neighborhoods, count, radius=1000, types=(AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK)):
+    return [
+        {"neighborhood_id": neighborhood.id, "radius_meters": radius, "type": amenity, "count": count}
+        for neighborhood in neighborhoods for amenity in types
+    ]
+
+
+def stored(db):
+    return {(row.neighborhood_id, row.radius_meters, row.type): row.count for row in db.query(Amenity)}
+
+
+@pytest.fixture(params=["native", "fallback"])
+def amenity_service(request, db, monkeypatch):
+    """AmenityService using the dialect's ON CONFLICT upsert, or the portable SELECT + update/insert path"""
+    if request.param == "fallback":
+        monkeypatch.setattr(AmenityService, "UPSERT_INSERTS", {})
+    return AmenityService(db)
+
+
+def test_upsert_inserts_then_updates_in_place(db, make_neighborhoods, amenity_service):
+    neighborhoods = make_neighborhoods(3)
+
+    amenity_service.store_amenity_counts(rows_for(neighborhoods, 2))
+    first_ids = {row.id for row in db.query(Amenity)}
+    amenity_service.store_amenity_counts(rows_for(neighborhoods[:2], 5) + rows_for(neighborhoods[:1], 7, radius=500))
+    db.expire_all()
+
+    counts = stored(db)
+    assert len(counts) == 3 * 2 + 2
+    assert counts[(neighborhoods[0].id, 1000, AmenityTypeEnum.CAFE)] == 5
+    assert counts[(neighborhoods[2].id, 1000, AmenityTypeEnum.PARK)] == 2
+    assert counts[(neighborhoods[0].id, 500, AmenityTypeEnum.PARK)] == 7
+    assert first_ids <= {row.id for row in db.query(Amenity)}  # Updated, not deleted and reinserted
+    assert all(row.fetched_at is not None for row in db.query(Amenity))
+
+
+def test_duplicate_keys_in_one_call_last_wins(db, make_neighborhoods, amenity_service):
+    neighborhoods = make_neighborhoods(1)
+
+    amenity_service.store_amenity_counts(rows_for(neighborhoods, 1) + rows_for(neighborhoods, 4))
+
+    assert set(stored(db).values()) == {4}
+
+
+def test_stored_counts_filter_by_radius_and_type(db, make_neighborhoods):
+    neighborhoods = make_neighborhoods(2)
+    service = AmenityService(db)
+    service.store_amenity_counts(rows_for(neighborhoods, 3) + rows_for(neighborhoods, 9, radius=2000))
+
+    counts = service.get_stored_amenity_counts([neighborhoods[0].id], [AmenityTypeEnum.CAFE, AmenityTypeEnum.GYM], 2000)
+
+    assert counts == {neighborhoods[0].id: {AmenityTypeEnum.CAFE: 9}}
+    assert service.get_stored_amenity_counts([], [AmenityTypeEnum.CAFE]) == {}
+
+
+def test_postgres_upsert_targets_the_unique_index(db):
+    rows = [{"neighborhood_id": 1, "radius_meters": 1000, "type": AmenityTypeEnum.CAFE, "count": 1, "fetched_at": None}]
+    statement = AmenityService(db)._upsert_statement(AmenityService.UPSERT_INSERTS["postgresql"], rows)
+
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+
+    assert "ON CONFLICT (neighborhood_id, radius_meters, type) DO UPDATE" in sql
+    assert "count = excluded.count" in sql
+
+
+class SlowCounter:
+    async def get_amenity_counts_by_radius(self, lat, lon, amenity_types, radii_meters):
+        await asyncio.sleep(0.05)
+        return {radius: {amenity.value: 3 for amenity in amenity_types} for radius in radii_meters}
+
+
+def test_shared_fetch_outlives_the_search_that_started_it(db, make_neighborhoods, monkeypatch):
+    from database import SessionLocal
+
+    # Under the lease the shared fetch stores the rows itself
+    monkeypatch.setattr("services.amenity_fetch_lease.LEASE_DIALECTS", {"postgresql", "sqlite"})
+    neighborhood = make_neighborhoods(1)[0]
+    counter = SlowCounter()
+    starter_db = SessionLocal()
+    starter = AmenityService(starter_db, amenity_counter=counter)
+    joiner = AmenityService(db, amenity_counter=counter)
+
+    async def run():
+        first = asyncio.ensure_future(starter._fetch_missing_counts(neighborhood, [AmenityTypeEnum.CAFE]))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(joiner._fetch_missing_counts(neighborhood, [AmenityTypeEnum.CAFE]))
+        await asyncio.sleep(0.01)
+
+        # The client of the first search went away, its session is closed mid-fetch
+        first.cancel()
+        starter_db.close()
+        return await second
+
+    counts_by_radius, written, _ = asyncio.run(run())
+
+    assert written  # Stored under the lease through the fetch's own session
+    assert counts_by_radius[1000] == {"cafe": 3}
+    counts = stored(db)
+    assert len(counts) == len(AmenityService.RADII_METERS)
+    assert set(counts.values()) == {3}
@@ -0,0 +1,97 @@
+import re
+import pytest
+from enums.amenity_type import AmenityTypeEnum
+from services.amenity_taxonomy import (
+    AMENITY_INDEX, AMENITY_TAXONOMY, AMENITY_WEIGHTS, ESSENTIAL_AMENITIES, QUERY_TAGS, TAG_TYPES,
+    classify_tags, overpass_filters
+)
+from services.overpass_api_service import OverpassAPIService
+
+
+def test_every_registered_tag_classifies_to_its_type():
+    for amenity, definition in AMENITY_TAXONOMY.items():
+        for key, values in definition["tags"].items():
+            for value in values:
+                assert classify_tags({key: value, "name": "x"}) == amenity
+
+
+@pytest.mark.parametrize("tags, expected", [
+    ({"shop": "bakery", "amenity": "restaurant"}, AmenityTypeEnum.CAFE),  # shop outranks amenity
+    ({"amenity": "gym", "leisure": "park"}, AmenityTypeEnum.GYM),  # amenity outranks leisure
+    ({"shop": "clothes", "amenity": "library"}, AmenityTypeEnum.LIBRARY),  # unregistered values are skipped
+    ({"public_transport": "platform", "railway": "station"}, AmenityTypeEnum.TRANSIT),
+    ({"amenity": "parking"}, None),
+    ({}, None),
+])
+def test_classification_follows_key_precedence(tags, expected):
+    assert classify_tags(tags) == expected
+
+
+@pytest.mark.parametrize("tags", [
+    {"public_transport": "platform"},
+    {"public_transport": "stop_position"},
+    {"public_transport": "stop_area"},
+    {"railway": "platform"},
+    {"railway": "rail"},
+    {"railway": "halt"},
+])
+def test_transit_counts_only_stations(tags):
+    # Deliberately narrower than the old "any public_transport or railway tag" query
+    assert classify_tags(tags) is None
+    assert classify_tags({**tags, "public_transport": "station"}) == AmenityTypeEnum.TRANSIT
+    assert overpass_filters([AmenityTypeEnum.TRANSIT]) == [
+        '["public_transport"~"^(station)$"]', '["railway"~"^(station)$"]'
+    ]
+
+
+def test_compiled_tables_cover_the_taxonomy():
+    registered = {
+        (key, value) for definition in AMENITY_TAXONOMY.values()
+        for key, values in definition["tags"].items() for value in values
+    }
+
+    assert set(QUERY_TAGS) == registered
+    assert len(QUERY_TAGS) == len(registered)  # No tag is mapped twice
+    assert {(key, value) for key, values in TAG_TYPES.items() for value in values} == registered
+    assert set(AMENITY_INDEX) == {amenity.value for amenity in AmenityTypeEnum}
+    assert [AMENITY_WEIGHTS[AMENITY_INDEX[amenity.value]] for amenity in AmenityTypeEnum] == [
+        AMENITY_TAXONOMY[amenity]["weight"] for amenity in AmenityTypeEnum
+    ]
+    assert ESSENTIAL_AMENITIES == {AmenityTypeEnum.GROCERY, AmenityTypeEnum.TRANSIT, AmenityTypeEnum.HOSPITAL}
+
+
+def test_filters_are_one_sorted_regex_union_per_key():
+    filters = overpass_filters([AmenityTypeEnum.CAFE, AmenityTypeEnum.RESTAURANT, AmenityTypeEnum.GROCERY])
+
+    assert filters == [
+        '["shop"~"^(bakery|convenience|grocery|supermarket)$"]',
+        '["amenity"~"^(bar|cafe|fast_food|restaurant)$"]',
+    ]
+
+
+@pytest.mark.parametrize("amenity", list(AmenityTypeEnum))
+def test_filters_match_exactly_the_tags_of_the_requested_type(amenity):
+    patterns = {}
+    for tag_filter in overpass_filters([amenity]):
+        key, pattern = re.fullmatch(r'\["(\w+)"~"(.+)"\]', tag_filter).groups()
+        patterns[key] = re.compile(pattern)
+
+    for key, value in QUERY_TAGS:
+        matched = key in patterns and patterns[key].match(value) is not None
+        assert matched == (TAG_TYPES[key][value] == amenity)
+    assert not any(pattern.match(value + "s") for pattern in patterns.values() for _, value in QUERY_TAGS)
+
+
+def test_parsed_response_counts_by_taxonomy():
+    data = {"elements": [
+        {"type": "node", "id": 1, "lat": 45.5, "lon": -73.6, "tags": {"amenity": "bar"}},
+        {"type": "way", "id": 1, "center": {"lat": 45.6, "lon": -73.5}, "tags": {"shop": "bakery", "amenity": "school"}},
+        {"type": "node", "id": 2, "lat": 45.5, "lon": -73.6, "tags": {"leisure": "playground"}},
+        {"type": "node", "id": 3, "lat": 45.5, "lon": -73.6, "tags": {"amenity": "parking"}},
+    ]}
+    amenities = [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK, AmenityTypeEnum.SCHOOL]
+
+    assert OverpassAPIService._parse_amenity_response(data, amenities) == {"cafe": 2, "park": 1, "school": 0}
+    assert OverpassAPIService._parse_classified_elements(data, amenities) == [
+        (1, 45.5, -73.6, "cafe"), (-1, 45.6, -73.5, "cafe"), (2, 45.5, -73.6, "park")
+    ]
@@ -0,0 +1,94 @@
+from statistics import mean
+import pytest
+from sqlalchemy import func, select
+from database import Base, engine
+from enums.rent_type import RentTypeEnum
+from models import Coordinates, Neighborhood, NeighborhoodRent, SeedRun
+from scripts.bulk_seed import content_hash, seed_city
+
+COORDINATES = [("Plateau", 45.52, -73.58), ("Verdun", 45.46, -73.57), ("Rosemont", 45.55, -73.58)]
+RENTS = [
+    ("Plateau", "studio", 1100), ("Plateau", "One Bed", 1450), ("Plateau", "Two Bed", 1900),
+    ("Verdun", "studio", 950), ("Verdun", "Two Bed", 1600),
+]
+
+
+def write_csv(path, header, rows):
+    path.write_text("\n".join([header] + [",".join(str(value) for value in row) for row in rows]) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def seed_files(db, tmp_path):
+    """Seed CSVs of a small city, on top of empty tables including seed_runs"""
+    SeedRun.__table__.drop(engine, checkfirst=True)
+    Base.metadata.create_all(engine, tables=[SeedRun.__table__])
+    coordinates_csv = write_csv(tmp_path / "coordinates.csv", "neighborhood,latitude,longitude", COORDINATES)
+    rents_csv = write_csv(tmp_path / "rents.csv", "neighborhood,type,avg_price", RENTS)
+    return coordinates_csv, rents_csv
+
+
+def snapshot(db):
+    db.expire_all()
+    return (
+        db.execute(select(Neighborhood.id, Neighborhood.name, Neighborhood.avg_price, Neighborhood.coordinates_id).order_by(Neighborhood.id)).all(),
+        db.execute(select(NeighborhoodRent.neighborhood_id, NeighborhoodRent.type, NeighborhoodRent.avg_price).order_by(NeighborhoodRent.id)).all(),
+        db.scalar(select(func.count()).select_from(Coordinates)),
+    )
+
+
+def test_seed_inserts_neighborhoods_with_the_mean_rent(db, seed_files):
+    assert seed_city("Testville", *seed_files)
+
+    neighborhoods = {
+        neighborhood.name: neighborhood
+        for neighborhood in db.scalars(select(Neighborhood).where(Neighborhood.city == "Testville"))
+    }
+    assert sorted(neighborhoods) == sorted(name for name, _, _ in COORDINATES)
+    # RETURNING ids follow the input rows, every neighborhood got its own coordinates
+    for name, lat, lon in COORDINATES:
+        assert (neighborhoods[name].coordinates.lat, neighborhoods[name].coordinates.lon) == (lat, lon)
+
+    for name in neighborhoods:
+        prices = [price for rent_name, _, price in RENTS if rent_name == name]
+        assert neighborhoods[name].avg_price == (round(mean(prices)) if prices else None)
+        rents = db.execute(
+            select(NeighborhoodRent.type, NeighborhoodRent.avg_price).where(NeighborhoodRent.neighborhood_id == neighborhoods[name].id)
+        ).all()
+        assert sorted((rent_type.value, price) for rent_type, price in rents) == sorted(
+            (rent_type, price) for rent_name, rent_type, price in RENTS if rent_name == name
+        )
+
+
+def test_seeding_the_same_files_twice_is_a_no_op(db, seed_files):
+    assert seed_city("Testville", *seed_files)
+    seeded = snapshot(db)
+    seed_run = db.get(SeedRun, "Testville")
+    assert seed_run.content_hash == content_hash("Testville", *seed_files)
+
+    assert not seed_city("Testville", *seed_files)
+    assert snapshot(db) == seeded
+    db.expire_all()
+    assert db.get(SeedRun, "Testville").seeded_at == seed_run.seeded_at
+
+
+def test_changed_files_reseed_in_place(db, seed_files, tmp_path):
+    coordinates_csv, rents_csv = seed_files
+    seed_city("Testville", coordinates_csv, rents_csv)
+    ids = {name: neighborhood_id for neighborhood_id, name, _, _ in snapshot(db)[0]}
+
+    write_csv(tmp_path / "coordinates.csv", "neighborhood,latitude,longitude", COORDINATES + [("Outremont", 45.52, -73.61)])
+    write_csv(tmp_path / "rents.csv", "neighborhood,type,avg_price", [("Verdun", "studio", 1000), ("Outremont", "One Bed", 1800)])
+    assert seed_city("Testville", coordinates_csv, rents_csv)
+
+    neighborhoods, rents, coordinates = snapshot(db)
+    by_name = {name: (neighborhood_id, avg_price) for neighborhood_id, name, avg_price, _ in neighborhoods}
+    # Existing neighborhoods keep their ids, rents are replaced and averages recomputed
+    assert {name: by_name[name][0] for name in ids} == ids
+    assert {name: avg_price for name, (_, avg_price) in by_name.items()} == {
+        "Plateau": None, "Verdun": 1000, "Rosemont": None, "Outremont": 1800
+    }
+    assert sorted((rent_type.value, price) for _, rent_type, price in rents) == [
+        (RentTypeEnum.ONE_BED.value, 1800), (RentTypeEnum.STUDIO.value, 1000)
+    ]
+    assert coordinates == 4
@@ -0,0 +1,52 @@
+import pytest
+from services.commute_service import CommuteService, invalidate_commute_matrices
+
+
+@pytest.fixture
+def commute(db):
+    invalidate_commute_matrices()
+    yield CommuteService(db)
+    invalidate_commute_matrices()
+
+
+def test_matrix_matches_scalar_commute_times_for_every_pair(commute, make_neighborhoods):
+    neighborhoods = make_neighborhoods(25)
+
+    matrix = commute.get_commute_matrix("Montreal", neighborhoods)
+
+    for origin in neighborhoods:
+        for destination in neighborhoods:
+            expected = commute.calculate_commute_time(origin.coordinates.lat, origin.coordinates.lon, destination.name)
+            assert matrix.commute_time(origin.id, destination.id) == expected
+
+
+def test_unchanged_city_reuses_the_matrix(commute, make_neighborhoods):
+    neighborhoods = make_neighborhoods(10)
+
+    assert commute.get_commute_matrix("Montreal", neighborhoods[:3]) is commute.get_commute_matrix("Montreal", neighborhoods[:5])
+
+
+def test_moving_a_neighborhood_outside_the_search_rebuilds_the_matrix(db, commute, make_neighborhoods):
+    neighborhoods = make_neighborhoods(10)
+    subset, moved = neighborhoods[:5], neighborhoods[9]
+    stale = commute.get_commute_matrix("Montreal", subset)
+
+    moved.coordinates.lat += 0.05
+    db.commit()
+    matrix = commute.get_commute_matrix("Montreal", subset)
+
+    assert matrix is not stale
+    expected = commute.calculate_commute_time(subset[0].coordinates.lat, subset[0].coordinates.lon, moved.name)
+    assert matrix.commute_time(subset[0].id, moved.id) == expected
+
+
+def test_renamed_destination_is_found_under_its_new_name(db, commute, make_neighborhoods):
+    neighborhoods = make_neighborhoods(10)
+    subset, destination = neighborhoods[:5], neighborhoods[9]
+    before = commute.get_commute_times("Montreal", subset, destination.name)
+
+    destination.name = "Renamed"
+    db.commit()
+
+    assert commute.get_commute_times("Montreal", subset, "Renamed") == before
+    assert commute.get_commute_times("Montreal", subset, "N9") == {neighborhood.id: None for neighborhood in subset}
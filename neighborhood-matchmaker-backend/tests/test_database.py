@@ -0,0 +1,19 @@
+import logging
+from sqlalchemy import inspect
+import database
+
+
+def test_migrate_schema_creates_the_tables_sqlite_supports(monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    monkeypatch.setattr(database, "get_schema_version", lambda: None)  # Run even if another test migrated
+
+    database.migrate_schema()
+    database.migrate_schema()  # Idempotent, create_all and the upgrades skip what exists
+
+    tables = set(inspect(database.engine).get_table_names())
+    assert {"neighborhoods", "amenities", "amenity_fetch_leases", "app_metadata", "seed_runs"} <= tables
+    assert "user_preferences" not in tables  # ARRAY column, Postgres only
+    assert any(record.levelno == logging.WARNING and "user_preferences" in record.getMessage() for record in caplog.records)
+    assert f"Schema migrated to version {database.SCHEMA_VERSION}" in caplog.text
+    monkeypatch.undo()
+    assert database.get_schema_version() == database.SCHEMA_VERSION
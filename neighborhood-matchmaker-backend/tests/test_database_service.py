@@ -0,0 +1,52 @@
+from enums.rent_type import RentTypeEnum
+from models import NeighborhoodRent
+from services.database_service import DatabaseService
+
+
+def names(neighborhoods):
+    return sorted(neighborhood.name for neighborhood in neighborhoods)
+
+
+def test_budget_filters_on_the_average_price_without_rent_types(db, make_neighborhoods):
+    neighborhoods = make_neighborhoods(4)
+    for neighborhood, avg_price in zip(neighborhoods, [900, 1500, 2000, None]):
+        neighborhood.avg_price = avg_price
+    db.commit()
+
+    found = DatabaseService(db).get_neighborhoods_with_coordinates("Montreal", budget=1500)
+
+    # N3 has no rent data, it is kept rather than silently dropped
+    assert names(found) == ["N0", "N1", "N3"]
+    assert all(neighborhood.coordinates is not None for neighborhood in found)
+
+
+def test_budget_needs_one_affordable_requested_rent_type(db, make_neighborhoods):
+    neighborhoods = make_neighborhoods(4)
+    rents = {
+        0: [(RentTypeEnum.STUDIO, 800), (RentTypeEnum.ONE_BED, 1600)],
+        1: [(RentTypeEnum.STUDIO, 1400), (RentTypeEnum.ONE_BED, 1200)],
+        2: [(RentTypeEnum.STUDIO, 2000), (RentTypeEnum.TWO_BED, 900)],
+    }
+    for i, prices in rents.items():
+        db.add_all(
+            NeighborhoodRent(neighborhood_id=neighborhoods[i].id, type=rent_type, avg_price=avg_price)
+            for rent_type, avg_price in prices
+        )
+    # The average price is ignored once rent types are requested
+    neighborhoods[2].avg_price = 100
+    db.commit()
+    service = DatabaseService(db)
+
+    assert names(service.get_neighborhoods_with_coordinates("Montreal", budget=1000, rent_types=[RentTypeEnum.STUDIO])) == ["N0"]
+    assert names(service.get_neighborhoods_with_coordinates(
+        "Montreal", budget=1300, rent_types=[RentTypeEnum.STUDIO, RentTypeEnum.ONE_BED]
+    )) == ["N0", "N1"]
+    # Without a rent of the requested types a neighborhood never matches
+    assert names(service.get_neighborhoods_with_coordinates("Montreal", budget=5000, rent_types=[RentTypeEnum.TWO_BED])) == ["N2"]
+
+
+def test_no_budget_returns_the_whole_city(db, make_neighborhoods):
+    make_neighborhoods(3)
+    make_neighborhoods(2, city="Quebec")
+
+    assert names(DatabaseService(db).get_neighborhoods_with_coordinates("Montreal")) == ["N0", "N1", "N2"]
@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from http_client import ConnectionStats, create_http_session, get_http_session
+
+
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get("/", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+async def ok(request):
+    return web.json_response({"elements": []})
+
+
+def test_sequential_requests_reuse_one_connection():
+    async def two_requests():
+        server = await serve(ok)
+        stats = ConnectionStats()
+        session = create_http_session(stats)
+        try:
+            for _ in range(2):
+                async with session.get(server.make_url("/")) as response:
+                    assert await response.json() == {"elements": []}
+        finally:
+            await session.close()
+            await server.close()
+        return stats.as_dict()
+
+    stats = asyncio.run(two_requests())
+
+    assert stats["requests"] == 2
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 1
+    assert stats["reuse_ratio"] == 0.5
+
+
+def test_lifespan_opens_and_closes_the_shared_session(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "init_db", lambda: None)
+
+    async def run_lifespan():
+        async with main.lifespan(main.app):
+            session = get_http_session(SimpleNamespace(app=main.app))
+            assert session is main.app.state.http_session
+            assert not session.closed
+        return session
+
+    assert asyncio.run(run_lifespan()).closed
@@ -0,0 +1,132 @@
+import json
+import sys
+import threading
+import numpy as np
+import pytest
+from scripts import ingest_osm_extract
+from scripts.ingest_osm_extract import ingest_osm_extract as ingest, iter_geojson_points, iter_pbf_points
+from services.amenity_taxonomy import AMENITY_INDEX
+from services.local_poi_index import LocalPOIIndex
+
+FEATURES = [
+    {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-73.60, 45.50]}, "properties": {"amenity": "cafe"}},
+    {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-73.61, 45.51]}, "properties": {"shop": "supermarket"}},
+    {
+        "type": "Feature",
+        "geometry": {"type": "Polygon", "coordinates": [[[-73.62, 45.52], [-73.60, 45.52], [-73.60, 45.53], [-73.62, 45.52]]]},
+        "properties": {"leisure": "park"}
+    },
+    {"type": "Feature", "geometry": {"type": "Point", "coordinates": [-73.63, 45.54]}, "properties": {"amenity": "parking"}},
+    {"type": "Feature", "geometry": None, "properties": {"amenity": "cafe"}},
+]
+EXPECTED = [(45.50, -73.60, "cafe"), (45.51, -73.61, "grocery"), (45.525, -73.61, "park")]
+
+
+@pytest.fixture
+def collection(tmp_path):
+    path = tmp_path / "city.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": FEATURES}, indent=2))
+    return str(path)
+
+
+@pytest.fixture
+def sequence(tmp_path):
+    path = tmp_path / "city.geojsons"
+    path.write_text("".join(f"\x1e{json.dumps(feature)}\n" for feature in FEATURES))
+    return str(path)
+
+
+def indexed(path):
+    index = LocalPOIIndex.load(path)
+    return [
+        (pytest.approx(lat), pytest.approx(lon), type_index)
+        for lat, lon, type_index in zip(index.lats, index.lons, index.types)
+    ]
+
+
+def expected_points():
+    return [(lat, lon, AMENITY_INDEX[amenity_type]) for lat, lon, amenity_type in EXPECTED]
+
+
+@pytest.mark.parametrize("source", ["collection", "sequence"])
+def test_geojson_ingestion_keeps_classified_points(request, tmp_path, source):
+    output = str(tmp_path / "index.npz")
+
+    assert ingest(request.getfixturevalue(source), output) == len(EXPECTED)
+    assert sorted(indexed(output), key=lambda point: point[2]) == sorted(expected_points(), key=lambda point: point[2])
+
+
+def test_feature_collections_are_streamed_with_ijson(collection, monkeypatch):
+    pytest.importorskip("ijson")
+    monkeypatch.setattr(json, "load", lambda f: pytest.fail("FeatureCollection was loaded whole"))
+
+    assert [tags for _, _, tags in iter_geojson_points(collection)] == [feature["properties"] for feature in FEATURES[:4]]
+
+
+def test_feature_collections_load_whole_without_ijson(collection, monkeypatch):
+    monkeypatch.setitem(sys.modules, "ijson", None)
+
+    assert [tags for _, _, tags in iter_geojson_points(collection)] == [feature["properties"] for feature in FEATURES[:4]]
+
+
+@pytest.fixture
+def extract(tmp_path):
+    osmium = pytest.importorskip("osmium")
+    from osmium.osm.mutable import Node, Way
+
+    path = str(tmp_path / "city.osm.pbf")
+    writer = osmium.SimpleWriter(path)
+    nodes = [(1, 45.50, -73.60, {"amenity": "cafe"}), (2, 45.51, -73.61, {"shop": "supermarket"})]
+    nodes += [(100 + i, 45.60 + i * 0.001, -73.50, {"amenity": "cafe"}) for i in range(20)]
+    # Untagged outline of a park, placed at its bbox center
+    nodes += [(201, 45.52, -73.62, {}), (202, 45.52, -73.60, {}), (203, 45.53, -73.60, {})]
+    for node_id, lat, lon, tags in nodes:
+        writer.add_node(Node(id=node_id, location=(lon, lat), tags=tags))
+    writer.add_way(Way(id=1, nodes=[201, 202, 203, 201], tags={"leisure": "park"}))
+    writer.close()
+    return path
+
+
+def reader_threads():
+    return [thread for thread in threading.enumerate() if thread.name == "osm-pbf-reader"]
+
+
+def test_pbf_points_pass_through_the_bounded_buffer(extract, monkeypatch):
+    # Small chunks and a one-chunk buffer make the reader block on the consumer
+    monkeypatch.setattr(ingest_osm_extract, "PBF_CHUNK_POINTS", 2)
+    monkeypatch.setattr(ingest_osm_extract, "PBF_BUFFERED_CHUNKS", 1)
+
+    points = list(iter_pbf_points(extract))
+
+    assert len(points) == 23
+    assert (pytest.approx(45.525), pytest.approx(-73.61), {"leisure": "park"}) in points
+    assert not reader_threads()
+
+
+def test_closing_the_pbf_stream_stops_the_reader(extract, monkeypatch):
+    monkeypatch.setattr(ingest_osm_extract, "PBF_CHUNK_POINTS", 2)
+    monkeypatch.setattr(ingest_osm_extract, "PBF_BUFFERED_CHUNKS", 1)
+
+    points = iter_pbf_points(extract)
+    next(points)
+    points.close()
+
+    assert not reader_threads()
+
+
+def test_pbf_reader_errors_reach_the_consumer(tmp_path):
+    pytest.importorskip("osmium")
+    broken = tmp_path / "broken.osm.pbf"
+    broken.write_bytes(b"not a pbf file")
+
+    with pytest.raises(RuntimeError, match="PBF"):
+        list(iter_pbf_points(str(broken)))
+    assert not reader_threads()
+
+
+def test_pbf_ingestion_builds_the_index(extract, tmp_path):
+    output = str(tmp_path / "index.npz")
+
+    assert ingest(extract, output) == 23
+    index = LocalPOIIndex.load(output)
+    assert np.count_nonzero(index.types == AMENITY_INDEX["cafe"]) == 21
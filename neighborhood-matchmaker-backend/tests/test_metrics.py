@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.parser import text_string_to_metric_families
+from metrics import SEARCH_STAGE_SECONDS, SEARCH_REQUESTS
+
+
+@pytest.fixture
+def client():
+    from main import app
+    return TestClient(app)
+
+
+def scrape(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE_LATEST
+    return {family.name: family for family in text_string_to_metric_families(response.text)}
+
+
+def test_metrics_parse_as_prometheus_text(client):
+    SEARCH_REQUESTS.labels(result="computed").inc()
+
+    families = scrape(client)
+
+    assert families["search_stage_seconds"].type == "histogram"
+    assert families["search_requests"].type == "counter"
+    assert any(sample.name == "search_requests_total" and sample.labels == {"result": "computed"} and sample.value >= 1
+               for sample in families["search_requests"].samples)
+    # Values the services track themselves, read at scrape time
+    assert families["overpass_retries"].type == "counter"
+    assert [sample.name for sample in families["overpass_retries"].samples] == ["overpass_retries_total"]
+    assert families["searches_in_flight"].type == "gauge"
+    assert families["searches_in_flight"].samples[0].value == 0
+
+
+def test_histogram_buckets_are_cumulative(client):
+    durations = [0.0003, 0.002, 0.002, 0.07, 4.0, 45.0]
+    for seconds in durations:
+        SEARCH_STAGE_SECONDS.labels(stage="metrics_test").observe(seconds)
+
+    samples = [
+        sample for sample in scrape(client)["search_stage_seconds"].samples
+        if sample.labels.get("stage") == "metrics_test"
+    ]
+    buckets = [(float(sample.labels["le"]), sample.value) for sample in samples if sample.name.endswith("_bucket")]
+    values = {sample.name: sample.value for sample in samples if not sample.name.endswith("_bucket")}
+
+    counts = [count for _, count in buckets]
+    assert counts == sorted(counts)
+    assert [bound for bound, _ in buckets] == sorted(bound for bound, _ in buckets)
+    assert dict(buckets)[0.0025] == 3
+    assert dict(buckets)[5.0] == 5
+    assert buckets[-1] == (float("inf"), len(durations))
+    assert values["search_stage_seconds_count"] == len(durations)
+    assert values["search_stage_seconds_sum"] == pytest.approx(sum(durations))
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import time
+import pytest
+from services.overpass_cache import OverpassCacheMiss, OverpassResponseCache
+
+RESPONSE = {"elements": [{"type": "node", "id": 1, "lat": 45.5, "lon": -73.6}]}
+ENTRY_BYTES = len(json.dumps(RESPONSE, separators=(",", ":")))
+
+
+def make_cache(tmp_path, **options):
+    return OverpassResponseCache(str(tmp_path), **options)
+
+
+def put(cache, query, data=RESPONSE):
+    key = cache.make_key(query)
+    asyncio.run(cache.put(key, data))
+    return key
+
+
+def get(cache, key):
+    return asyncio.run(cache.get(key))
+
+
+def age(cache, key, seconds):
+    """Backdate a disk entry as if it was written seconds ago"""
+    stored_at = time.time() - seconds
+    os.utime(cache._path(key), (stored_at, stored_at))
+
+
+def cached_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith(".json"))
+
+
+def test_disk_entries_outlive_the_memory_tier(tmp_path):
+    cache = make_cache(tmp_path)
+    key = put(cache, "query")
+
+    assert get(make_cache(tmp_path), key) == RESPONSE
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_expired_disk_entries_are_dropped(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=60)
+    fresh, expired = put(cache, "fresh"), put(cache, "expired")
+    age(cache, expired, 120)
+    cache.clear_memory()
+
+    assert get(cache, fresh) == RESPONSE
+    assert get(cache, expired) is None
+    assert cached_files(tmp_path) == [f"{fresh}.json"]
+
+
+def test_expired_memory_entries_are_dropped(monkeypatch):
+    cache = OverpassResponseCache(None, ttl_seconds=60)
+    key = put(cache, "query")
+
+    monkeypatch.setattr(time, "time", lambda now=time.time(): now + 120)
+
+    assert get(cache, key) is None
+    assert key not in cache._memory
+
+
+def test_memory_tier_keeps_the_most_recently_used():
+    cache = OverpassResponseCache(None, max_memory_entries=2)
+    first, second = put(cache, "first"), put(cache, "second")
+    get(cache, first)  # second is now the least recently used
+
+    put(cache, "third")
+
+    assert get(cache, first) == RESPONSE
+    assert get(cache, second) is None
+
+
+def test_disk_is_evicted_oldest_first_to_the_size_limit(tmp_path):
+    cache = make_cache(tmp_path, max_disk_bytes=3 * ENTRY_BYTES)
+
+    keys = [put(cache, f"query {i}") for i in range(5)]
+
+    assert cached_files(tmp_path) == sorted(f"{key}.json" for key in keys[2:])
+    assert cache._disk_bytes == 3 * ENTRY_BYTES
+
+
+def test_disk_index_is_rebuilt_from_existing_files(tmp_path):
+    earlier = make_cache(tmp_path)
+    old_keys = [put(earlier, f"old {i}") for i in range(3)]
+    for seconds, key in zip([300, 200, 100], old_keys):
+        age(earlier, key, seconds)
+
+    # A restarted process only learns about the old entries from the directory
+    cache = make_cache(tmp_path, max_disk_bytes=2 * ENTRY_BYTES)
+    new_key = put(cache, "new")
+
+    assert cached_files(tmp_path) == sorted([f"{old_keys[2]}.json", f"{new_key}.json"])
+    assert list(cache._disk_entries) == [cache._path(old_keys[2]), cache._path(new_key)]
+
+
+def test_replay_mode_serves_expired_entries_and_raises_on_a_miss(tmp_path):
+    key = put(make_cache(tmp_path), "recorded")
+    age(make_cache(tmp_path), key, 30 * 24 * 3600)
+    replay = make_cache(tmp_path, ttl_seconds=60, replay_only=True)
+
+    assert get(replay, key) == RESPONSE
+    with pytest.raises(OverpassCacheMiss):
+        get(replay, replay.make_key("never recorded"))
+
+    # Replays never record
+    unrecorded = put(replay, "new")
+    assert f"{unrecorded}.json" not in cached_files(tmp_path)
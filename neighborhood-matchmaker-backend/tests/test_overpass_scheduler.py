@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+import pytest
+from services import overpass_scheduler
+from services.overpass_scheduler import OverpassRetryableError, OverpassScheduler, parse_retry_after
+
+
+class FakeClock:
+    """Monotonic time that only moves when the scheduler sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # Like a real clock every sleep moves time on, rounding leftovers of a token would otherwise spin
+        self.now += max(1e-6, seconds)
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(overpass_scheduler, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(overpass_scheduler, "asyncio", SimpleNamespace(
+        sleep=clock.sleep, Lock=asyncio.Lock, Semaphore=asyncio.Semaphore
+    ))
+    return clock
+
+
+class FakeOverpass:
+    """Answers with a scripted status per call, recording when each call started"""
+
+    def __init__(self, clock, statuses, retry_after=None):
+        self.clock = clock
+        self.statuses = list(statuses)
+        self.retry_after = retry_after
+        self.started = []
+
+    def call(self, name):
+        async def operation():
+            self.started.append((name, self.clock.now))
+            status = self.statuses.pop(0) if self.statuses else 200
+            if status != 200:
+                raise OverpassRetryableError(status, self.retry_after)
+            return name
+        return operation
+
+
+def run(*coroutines):
+    async def gather():
+        return await asyncio.gather(*coroutines)
+    return asyncio.run(gather())
+
+
+def test_retry_after_pauses_every_caller(clock):
+    scheduler = OverpassScheduler(rate_per_second=1.0, burst=1, max_concurrency=2)
+    overpass = FakeOverpass(clock, [429], retry_after=10)
+
+    assert run(scheduler.run(overpass.call("first")), scheduler.run(overpass.call("second"))) == ["first", "second"]
+
+    assert overpass.started[0] == ("first", 0.0)
+    assert sorted(name for name, _ in overpass.started[1:]) == ["first", "second"]
+    assert all(started >= 10 for _, started in overpass.started[1:])
+    assert scheduler.throttled == 1 and scheduler.retries == 1
+
+
+def test_throttling_halves_the_rate_and_successes_restore_it(clock):
+    scheduler = OverpassScheduler(rate_per_second=1.0, burst=1, min_rate_per_second=0.3)
+    overpass = FakeOverpass(clock, [429, 429, 429], retry_after=0)
+
+    run(scheduler.run(overpass.call("throttled")))
+    assert scheduler.rate == pytest.approx(0.35)  # 1 -> 0.5 -> 0.3 floor -> 0.3, then one success adds 5%
+
+    # Slower pacing while recovering, one token per 1 / rate seconds
+    before = clock.now
+    run(scheduler.run(overpass.call("next")))
+    assert clock.now - before == pytest.approx(1 / 0.35, abs=1e-3)
+
+    for i in range(20):
+        run(scheduler.run(overpass.call(i)))
+    assert scheduler.rate == 1.0  # Additive increase stops at the configured rate
+
+
+def test_retries_stop_after_the_budget(clock, monkeypatch):
+    monkeypatch.setattr(overpass_scheduler.random, "uniform", lambda low, high: high)
+    scheduler = OverpassScheduler(rate_per_second=100.0, burst=1, max_retries=2, backoff_base_seconds=1.0)
+    overpass = FakeOverpass(clock, [503] * 10)
+
+    with pytest.raises(OverpassRetryableError) as error:
+        run(scheduler.run(overpass.call("failing")))
+
+    assert error.value.status == 503
+    assert len(overpass.started) == 3
+    assert scheduler.retries == 2 and scheduler.exhausted == 1
+    # Exponential backoff between attempts, 5xx does not lower the rate
+    assert [started for _, started in overpass.started][1:] == pytest.approx([1.0, 3.0], abs=0.05)
+    assert scheduler.rate == 100.0
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ("12", 12.0),
+    ("-3", 0.0),
+    ("soon", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert parse_retry_after(format_datetime(later, usegmt=True)) == pytest.approx(30, abs=2)
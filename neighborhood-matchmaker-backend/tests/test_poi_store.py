@@ -0,0 +1,94 @@
+import os
+import threading
+import numpy as np
+from services.poi_store import POIStore
+
+
+def columns(n, marker=0):
+    return {
+        "ids": np.arange(n, dtype=np.int64) + marker,
+        "lats": np.full(n, 45.5),
+        "lons": np.full(n, -73.6),
+        "types": np.zeros(n, dtype=np.int8),
+    }
+
+
+def segment_names(store):
+    return sorted(name for name in os.listdir(store.directory) if name.startswith("segment-"))
+
+
+def test_flushed_tiles_survive_reopening(tmp_path):
+    store = POIStore(str(tmp_path), 0.02, flush_tiles=2).open()
+    store.put_tile((1, 1), 100.0, columns(3))
+    store.put_tile((1, 2), 100.0, columns(5))  # Fills the buffer, flushed
+
+    reopened = POIStore(str(tmp_path), 0.02).open()
+    fetched_at, tile = reopened.get_tile((1, 2))
+
+    assert fetched_at == 100.0
+    assert list(tile["ids"]) == [0, 1, 2, 3, 4]
+    assert isinstance(tile["lats"], np.memmap)
+
+
+def test_stores_sharing_a_directory_do_not_overwrite_each_other(tmp_path):
+    # Two worker processes, each with its own store on the same directory
+    first = POIStore(str(tmp_path), 0.02).open()
+    second = POIStore(str(tmp_path), 0.02).open()
+
+    first.put_tile((1, 1), 100.0, columns(2, marker=10))
+    second.put_tile((2, 2), 100.0, columns(2, marker=20))
+    first.flush()
+    second.flush()
+
+    assert len(segment_names(first)) == 2
+    reopened = POIStore(str(tmp_path), 0.02).open()
+    assert reopened.get_tile((1, 1))[1]["ids"][0] == 10
+    assert reopened.get_tile((2, 2))[1]["ids"][0] == 20
+
+
+def test_newest_fetch_of_a_tile_wins_whatever_the_segment_order(tmp_path):
+    first = POIStore(str(tmp_path), 0.02).open()
+    second = POIStore(str(tmp_path), 0.02).open()
+
+    second.put_tile((1, 1), 200.0, columns(1, marker=2))
+    second.flush()
+    first.put_tile((1, 1), 100.0, columns(1, marker=1))  # Written later, fetched earlier
+    first.flush()
+
+    assert POIStore(str(tmp_path), 0.02).open().get_tile((1, 1))[0] == 200.0
+
+
+def test_compaction_includes_segments_of_other_stores(tmp_path):
+    first = POIStore(str(tmp_path), 0.02, max_segments=100).open()
+    second = POIStore(str(tmp_path), 0.02).open()
+    for i in range(3):
+        first.put_tile((1, i), 100.0, columns(1, marker=i))
+        first.flush()
+    second.put_tile((2, 0), 100.0, columns(1, marker=9))
+    second.flush()
+
+    first.compact()
+
+    assert len(segment_names(first)) == 1
+    assert len(first) == 4
+    assert first.get_tile((2, 0))[1]["ids"][0] == 9
+
+
+def test_concurrent_puts_and_compactions_keep_every_tile(tmp_path):
+    store = POIStore(str(tmp_path), 0.02, flush_tiles=3, max_segments=2).open()
+
+    def put(worker):
+        for i in range(30):
+            store.put_tile((worker, i), 100.0, columns(2, marker=worker * 100 + i))
+
+    threads = [threading.Thread(target=put, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.flush()
+
+    reopened = POIStore(str(tmp_path), 0.02).open()
+    assert len(reopened) == 4 * 30
+    assert reopened.get_tile((3, 29))[1]["ids"][0] == 329
+    assert not [name for name in os.listdir(store.directory) if name.endswith(".tmp")]
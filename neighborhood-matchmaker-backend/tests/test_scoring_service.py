@@ -0,0 +1,64 @@
+import itertools
+import numpy as np
+import pytest
+from enums.amenity_type import AmenityTypeEnum
+from services.scoring_service import ScoringService
+
+AMENITY_SETS = [
+    list(AmenityTypeEnum),
+    [AmenityTypeEnum.GROCERY, AmenityTypeEnum.PARK],
+    [AmenityTypeEnum.CAFE],
+]
+
+
+@pytest.fixture(scope="module")
+def scoring():
+    return ScoringService()
+
+
+def random_counts(rng, rows):
+    # Mostly small counts, where the score tiers change, plus a few large ones
+    shape = (rows, len(AmenityTypeEnum))
+    return np.where(rng.random(shape) < 0.9, rng.integers(0, 5, shape), rng.integers(0, 200, shape))
+
+
+@pytest.mark.parametrize("amenities, search_all", list(itertools.product(AMENITY_SETS, [True, False])))
+@pytest.mark.parametrize("max_commute_time", [None, 20, 45])
+def test_batch_scores_match_scalar_scores(scoring, amenities, search_all, max_commute_time):
+    rng = np.random.default_rng(7)
+    counts = random_counts(rng, 200)
+    commute_times = np.where(rng.random(200) < 0.1, np.nan, rng.integers(5, 90, 200).astype(float))
+    preferred = rng.random(200) < 0.2
+
+    requested = np.zeros_like(counts)
+    columns = [scoring.amenity_columns[amenity] for amenity in amenities]
+    requested[:, columns] = counts[:, columns]
+
+    batch = scoring.calculate_neighborhood_scores(
+        requested, amenities, commute_times, max_commute_time, preferred, search_all_amenities=search_all
+    )
+
+    for row in range(len(counts)):
+        # Searches only count the requested amenities, the diversity bonus sees nothing else
+        amenity_counts = {amenity.value: int(counts[row, scoring.amenity_columns[amenity]]) for amenity in amenities}
+        commute_time = None if np.isnan(commute_times[row]) else int(commute_times[row])
+        expected = scoring.calculate_neighborhood_score(
+            amenity_counts, amenities, commute_time, max_commute_time, bool(preferred[row]), search_all_amenities=search_all
+        )
+        assert batch[row] == expected, f"row {row}: {amenity_counts}, commute {commute_time}"
+
+
+@pytest.mark.parametrize("search_all", [True, False])
+def test_upper_bounds_never_below_scores(scoring, search_all):
+    rng = np.random.default_rng(3)
+    counts = random_counts(rng, 300)
+    unknown = rng.random(counts.shape) < 0.4
+    commute_times = rng.integers(5, 90, 300).astype(float)
+    amenities = list(AmenityTypeEnum)
+
+    bounds = scoring.calculate_score_upper_bounds(np.where(unknown, -1, counts), amenities, commute_times, 30, search_all_amenities=search_all)
+    scores = scoring.calculate_neighborhood_scores(counts, amenities, commute_times, 30, search_all_amenities=search_all)
+    exact = scoring.calculate_score_upper_bounds(counts, amenities, commute_times, 30, search_all_amenities=search_all)
+
+    assert (bounds >= scores).all()
+    assert (exact == scores).all()
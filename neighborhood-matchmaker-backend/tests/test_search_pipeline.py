@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
+from enums.amenity_type import AmenityTypeEnum
+from models import Amenity
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+
+
+class SplitCounter:
+    """Answers the fast neighborhoods at once, the others only after the test gave up on them"""
+
+    def __init__(self, fast_locations):
+        self.fast_locations = fast_locations
+
+    async def get_amenity_counts_by_radius(self, lat, lon, amenity_types, radii_meters):
+        if (lat, lon) not in self.fast_locations:
+            await asyncio.sleep(30)
+        return {radius: {amenity.value: 2 for amenity in amenity_types} for radius in radii_meters}
+
+
+@pytest.fixture
+def search(db, make_neighborhoods):
+    neighborhoods = make_neighborhoods(12)
+    fast = neighborhoods[:4]
+    service = NeighborhoodAmenityService(db)
+    service.amenity_service.amenity_counter = SplitCounter(
+        {(neighborhood.coordinates.lat, neighborhood.coordinates.lon) for neighborhood in fast}
+    )
+    search_dto = NeighborhoodSearchDTO(
+        city="Montreal", budget=2000, rent_types=None, amenities=[AmenityTypeEnum.CAFE],
+        max_commute_time=None, destination_neighborhood=None
+    )
+    return service, search_dto, fast
+
+
+def stored_neighborhood_ids(db):
+    db.expire_all()
+    return {row.neighborhood_id for row in db.query(Amenity)}
+
+
+def test_closed_stream_stores_what_was_fetched(db, search):
+    service, search_dto, fast = search
+
+    async def read_then_disconnect():
+        amenities, neighborhoods, commute_times = await service._prepare_search(search_dto)
+        pipeline = service._search_pipeline(neighborhoods, search_dto, amenities, commute_times, prune=False)
+        seen = set()
+        while len(seen) < len(fast):
+            seen.update(result.neighborhood_id for result in await pipeline.__anext__())
+        await pipeline.aclose()  # Client went away while the slow fetches were still running
+        return seen
+
+    seen = asyncio.run(read_then_disconnect())
+
+    assert seen == {neighborhood.id for neighborhood in fast}
+    assert stored_neighborhood_ids(db) == seen
+
+
+def test_cancelled_search_stores_what_was_fetched(db, search):
+    service, search_dto, fast = search
+
+    async def cancel_midway():
+        task = asyncio.ensure_future(service._run_search(search_dto))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_midway())
+
+    assert stored_neighborhood_ids(db) == {neighborhood.id for neighborhood in fast}
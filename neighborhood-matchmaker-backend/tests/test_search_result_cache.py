@@ -0,0 +1,182 @@
+import asyncio
+import pytest
+from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
+from dtos.search_result import SearchResult
+from enums.amenity_type import AmenityTypeEnum
+from enums.rent_type import RentTypeEnum
+from services.amenity_service import AmenityService
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+from services.search_result_cache import SearchResultCache, make_search_key, search_result_cache
+
+
+def search(**overrides):
+    fields = {
+        "city": "Montreal",
+        "budget": 1500,
+        "max_commute_time": 30,
+        "destination_neighborhood": "N0",
+        "amenities": [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK],
+        "rent_types": [RentTypeEnum.ONE_BED, RentTypeEnum.STUDIO],
+        "preferred_neighborhoods": ["N2", "N1"],
+    }
+    fields.update(overrides)
+    return NeighborhoodSearchDTO(**fields)
+
+
+def result(total):
+    return SearchResult(neighborhoods=[], total_results=total, search_criteria={})
+
+
+def test_key_ignores_order_and_duplicates():
+    assert make_search_key(search()) == make_search_key(search(
+        amenities=[AmenityTypeEnum.PARK, AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK],
+        rent_types=[RentTypeEnum.STUDIO, RentTypeEnum.ONE_BED],
+        preferred_neighborhoods=["N1", "N2"],
+    ))
+
+
+def test_key_accepts_enum_values():
+    assert make_search_key(search()) == make_search_key(search(amenities=["park", "cafe"], rent_types=["studio", "One Bed"]))
+
+
+@pytest.mark.parametrize("change", [
+    {"city": "Laval"},
+    {"budget": 1600},
+    {"max_commute_time": None},
+    {"destination_neighborhood": "N3"},
+    {"amenities": [AmenityTypeEnum.CAFE]},
+    {"rent_types": None},
+    {"preferred_neighborhoods": None},
+    {"radius_meters": 500},
+])
+def test_key_distinguishes_criteria(change):
+    assert make_search_key(search()) != make_search_key(search(**change))
+
+
+def test_no_amenities_means_all_amenities():
+    # Empty and missing lists both select dynamic scoring over every amenity
+    assert make_search_key(search(amenities=[])) == make_search_key(search(amenities=None))
+    assert make_search_key(search(amenities=None))[4] is None
+
+
+def test_invalidate_city_drops_only_its_entries():
+    cache = SearchResultCache()
+    montreal, laval = make_search_key(search()), make_search_key(search(city="Laval"))
+    cache.put(montreal, result(1), cache.get_version("Montreal"))
+    cache.put(laval, result(2), cache.get_version("Laval"))
+
+    cache.invalidate_city("Montreal")
+
+    assert cache.get(montreal) is None
+    assert cache.get(laval).total_results == 2
+
+
+def test_result_computed_before_a_write_is_not_served():
+    cache = SearchResultCache()
+    key = make_search_key(search())
+    version = cache.get_version("Montreal")
+    cache.invalidate_city("Montreal")  # Rows changed while the search ran
+    cache.put(key, result(1), version)
+
+    assert cache.get(key) is None
+
+
+def test_ttl_and_lru_bound(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("services.search_result_cache.time.monotonic", lambda: clock[0])
+    cache = SearchResultCache(max_entries=2, ttl_seconds=10)
+    keys = [make_search_key(search(budget=budget)) for budget in (1000, 2000, 3000)]
+
+    for key in keys:
+        cache.put(key, result(1), 0)
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) is not None
+
+    clock[0] = 11
+    assert cache.get(keys[2]) is None
+
+
+def test_store_invalidates_on_inserts_and_changes(db, make_neighborhoods):
+    neighborhood = make_neighborhoods(1)[0]
+    service = AmenityService(db)
+    row = {"neighborhood_id": neighborhood.id, "radius_meters": 1000, "type": AmenityTypeEnum.CAFE}
+
+    version = search_result_cache.get_version("Montreal")
+    assert service.store_amenity_counts([{**row, "count": 3}]) == {"Montreal": version + 1}
+
+    assert service.store_amenity_counts([{**row, "count": 3}]) == {}  # Same count, nothing to invalidate
+    assert search_result_cache.get_version("Montreal") == version + 1
+
+    assert service.store_amenity_counts([{**row, "count": 4}]) == {"Montreal": version + 2}
+
+
+class FlakyCounter:
+    """Fails while failing is set, otherwise two of every amenity at every radius"""
+
+    def __init__(self, failing=False, during_fetch=None):
+        self.failing = failing
+        self.during_fetch = during_fetch
+        self.fetches = 0
+
+    async def get_amenity_counts_by_radius(self, lat, lon, amenity_types, radii_meters):
+        self.fetches += 1
+        if self.during_fetch:
+            self.during_fetch()
+        if self.failing:
+            raise RuntimeError("Overpass is down")
+        return {radius: {amenity.value: 2 for amenity in amenity_types} for radius in radii_meters}
+
+
+@pytest.fixture
+def searches(db, make_neighborhoods):
+    search_result_cache.clear()
+    neighborhoods = make_neighborhoods(3)
+    search_dto = search(budget=5000, destination_neighborhood=None, max_commute_time=None, rent_types=None, preferred_neighborhoods=None)
+
+    def run_search(counter):
+        service = NeighborhoodAmenityService(db)
+        service.amenity_service.amenity_counter = counter
+        result = asyncio.run(service.process_neighborhood_search(search_dto))
+        db.info.pop("run_db_lock", None)
+        return result
+
+    yield run_search, make_search_key(search_dto), neighborhoods
+    search_result_cache.clear()
+
+
+def test_cold_search_is_cached_after_its_own_writes(searches):
+    run_search, key, _ = searches
+    counter = FlakyCounter()
+
+    run_search(counter)
+
+    assert search_result_cache.get(key) is not None
+    run_search(counter)
+    assert counter.fetches == 3
+
+
+def test_write_by_someone_else_during_the_search_is_not_cached(searches):
+    run_search, key, _ = searches
+
+    run_search(FlakyCounter(during_fetch=lambda: search_result_cache.invalidate_city("Montreal")))
+
+    assert search_result_cache.get(key) is None
+
+
+def test_failed_fetch_is_not_cached_and_later_rows_are_served(db, searches):
+    run_search, key, neighborhoods = searches
+
+    failed = run_search(FlakyCounter(failing=True))
+    assert all(count == 0 for result in failed.neighborhoods for count in result.amenity_counts.values())
+    assert search_result_cache.get(key) is None
+
+    # The refresh worker or another search stores the real counts for the first time
+    service = AmenityService(db, amenity_counter=FlakyCounter())
+    for neighborhood in neighborhoods:
+        asyncio.run(service.refresh_amenity_counts(neighborhood, [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK]))
+
+    # Answered from the stored counts, the failing counter is not asked again
+    counter = FlakyCounter(failing=True)
+    recomputed = run_search(counter)
+    assert counter.fetches == 0
+    assert all(result.amenity_counts == {"cafe": 2, "park": 2} for result in recomputed.neighborhoods)
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
+from enums.amenity_type import AmenityTypeEnum
+from http_client import get_http_session
+from metrics import REGISTRY
+from services.amenity_service import AmenityService
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+from services.search_result_cache import search_result_cache
+
+SEARCH = {
+    "city": "Montreal", "budget": 5000, "amenities": ["cafe", "park"],
+    "rent_types": None, "max_commute_time": None, "destination_neighborhood": None
+}
+
+
+@pytest.fixture
+def stored_city(db, make_neighborhoods):
+    """Neighborhoods whose counts are all stored, so the stream never fetches"""
+    search_result_cache.clear()
+    neighborhoods = make_neighborhoods(6)
+    service = AmenityService(db)
+    amenities = [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK]
+    for i, neighborhood in enumerate(neighborhoods):
+        counts_by_radius = {radius: {"cafe": i, "park": 6 - i} for radius in AmenityService.RADII_METERS}
+        service.store_amenity_counts(service._build_rows(neighborhood.id, amenities, counts_by_radius))
+    yield neighborhoods
+    search_result_cache.clear()
+
+
+@pytest.fixture
+def client():
+    from main import app
+    app.dependency_overrides[get_http_session] = lambda: None
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def search_timings():
+    return REGISTRY.get_sample_value("search_stage_seconds_count", {"stage": "search"}) or 0
+
+
+def test_stream_yields_one_line_per_neighborhood_then_the_summary(client, stored_city):
+    response = client.post("/search-neighborhoods/stream", json=SEARCH)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    results, done = events[:-1], events[-1]
+
+    assert [event["event"] for event in results] == ["result"] * len(stored_city)
+    assert [event["completed"] for event in results] == list(range(1, len(stored_city) + 1))
+    assert {event["total"] for event in results} == {len(stored_city)}
+    assert sorted(event["result"]["neighborhood_id"] for event in results) == sorted(n.id for n in stored_city)
+
+    assert done["event"] == "done"
+    scores = [result["score"] for result in done["search_result"]["neighborhoods"]]
+    assert scores == sorted(scores, reverse=True) and len(scores) == len(stored_city)
+    assert results[-1]["top"] == [
+        {"neighborhood_id": result["neighborhood_id"], "score": result["score"]} for result in done["search_result"]["neighborhoods"]
+    ]
+
+
+def test_stream_is_accounted_like_a_search_from_the_first_query(db, stored_city, monkeypatch):
+    service = NeighborhoodAmenityService(db)
+    prepare_search = service._prepare_search
+    active_while_preparing = []
+
+    async def recording_prepare_search(search_dto):
+        active_while_preparing.append(NeighborhoodAmenityService.active_searches)
+        return await prepare_search(search_dto)
+
+    monkeypatch.setattr(service, "_prepare_search", recording_prepare_search)
+    timings = search_timings()
+
+    async def consume():
+        return [event async for event in service.stream_neighborhood_search(NeighborhoodSearchDTO(**SEARCH))]
+
+    events = asyncio.run(consume())
+
+    assert len(events) == len(stored_city) + 1
+    assert active_while_preparing == [1]
+    assert NeighborhoodAmenityService.active_searches == 0
+    assert search_timings() == timings + 1
@@ -0,0 +1,115 @@
+import asyncio
+import random
+import pytest
+from dtos.neighborhood_search_dto import NeighborhoodSearchDTO
+from enums.amenity_type import AmenityTypeEnum
+from models import Amenity
+from services.amenity_service import AmenityService
+from services.commute_service import invalidate_commute_matrices
+from services.neighborhood_amenity_service import NeighborhoodAmenityService
+
+
+class FakeAmenityCounter:
+    """Deterministic counts per location, counting the fetches instead of calling Overpass"""
+
+    def __init__(self):
+        self.fetches = 0
+
+    async def get_amenity_counts_by_radius(self, lat, lon, amenity_types, radii_meters):
+        self.fetches += 1
+        rng = random.Random(f"{lat:.6f},{lon:.6f}")
+        counts = {amenity.value: rng.randint(0, 12) for amenity in AmenityTypeEnum}
+        return {
+            radius: {amenity.value: counts[amenity.value] * radius // 1000 for amenity in amenity_types}
+            for radius in radii_meters
+        }
+
+
+def run_search(db, search_dto, prune):
+    """Scores of the top k and the number of fetches, with or without upper-bound pruning"""
+    service = NeighborhoodAmenityService(db)
+    counter = service.amenity_service.amenity_counter = FakeAmenityCounter()
+
+    async def search():
+        amenities, neighborhoods, commute_times = await service._prepare_search(search_dto)
+        results = []
+        async for scored in service._search_pipeline(neighborhoods, search_dto, amenities, commute_times, prune):
+            results.extend(scored)
+        return results
+
+    results = asyncio.run(search())
+    db.info.pop("run_db_lock", None)  # Bound to the event loop that just closed
+    results.sort(key=lambda result: result.score, reverse=True)
+    return [result.score for result in results[:service.TOP_K]], counter.fetches
+
+
+SEARCHES = [
+    {"amenities": None, "max_commute_time": None, "destination_neighborhood": None},
+    {"amenities": [AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK], "max_commute_time": 30, "destination_neighborhood": "N3"},
+    {"amenities": [AmenityTypeEnum.GYM], "max_commute_time": 20, "destination_neighborhood": "N10", "preferred_neighborhoods": ["N7"]},
+    {"amenities": [AmenityTypeEnum.RESTAURANT, AmenityTypeEnum.GROCERY, AmenityTypeEnum.TRANSIT], "max_commute_time": None, "destination_neighborhood": None},
+]
+
+
+def store_counts(db, neighborhoods, amenity_types):
+    """Store the fake counter's counts at every radius, as an earlier search would have"""
+    service = AmenityService(db)
+    counter = FakeAmenityCounter()
+    for neighborhood in neighborhoods:
+        counts_by_radius = asyncio.run(counter.get_amenity_counts_by_radius(
+            neighborhood.coordinates.lat, neighborhood.coordinates.lon, amenity_types, service.RADII_METERS
+        ))
+        service.store_amenity_counts(service._build_rows(neighborhood.id, amenity_types, counts_by_radius))
+
+
+@pytest.mark.parametrize("criteria", SEARCHES)
+def test_pruned_top_k_matches_exhaustive_scan(db, make_neighborhoods, criteria):
+    invalidate_commute_matrices()
+    neighborhoods = make_neighborhoods(60)
+    search_dto = NeighborhoodSearchDTO(city="Montreal", budget=2000, rent_types=None, **criteria)
+    amenity_types = search_dto.amenities or list(AmenityTypeEnum)
+
+    # Some neighborhoods are complete, some partly known, the rest unknown, so bounds differ
+    def seed():
+        db.query(Amenity).delete()
+        db.commit()
+        store_counts(db, neighborhoods[:20], amenity_types)
+        store_counts(db, neighborhoods[20:40], amenity_types[:1])
+
+    seed()
+    exhaustive, exhaustive_fetches = run_search(db, search_dto, prune=False)
+    seed()
+    pruned, pruned_fetches = run_search(db, search_dto, prune=True)
+
+    assert pruned == exhaustive
+    assert pruned_fetches <= exhaustive_fetches
+
+
+def test_pruning_skips_fetches_that_cannot_reach_the_top_k(db, make_neighborhoods):
+    invalidate_commute_matrices()
+    neighborhoods = make_neighborhoods(60)
+    search_dto = NeighborhoodSearchDTO(
+        city="Montreal", budget=2000, rent_types=None, amenities=[AmenityTypeEnum.CAFE, AmenityTypeEnum.PARK],
+        max_commute_time=None, destination_neighborhood=None
+    )
+
+    # Known neighborhoods with many amenities fill the top k, unknown ones with
+    # a poor known count are bounded below it and never fetched
+    service = AmenityService(db)
+    rows = []
+    for neighborhood in neighborhoods[:20]:
+        rows += [
+            {"neighborhood_id": neighborhood.id, "radius_meters": radius, "type": amenity, "count": 50}
+            for radius in service.RADII_METERS for amenity in search_dto.amenities
+        ]
+    for neighborhood in neighborhoods[20:]:
+        rows += [
+            {"neighborhood_id": neighborhood.id, "radius_meters": radius, "type": AmenityTypeEnum.CAFE, "count": 0}
+            for radius in service.RADII_METERS
+        ]
+    service.store_amenity_counts(rows)
+
+    pruned, fetches = run_search(db, search_dto, prune=True)
+
+    assert len(pruned) == NeighborhoodAmenityService.TOP_K
+    assert fetches < 40
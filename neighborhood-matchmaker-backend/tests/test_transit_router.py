@@ -0,0 +1,138 @@
+import math
+from datetime import date
+import numpy as np
+import pytest
+from services.transit_router import TransitTimeTable, TransitTimetable, walk_seconds_matrix
+
+MONDAY = date(2026, 10, 19)
+
+# Line A runs north A1 -> A2 -> A3, line B leaves B1 (100 m north of A3) east to B2
+STOPS = {
+    "A1": (45.5000, -73.6000),
+    "A2": (45.5100, -73.6000),
+    "A3": (45.5200, -73.6000),
+    "B1": (45.5209, -73.6000),
+    "B2": (45.5209, -73.5850),
+}
+
+
+def hhmm(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def at(hours, minutes):
+    return hours * 3600 + minutes * 60
+
+
+@pytest.fixture
+def feed(tmp_path):
+    trips = {
+        "a_0800": ("wk", [("A1", at(8, 0)), ("A2", at(8, 5)), ("A3", at(8, 10))]),
+        "a_0810": ("wk", [("A1", at(8, 10)), ("A2", at(8, 15)), ("A3", at(8, 20))]),
+        "a_0755_weekend": ("we", [("A1", at(7, 55)), ("A2", at(7, 58)), ("A3", at(8, 1))]),
+        "b_0812": ("wk", [("B1", at(8, 12)), ("B2", at(8, 18))]),
+        "b_0820": ("wk", [("B1", at(8, 20)), ("B2", at(8, 26))]),
+    }
+
+    (tmp_path / "stops.txt").write_text(
+        "stop_id,stop_name,stop_lat,stop_lon,location_type\n"
+        + "".join(f"{stop},{stop},{lat},{lon},0\n" for stop, (lat, lon) in STOPS.items())
+        + "STATION,Parent,45.51,-73.60,1\n"
+    )
+    (tmp_path / "trips.txt").write_text(
+        "route_id,service_id,trip_id\n" + "".join(f"r,{service},{trip}\n" for trip, (service, _) in trips.items())
+    )
+    (tmp_path / "stop_times.txt").write_text(
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n" + "".join(
+            f"{trip},{hhmm(time)},{hhmm(time)},{stop},{sequence}\n"
+            for trip, (_, stop_times) in trips.items()
+            for sequence, (stop, time) in enumerate(stop_times, start=1)
+        )
+    )
+    (tmp_path / "calendar.txt").write_text(
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date\n"
+        "wk,1,1,1,1,1,0,0,20260101,20261231\n"
+        "we,0,0,0,0,0,1,1,20260101,20261231\n"
+    )
+    return str(tmp_path)
+
+
+@pytest.fixture
+def timetable(feed):
+    return TransitTimetable.from_gtfs(feed, MONDAY)
+
+
+def stop_index(name):
+    return list(STOPS).index(name)
+
+
+def arrivals_from(timetable, name, departure, walk=0):
+    access = [(np.array([stop_index(name)]), np.array([walk], dtype=np.float32))]
+    return timetable.earliest_arrivals(access, np.array([departure], dtype=np.float32))[:, 0]
+
+
+def transfer_seconds(a, b):
+    (lat1, lon1), (lat2, lon2) = STOPS[a], STOPS[b]
+    return float(walk_seconds_matrix(np.array([lat1]), np.array([lon1]), np.array([lat2]), np.array([lon2]))[0, 0])
+
+
+def test_feed_keeps_platforms_and_the_service_day(timetable):
+    assert len(timetable.stop_lats) == len(STOPS)  # The parent station is not a stop
+    assert sum(len(pattern.departures) for pattern in timetable.patterns) == 4  # Weekend trip excluded
+
+
+def test_earliest_arrival_with_a_transfer(timetable):
+    walk = transfer_seconds("A3", "B1")
+    assert walk < 120  # Makes the 08:12 connection
+
+    best = arrivals_from(timetable, "A1", at(7, 58))
+
+    assert best[stop_index("A2")] == at(8, 5)
+    assert best[stop_index("A3")] == at(8, 10)
+    assert best[stop_index("B1")] == pytest.approx(at(8, 10) + walk, abs=1)
+    assert best[stop_index("B2")] == at(8, 18)
+
+
+def test_missed_connection_waits_for_the_next_trip(timetable):
+    # After the first A trip has left, the 08:20 arrival at A3 misses the last B trip by the walk
+    best = arrivals_from(timetable, "A1", at(8, 1))
+
+    assert best[stop_index("A3")] == at(8, 20)
+    assert math.isinf(best[stop_index("B2")])
+
+
+def test_access_walk_delays_boarding(timetable):
+    # Five minutes to walk to A1 at 07:58 misses the 08:00 trip
+    best = arrivals_from(timetable, "A1", at(7, 58), walk=300)
+
+    assert best[stop_index("A3")] == at(8, 20)
+
+
+def test_batched_queries_match_single_queries(timetable):
+    access = [
+        (np.array([stop_index("A1")]), np.array([0], dtype=np.float32)),
+        (np.array([stop_index("A2"), stop_index("A1")]), np.array([60, 0], dtype=np.float32)),
+        (np.array([stop_index("B1")]), np.array([30], dtype=np.float32)),
+    ]
+    departures = np.array([at(7, 58), at(8, 3), at(8, 10)], dtype=np.float32)
+
+    batched = timetable.earliest_arrivals(access, departures)
+
+    for query in range(len(access)):
+        single = timetable.earliest_arrivals([access[query]], departures[query:query + 1])[:, 0]
+        np.testing.assert_array_equal(batched[:, query], single)
+
+
+def test_time_table_routes_door_to_door(timetable):
+    names = ["Origin", "Destination"]
+    lats = np.array([STOPS["A1"][0], STOPS["B2"][0]])
+    lons = np.array([STOPS["A1"][1], STOPS["B2"][1]])
+
+    table = TransitTimeTable.build(timetable, names, lats, lons, buckets=[("am", at(7, 50), at(8, 0))], sample_minutes=10)
+    minutes = table.bucket("am")
+    walk_minutes = math.ceil(walk_seconds_matrix(lats, lons, lats, lons)[1, 0] / 60)
+
+    assert minutes[0, 1] == 28  # 07:50 departure, 08:00 train, 08:18 arrival
+    assert minutes[1, 0] == walk_minutes  # No service back, walking is the answer
+    assert minutes[0, 0] == 0
+    assert table.bucket("pm") is None